@@ -0,0 +1,387 @@
+/**
+ * Offline benchmark / replay harness: scrape -> filter -> dedupe -> notify (api/worker.js).
+ *
+ * Bez OLX / Vinted / Telegrama na żywo:
+ * - lokalny serwer HTTP podaje fixture'y (HTML listingu OLX z osadzonym stanem,
+ *   JSON API Vinted) i udaje Bot API Telegrama (liczy wywołania),
+ * - worker jest importowany z WORKER_AUTOSTART=0 i jedzie prawdziwym loopOnce()/processLink()
+ *   na lokalnym Postgresie (BENCH_DATABASE_URL – baza jednorazowa, tabele są czyszczone!).
+ *
+ * Rundy: 0 = baseline (ustawia last_key), 1..N = każda dokłada --new nowych ogłoszeń na wyszukiwanie.
+ *
+ * Raport: links/s, zapytania DB na link, wywołania Telegrama na item, p50/p99 per etap.
+ *
+ * Użycie:
+ *   BENCH_DATABASE_URL=postgres://... node bench/worker-bench.js [--links 200] [--searches 50]
+ *       [--new 5] [--rounds 2] [--fixtures DIR] [--json] [--ci] [--verbose]
+ *
+ * --fixtures DIR: nagrane odpowiedzi (DIR/olx/*.html, DIR/vinted/*.json) zamiast generowanych;
+ *   baseline = ta sama odpowiedź bez pierwszych --new ogłoszeń.
+ * --ci: mniejszy rozmiar + progi (BENCH_MAX_QUERIES_PER_LINK, BENCH_MAX_TG_CALLS_PER_ITEM,
+ *   BENCH_MIN_LINKS_PER_SEC); exit 1 przy regresji albo złej liczbie wysłanych ofert.
+ */
+
+import http from "http";
+import fs from "fs";
+import path from "path";
+import pg from "pg";
+
+// ---------- argumenty ----------
+
+function parseArgs(argv) {
+  const out = { links: 200, searches: 50, new: 5, rounds: 2, linksPerUser: 5 };
+  for (let i = 0; i < argv.length; i++) {
+    const a = argv[i];
+    const next = () => argv[++i];
+    if (a === "--links") out.links = Number(next());
+    else if (a === "--searches") out.searches = Number(next());
+    else if (a === "--new") out.new = Number(next());
+    else if (a === "--rounds") out.rounds = Number(next());
+    else if (a === "--links-per-user") out.linksPerUser = Number(next());
+    else if (a === "--fixtures") out.fixtures = next();
+    else if (a === "--json") out.json = true;
+    else if (a === "--ci") out.ci = true;
+    else if (a === "--verbose") out.verbose = true;
+  }
+  if (out.ci) {
+    out.links = Math.min(out.links, 40);
+    out.searches = Math.min(out.searches, 10);
+    out.rounds = Math.max(2, Math.min(out.rounds, 2));
+  }
+  return out;
+}
+
+const args = parseArgs(process.argv.slice(2));
+
+const DB_URL = process.env.BENCH_DATABASE_URL || "";
+if (!DB_URL) {
+  console.error("BENCH_DATABASE_URL is required (throwaway database – tables get truncated)");
+  process.exit(2);
+}
+
+// ---------- fixture'y ----------
+
+const BASE_ITEMS = 40; // ogłoszeń na stronie w baseline
+
+function loadRecordedFixtures(dir) {
+  const read = (sub, ext) => {
+    const d = path.join(dir, sub);
+    if (!fs.existsSync(d)) return [];
+    return fs
+      .readdirSync(d)
+      .filter((f) => f.endsWith(ext))
+      .sort()
+      .map((f) => fs.readFileSync(path.join(d, f), "utf8"));
+  };
+  return { olx: read("olx", ".html"), vinted: read("vinted", ".json") };
+}
+
+const recorded = args.fixtures ? loadRecordedFixtures(args.fixtures) : null;
+
+function olxAd(search, n) {
+  return {
+    id: search * 1_000_000 + n,
+    title: `Bench ${search} ogłoszenie ${n}`,
+    url: `https://www.olx.pl/d/oferta/bench-${search}-${n}-CID99-ID${search}x${n}.html`,
+    price: { displayValue: `${100 + (n % 50)} zł`, regularPrice: { value: 100 + (n % 50), currencyCode: "PLN" } },
+    photos: [`https://ireland.apollo.olx.cdn/v1/files/bench-${n}/image;s={width}x{height}`],
+    delivery: { rock: { active: n % 3 === 0 } },
+  };
+}
+
+function olxHtml(ads) {
+  const state = { listing: { listing: { ads } } };
+  return (
+    `<!doctype html><html><head><title>OLX</title></head><body><div id="root"></div>` +
+    `<script>window.__PRERENDERED_STATE__= ${JSON.stringify(JSON.stringify(state))};</script>` +
+    `</body></html>`
+  );
+}
+
+function vintedItem(search, n) {
+  const id = search * 1_000_000 + n;
+  return {
+    id,
+    title: `Bench ${search} item ${n}`,
+    url: `https://www.vinted.pl/items/${id}-bench`,
+    price: { amount: String(20 + (n % 30)), currency_code: "PLN" },
+    brand_title: "Bench",
+    size_title: "M",
+    status: "Dobry",
+    photo: { url: `https://images.vinted.net/bench/${id}.jpg` },
+  };
+}
+
+// newest-first: runda r ma ogłoszenia [r*new + BASE_ITEMS - 1 .. 0] (obcięte do strony)
+function generated(source, search, round) {
+  const top = BASE_ITEMS + round * args.new;
+  const ns = [];
+  for (let n = top - 1; n >= 0 && ns.length < BASE_ITEMS + args.new; n--) ns.push(n);
+  if (source === "olx") return olxHtml(ns.map((n) => olxAd(search, n)));
+  return JSON.stringify({ items: ns.map((n) => vintedItem(search, n)) });
+}
+
+// nagrane: baseline = bez pierwszych `new` pozycji, kolejne rundy = całość
+function fromRecorded(source, search, round) {
+  const list = recorded[source];
+  const raw = list[search % list.length];
+  if (round > 0) return raw;
+  if (source === "vinted") {
+    const data = JSON.parse(raw);
+    const key = Array.isArray(data.items) ? "items" : "catalog_items";
+    data[key] = (data[key] || []).slice(args.new);
+    return JSON.stringify(data);
+  }
+  const m = raw.match(/__PRERENDERED_STATE__\s*=\s*("(?:[^"\\]|\\.)*")/);
+  if (!m) return raw;
+  const state = JSON.parse(JSON.parse(m[1]));
+  state.listing.listing.ads = state.listing.listing.ads.slice(args.new);
+  return raw.replace(m[1], JSON.stringify(JSON.stringify(state)));
+}
+
+function fixtureBody(source, search, round) {
+  if (recorded && recorded[source]?.length) return fromRecorded(source, search, round);
+  return generated(source, search, round);
+}
+
+// ---------- serwer: fixture'y + fake Telegram ----------
+
+let currentRound = 0;
+const tgCalls = new Map(); // method -> count
+const fixtureHits = { olx: 0, vinted: 0 };
+
+const server = http.createServer((req, res) => {
+  const u = new URL(req.url, "http://127.0.0.1");
+
+  const tg = u.pathname.match(/^\/bot[^/]+\/(\w+)$/);
+  if (tg) {
+    tgCalls.set(tg[1], (tgCalls.get(tg[1]) || 0) + 1);
+    req.resume();
+    req.on("end", () => {
+      res.writeHead(200, { "content-type": "application/json" });
+      res.end(JSON.stringify({ ok: true, result: { message_id: 1 } }));
+    });
+    return;
+  }
+
+  const olx = u.pathname.match(/^\/olx\/s(\d+)/);
+  if (olx) {
+    fixtureHits.olx++;
+    res.writeHead(200, { "content-type": "text/html; charset=utf-8" });
+    res.end(fixtureBody("olx", Number(olx[1]), currentRound));
+    return;
+  }
+
+  if (u.pathname === "/api/v2/catalog/items") {
+    fixtureHits.vinted++;
+    const search = Number(String(u.searchParams.get("search_text") || "").replace(/^s/, "")) || 0;
+    res.writeHead(200, { "content-type": "application/json" });
+    res.end(fixtureBody("vinted", search, currentRound));
+    return;
+  }
+
+  if (u.pathname === "/me") {
+    res.writeHead(404, { "content-type": "application/json" });
+    res.end("{}");
+    return;
+  }
+
+  // warm-up sesji Vinted (strona główna / katalog)
+  res.writeHead(200, {
+    "content-type": "text/html",
+    "set-cookie": `access_token_web=bench; Path=/; Max-Age=86400`,
+  });
+  res.end("<html><body>bench</body></html>");
+});
+
+await new Promise((r) => server.listen(0, "127.0.0.1", r));
+const base = `http://127.0.0.1:${server.address().port}`;
+
+// ---------- środowisko workera (przed importem!) ----------
+
+Object.assign(process.env, {
+  DATABASE_URL: DB_URL,
+  DB_POOL_ROLE: "worker", // rozmiar puli jak w produkcji (src/db/pool.js), nie "script"
+  WORKER_AUTOSTART: "0",
+  LINK_POLL_ADAPTIVE: "0",
+  TELEGRAM_BOT_TOKEN: "bench",
+  TELEGRAM_API_BASE: base,
+  API_BASE: base,
+  OLX_FETCH_MODE: "http",
+  SLEEP_BETWEEN_ITEMS_MS: "0",
+  TG_GLOBAL_RATE_PER_SEC: process.env.TG_GLOBAL_RATE_PER_SEC || "100000",
+  TG_CHAT_RATE_PER_SEC: process.env.TG_CHAT_RATE_PER_SEC || "100000",
+  TG_SEND_CONCURRENCY: process.env.TG_SEND_CONCURRENCY || "32",
+});
+for (const k of ["PROXY_SERVER", "PROXY_USERNAME", "PROXY_PASSWORD"]) delete process.env[k];
+
+// licznik zapytań: każdy pool.query() i client.query() przechodzi przez Client.prototype.query
+let dbQueries = 0;
+const origQuery = pg.Client.prototype.query;
+pg.Client.prototype.query = function countedQuery(...a) {
+  dbQueries++;
+  return origQuery.apply(this, a);
+};
+
+const db = await import("../db.js");
+const worker = await import("../worker.js");
+
+// ---------- seed ----------
+
+const seedPool = new pg.Pool({ connectionString: DB_URL });
+
+async function seed() {
+  await db.initDb();
+  // kolumny, które w produkcji dokładają migracje (poza initDb)
+  await seedPool.query(`ALTER TABLE users ADD COLUMN IF NOT EXISTS telegram_user_id BIGINT`);
+  await seedPool.query(`ALTER TABLE users ADD COLUMN IF NOT EXISTS lang TEXT`);
+  await seedPool.query(
+    `TRUNCATE sent_offers, link_items, link_notification_modes, chat_notifications, links, users RESTART IDENTITY CASCADE`
+  );
+
+  const users = Math.max(1, Math.ceil(args.links / args.linksPerUser));
+  for (let i = 0; i < users; i++) {
+    const tgId = 900000 + i;
+    const u = await seedPool.query(
+      `INSERT INTO users (telegram_id, telegram_user_id, plan_name, lang) VALUES ($1, $2, 'platinum', 'pl') RETURNING id`,
+      [String(tgId), tgId]
+    );
+    await seedPool.query(
+      `INSERT INTO chat_notifications (chat_id, user_id, enabled, mode) VALUES ($1, $2, TRUE, 'single')`,
+      [String(tgId), u.rows[0].id]
+    );
+  }
+
+  for (let i = 0; i < args.links; i++) {
+    const search = i % Math.max(1, args.searches);
+    const source = search % 2 === 0 ? "olx" : "vinted";
+    const url =
+      source === "olx"
+        ? `${base}/olx/s${search}/q-bench/`
+        : `${base}/catalog?search_text=s${search}&order=newest_first`;
+    await seedPool.query(
+      `INSERT INTO links (user_id, name, url, source, active) VALUES ($1, $2, $3, $4, TRUE)`,
+      [1 + Math.floor(i / args.linksPerUser), `bench ${i}`, url, source]
+    );
+  }
+  return users;
+}
+
+// ---------- pomiar ----------
+
+function percentile(sorted, p) {
+  if (!sorted.length) return 0;
+  return sorted[Math.min(sorted.length - 1, Math.floor((p / 100) * sorted.length))];
+}
+
+const stages = new Map(); // "stage:source" -> ms[]
+worker.setStageObserver((stage, source, ms) => {
+  const k = `${stage}:${source}`;
+  if (!stages.has(k)) stages.set(k, []);
+  stages.get(k).push(ms);
+});
+
+async function runRound(round) {
+  currentRound = round;
+  stages.clear();
+  tgCalls.clear();
+  fixtureHits.olx = 0;
+  fixtureHits.vinted = 0;
+
+  const sentBefore = Number((await seedPool.query(`SELECT COUNT(*)::int AS n FROM sent_offers`)).rows[0].n);
+  const q0 = dbQueries;
+  const t0 = performance.now();
+
+  const log = console.log;
+  if (!args.verbose) console.log = () => {};
+  try {
+    await worker.loopOnce();
+  } finally {
+    console.log = log;
+  }
+
+  const wallMs = performance.now() - t0;
+  const queries = dbQueries - q0;
+  const sentAfter = Number((await seedPool.query(`SELECT COUNT(*)::int AS n FROM sent_offers`)).rows[0].n);
+  const sent = sentAfter - sentBefore;
+  const calls = [...tgCalls.values()].reduce((a, b) => a + b, 0);
+
+  const stageStats = {};
+  for (const [k, arr] of [...stages.entries()].sort()) {
+    const s = [...arr].sort((a, b) => a - b);
+    stageStats[k] = { n: s.length, p50: +percentile(s, 50).toFixed(2), p99: +percentile(s, 99).toFixed(2) };
+  }
+
+  return {
+    round,
+    links: args.links,
+    wallMs: Math.round(wallMs),
+    linksPerSec: +(args.links / (wallMs / 1000)).toFixed(2),
+    dbQueries: queries,
+    queriesPerLink: +(queries / args.links).toFixed(2),
+    scrapes: { ...fixtureHits },
+    sentOffers: sent,
+    expectedSent: round === 0 ? 0 : args.links * args.new,
+    tgCalls: Object.fromEntries(tgCalls),
+    tgCallsPerItem: sent ? +(calls / sent).toFixed(2) : 0,
+    stages: stageStats,
+  };
+}
+
+function printRound(r) {
+  console.log(
+    `\n[bench] round=${r.round} links=${r.links} wall_ms=${r.wallMs} links_per_sec=${r.linksPerSec} ` +
+      `db_queries=${r.dbQueries} queries_per_link=${r.queriesPerLink} ` +
+      `scrapes_olx=${r.scrapes.olx} scrapes_vinted=${r.scrapes.vinted} ` +
+      `sent=${r.sentOffers}/${r.expectedSent} tg_calls_per_item=${r.tgCallsPerItem}`
+  );
+  for (const [k, v] of Object.entries(r.stages)) {
+    console.log(`  ${k.padEnd(22)} n=${String(v.n).padStart(5)} p50_ms=${v.p50} p99_ms=${v.p99}`);
+  }
+}
+
+let exitCode = 0;
+try {
+  const users = await seed();
+  console.log(
+    `[bench] fixtures=${args.fixtures || "generated"} links=${args.links} searches=${args.searches} ` +
+      `users=${users} new_per_round=${args.new} rounds=${args.rounds}`
+  );
+
+  const results = [];
+  for (let round = 0; round < args.rounds; round++) {
+    const r = await runRound(round);
+    results.push(r);
+    if (!args.json) printRound(r);
+  }
+  if (args.json) console.log(JSON.stringify(results, null, 2));
+
+  if (args.ci) {
+    const steady = results.slice(1);
+    const maxQ = Number(process.env.BENCH_MAX_QUERIES_PER_LINK || 0);
+    const maxTg = Number(process.env.BENCH_MAX_TG_CALLS_PER_ITEM || 0);
+    const minLps = Number(process.env.BENCH_MIN_LINKS_PER_SEC || 0);
+    const fail = [];
+    for (const r of steady) {
+      if (r.sentOffers !== r.expectedSent) fail.push(`round ${r.round}: sent ${r.sentOffers} != expected ${r.expectedSent}`);
+      if (maxQ && r.queriesPerLink > maxQ) fail.push(`round ${r.round}: queries_per_link ${r.queriesPerLink} > ${maxQ}`);
+      if (maxTg && r.tgCallsPerItem > maxTg) fail.push(`round ${r.round}: tg_calls_per_item ${r.tgCallsPerItem} > ${maxTg}`);
+      if (minLps && r.linksPerSec < minLps) fail.push(`round ${r.round}: links_per_sec ${r.linksPerSec} < ${minLps}`);
+    }
+    if (fail.length) {
+      console.error(`[bench] FAIL\n  ${fail.join("\n  ")}`);
+      exitCode = 1;
+    } else {
+      console.log("[bench] OK");
+    }
+  }
+} catch (err) {
+  console.error("[bench] error", err);
+  exitCode = 1;
+} finally {
+  server.close();
+  await seedPool.end().catch(() => null);
+}
+
+// pool-e workera / LISTEN trzymają proces – kończymy jawnie
+process.exit(exitCode);
@@ -187,6 +187,19 @@ export const COMMAND_ALIASES = {
     cs: ["hromadne"],
     sk: ["hromadne"],
   },
+  album: {
+    en: ["album"],
+    pl: ["album"],
+    de: ["album"],
+    fr: ["album"],
+    it: ["album"],
+    es: ["album"],
+    pt: ["album"],
+    ro: ["album"],
+    nl: ["album"],
+    cs: ["album"],
+    sk: ["album"],
+  },
   cisza: {
     en: ["quiet", "silent"],
     pl: ["cisza"],
@@ -426,6 +439,7 @@ export function generateHelpText(lang, t) {
   const off = getPrimaryAlias("off", lang);
   const single = getPrimaryAlias("pojedyncze", lang);
   const batch = getPrimaryAlias("zbiorcze", lang);
+  const album = getPrimaryAlias("album", lang);
   const max = getPrimaryAlias("max", lang);
   const cisza = getPrimaryAlias("cisza", lang);
   const cisza_off = getPrimaryAlias("cisza_off", lang);
@@ -451,7 +465,8 @@ export function generateHelpText(lang, t) {
   help += `/${on} ${t(lang, "cmd.help_notif_on_desc")}\n`;
   help += `/${off} ${t(lang, "cmd.help_notif_off_desc")}\n`;
   help += `/${single} ${t(lang, "cmd.help_notif_single_desc")}\n`;
-  help += `/${batch} ${t(lang, "cmd.help_notif_batch_desc")}\n\n`;
+  help += `/${batch} ${t(lang, "cmd.help_notif_batch_desc")}\n`;
+  help += `/${album} ${t(lang, "cmd.help_notif_album_desc")}\n\n`;
   
   // Per-link controls
   help += t(lang, "cmd.help_perlink") + "\n";
@@ -1,16 +1,29 @@
-import pkg from "pg";
-const { Pool } = pkg;
-
-// Preferuj DATABASE_URL jeśli jest (Docker/produkcyjnie), inaczej PGHOST/PGUSER itd.
-const pool = process.env.DATABASE_URL
-  ? new Pool({ connectionString: process.env.DATABASE_URL })
-  : new Pool({
-      host: process.env.PGHOST,
-      port: process.env.PGPORT ? Number(process.env.PGPORT) : undefined,
-      user: process.env.PGUSER,
-      password: process.env.PGPASSWORD,
-      database: process.env.PGDATABASE,
-    });
+import { notifyUserReadChanged } from "./src/db/user-read-notify.js";
+import { pool, query, statement } from "./src/db/pool.js";
+
+// =======================
+// Zmiany danych widocznych w /status i historii
+// =======================
+
+// listenery w tym procesie (bot: read model) + NOTIFY fyd_user_read dla pozostałych
+const userDataListeners = new Set();
+
+export function onUserDataChanged(listener) {
+  userDataListeners.add(listener);
+  return () => userDataListeners.delete(listener);
+}
+
+function userDataChanged(userId, chatId = null) {
+  const change = { userId: userId != null ? Number(userId) : null, chatId: chatId != null ? String(chatId) : null };
+  for (const fn of userDataListeners) {
+    try {
+      fn(change);
+    } catch (err) {
+      console.error("[user-read] listener error", err?.message || err);
+    }
+  }
+  void notifyUserReadChanged(pool, { userIds: change.userId != null ? [change.userId] : [], chatId: change.chatId });
+}
 
 // =======================
 // Rozpoznawanie źródła (OLX / Vinted)
@@ -35,6 +48,106 @@ function defaultNameForUrl(urlString) {
   return "Monitorowanie";
 }
 
+// dzienne partycje parent_pYYYYMMDD (db_migrations/20261018_partition_history.sql)
+const ENSURE_DAILY_PARTITIONS_FN = `
+  CREATE OR REPLACE FUNCTION fyd_ensure_daily_partitions(parent TEXT, days_back INT, days_ahead INT)
+  RETURNS INT
+  LANGUAGE plpgsql
+  AS $$
+  DECLARE
+    d DATE;
+    part TEXT;
+    created INT := 0;
+  BEGIN
+    FOR d IN
+      SELECT g::date
+      FROM generate_series(CURRENT_DATE - days_back, CURRENT_DATE + days_ahead, INTERVAL '1 day') AS g
+    LOOP
+      part := format('%s_p%s', parent, to_char(d, 'YYYYMMDD'));
+      IF to_regclass(part) IS NULL THEN
+        BEGIN
+          EXECUTE format('CREATE TABLE %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)', part, parent, d, d + 1);
+          created := created + 1;
+        EXCEPTION WHEN others THEN
+          RAISE WARNING 'fyd_ensure_daily_partitions: % skipped: %', part, SQLERRM;
+        END;
+      END IF;
+    END LOOP;
+    RETURN created;
+  END
+  $$;
+`;
+
+// initDb() startuje równolegle na kilku replikach – DDL partycji pod wspólnym lockiem
+// (równoległe CREATE OR REPLACE FUNCTION -> "tuple concurrently updated",
+// CREATE TABLE IF NOT EXISTS ... PARTITION OF też nie jest odporne na wyścig)
+export const HISTORY_PARTITIONS_LOCK_KEY = 7203410519; // stały klucz pg_advisory_xact_lock
+
+async function withTransaction(fn) {
+  const client = await pool.connect();
+  try {
+    await client.query("BEGIN");
+    const out = await fn(client);
+    await client.query("COMMIT");
+    return out;
+  } catch (err) {
+    await client.query("ROLLBACK").catch(() => null);
+    throw err;
+  } finally {
+    client.release();
+  }
+}
+
+function withAdvisoryXactLock(key, fn) {
+  return withTransaction(async (client) => {
+    await client.query("SELECT pg_advisory_xact_lock($1::bigint)", [key]);
+    return fn(client);
+  });
+}
+
+// Partycjonowane link_items / sent_offers nie mają już unikalnego klucza na (link_id, item)
+// (klucz musi zawierać kolumnę partycji), więc NOT EXISTS + ON CONFLICT nie chroni przed
+// dwiema równoległymi transakcjami (np. replika, która przetrzymała LINK_LEASE_MS).
+// Insert historii idzie pod lockiem per (tabela, link_id) – locki w rosnącej kolejności id.
+export const LINK_DEDUPE_LOCK = { link_items: 7203411, sent_offers: 7203412 };
+
+export function withLinkDedupeLock(lockClass, linkIds, fn) {
+  const ids = [...new Set((linkIds || []).map(Number).filter(Number.isFinite))].sort((a, b) => a - b);
+  return withTransaction(async (client) => {
+    for (const id of ids) {
+      await client.query("SELECT pg_advisory_xact_lock($1::int, $2::int)", [lockClass, id]);
+    }
+    return fn(client);
+  });
+}
+
+// okno sprawdzania duplikatów = retencja partycji + 1 dzień zapasu; starsze partycje
+// i tak są usuwane, a warunek na kolumnie partycji pozwala pominąć je w planie (pruning)
+export const LINK_ITEMS_DEDUPE_DAYS = Number(process.env.LINK_ITEMS_RETENTION_DAYS || 5) + 1;
+export const SENT_OFFERS_DEDUPE_DAYS = Number(process.env.SENT_OFFERS_RETENTION_DAYS || 5) + 1;
+
+export async function isPartitionedTable(table) {
+  const q = await pool.query(
+    `SELECT c.relkind = 'p' AS partitioned FROM pg_class c WHERE c.oid = to_regclass($1)`,
+    [table]
+  );
+  return !!q.rows[0]?.partitioned;
+}
+
+// partycje na najbliższe dni (+ DEFAULT jako siatka bezpieczeństwa); maintenance robi to codziennie
+export async function ensureHistoryPartitions(daysAhead = 14) {
+  const out = {};
+  for (const table of ["link_items", "sent_offers"]) {
+    if (!(await isPartitionedTable(table))) continue;
+    out[table] = await withAdvisoryXactLock(HISTORY_PARTITIONS_LOCK_KEY, async (client) => {
+      const q = await client.query(`SELECT fyd_ensure_daily_partitions($1, 0, $2) AS created`, [table, daysAhead]);
+      await client.query(`CREATE TABLE IF NOT EXISTS ${table}_default PARTITION OF ${table} DEFAULT`);
+      return Number(q.rows[0]?.created) || 0;
+    });
+  }
+  return out;
+}
+
 // =======================
 // Inicjalizacja bazy
 // =======================
@@ -98,10 +211,12 @@ export async function initDb() {
     ADD COLUMN IF NOT EXISTS filters JSONB;
   `);
 
-  // historia ogłoszeń
+  await withAdvisoryXactLock(HISTORY_PARTITIONS_LOCK_KEY, (client) => client.query(ENSURE_DAILY_PARTITIONS_FN));
+
+  // historia ogłoszeń – partycje dzienne po first_seen_at (retencja = DROP partycji)
   await pool.query(`
     CREATE TABLE IF NOT EXISTS link_items (
-      id SERIAL PRIMARY KEY,
+      id SERIAL,
       link_id INTEGER NOT NULL REFERENCES links(id) ON DELETE CASCADE,
       item_key TEXT NOT NULL,
       title TEXT,
@@ -111,23 +226,34 @@ export async function initDb() {
       size TEXT,
       condition TEXT,
       url TEXT,
-      first_seen_at TIMESTAMP DEFAULT NOW(),
-      UNIQUE(link_id, item_key)
-    );
+      first_seen_at TIMESTAMP NOT NULL DEFAULT NOW(),
+      PRIMARY KEY (id, first_seen_at),
+      UNIQUE(link_id, item_key, first_seen_at)
+    ) PARTITION BY RANGE (first_seen_at);
   `);
 
-  // indeks pod pruning + szybkie pobieranie najnowszych
+  // indeks pod pruning (cutoff row) + szybkie pobieranie najnowszych
+  // (db_migrations/20261018_link_items_prune_index.sql)
   await pool.query(`
-    CREATE INDEX IF NOT EXISTS link_items_link_id_first_seen_idx
-    ON link_items (link_id, first_seen_at DESC);
+    CREATE INDEX IF NOT EXISTS link_items_link_first_seen_id_idx
+    ON link_items (link_id, first_seen_at DESC, id DESC);
   `);
 
-  // jeśli w jakiejś instancji macie BIGINT id dorzucony ręcznie – utrzymuj unikalność
   await pool.query(`
-    CREATE UNIQUE INDEX IF NOT EXISTS link_items_id_uniq
-    ON link_items (id);
+    CREATE INDEX IF NOT EXISTS link_items_link_price_idx
+    ON link_items (link_id, price) INCLUDE (first_seen_at)
+    WHERE price IS NOT NULL;
   `);
 
+  // jeśli w jakiejś instancji macie BIGINT id dorzucony ręcznie – utrzymuj unikalność
+  // (tylko stary, niepartycjonowany układ – unikalny indeks partycjonowanej tabeli musi zawierać first_seen_at)
+  if (!(await isPartitionedTable("link_items"))) {
+    await pool.query(`
+      CREATE UNIQUE INDEX IF NOT EXISTS link_items_id_uniq
+      ON link_items (id);
+    `);
+  }
+
   // tabela powiadomień per czat
   await pool.query(`
     CREATE TABLE IF NOT EXISTS chat_notifications (
@@ -194,10 +320,40 @@ export async function initDb() {
     ADD COLUMN IF NOT EXISTS max_items_per_loop INTEGER NULL;
   `);
 
-  // historia faktycznie wysłanych ofert (SoT dla limitów i komend historii)
+  // leasing linków między replikami workera + wspólna kadencja (db_migrations/20261018_links_leasing.sql)
+  await pool.query(`
+    ALTER TABLE links
+    ADD COLUMN IF NOT EXISTS lease_owner TEXT NULL,
+    ADD COLUMN IF NOT EXISTS lease_until TIMESTAMPTZ NULL,
+    ADD COLUMN IF NOT EXISTS next_poll_at TIMESTAMPTZ NULL,
+    ADD COLUMN IF NOT EXISTS poll_interval_ms INTEGER NULL;
+  `);
+
+  await pool.query(`
+    CREATE INDEX IF NOT EXISTS links_active_next_poll_idx
+    ON links (next_poll_at NULLS FIRST)
+    WHERE active = TRUE;
+  `);
+
+  // file_id zdjęć wysłanych do Telegrama – ponowna wysyłka bez pobierania obrazka (db_migrations/20261018_tg_photo_file_ids.sql)
+  await pool.query(`
+    CREATE TABLE IF NOT EXISTS tg_photo_file_ids (
+      photo_url TEXT PRIMARY KEY,
+      file_id TEXT NOT NULL,
+      created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+      last_used_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+    );
+  `);
+
+  await pool.query(`
+    CREATE INDEX IF NOT EXISTS tg_photo_file_ids_last_used_idx
+    ON tg_photo_file_ids (last_used_at);
+  `);
+
+  // historia faktycznie wysłanych ofert (SoT dla limitów i komend historii) – partycje dzienne po sent_at
   await pool.query(`
     CREATE TABLE IF NOT EXISTS sent_offers (
-      id BIGSERIAL PRIMARY KEY,
+      id BIGSERIAL,
       user_id INTEGER NOT NULL,
       chat_id TEXT NOT NULL,
       link_id INTEGER NOT NULL,
@@ -207,13 +363,15 @@ export async function initDb() {
       title TEXT NULL,
       url TEXT NULL,
       sent_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
-      UNIQUE (chat_id, link_id, item_id)
-    );
+      PRIMARY KEY (id, sent_at),
+      UNIQUE (chat_id, link_id, item_id, sent_at)
+    ) PARTITION BY RANGE (sent_at);
   `);
 
+  // covering: limit dzienny i filtr ceny bez sięgania do wierszy
   await pool.query(`
     CREATE INDEX IF NOT EXISTS sent_offers_user_chat_sent_at_idx
-    ON sent_offers (user_id, chat_id, sent_at DESC);
+    ON sent_offers (user_id, chat_id, sent_at DESC) INCLUDE (link_id, price);
   `);
 
   await pool.query(`
@@ -226,6 +384,14 @@ export async function initDb() {
     ON sent_offers (user_id, chat_id, sent_at DESC, price ASC);
   `);
 
+  await pool.query(`
+    CREATE INDEX IF NOT EXISTS sent_offers_link_price_idx
+    ON sent_offers (link_id, price) INCLUDE (user_id, chat_id, sent_at)
+    WHERE price IS NOT NULL;
+  `);
+
+  await ensureHistoryPartitions();
+
   // Admin audit log (KROK 6)
   await pool.query(`
     CREATE TABLE IF NOT EXISTS public.admin_audit_log (
@@ -397,6 +563,7 @@ export async function setLinkNotificationMode(userId, chatId, linkId, mode) {
     `,
     [Number(userId), String(chatId), Number(linkId), String(mode)]
   );
+  userDataChanged(userId, chatId);
 }
 
 export async function clearLinkNotificationMode(userId, chatId, linkId) {
@@ -404,6 +571,7 @@ export async function clearLinkNotificationMode(userId, chatId, linkId) {
     `DELETE FROM link_notification_modes WHERE user_id=$1 AND chat_id=$2 AND link_id=$3`,
     [Number(userId), String(chatId), Number(linkId)]
   );
+  userDataChanged(userId, chatId);
 }
 
 export async function resetLinkOverridesForUserId(linkId, userId, chatId) {
@@ -424,6 +592,7 @@ export async function resetLinkOverridesForUserId(linkId, userId, chatId) {
     );
     
     await client.query('COMMIT');
+    userDataChanged(userId, chatId);
     return res.rows[0] || null;
   } catch (err) {
     await client.query('ROLLBACK');
@@ -528,6 +697,7 @@ export async function insertLink(telegramId, name, url, chatId = null, threadId
       threadId != null ? String(threadId) : null
     ]
   );
+  userDataChanged(user.id);
   return q.rows[0] || null;
 }
 
@@ -539,6 +709,7 @@ export async function deleteLink(linkId, telegramId) {
     `DELETE FROM links WHERE id = $1 AND user_id = $2 RETURNING id`,
     [Number(linkId), Number(user.id)]
   );
+  if (q.rowCount) userDataChanged(user.id);
   return !!q.rowCount;
 }
 
@@ -578,6 +749,7 @@ export async function insertLinkForUserId(userId, name, url, chatId = null, thre
       threadId != null ? String(threadId) : null
     ]
   );
+  userDataChanged(userId);
   return q.rows[0] || null;
 }
 
@@ -591,6 +763,7 @@ export async function deactivateLinkForUserId(linkId, userId) {
     `,
     [Number(linkId), Number(userId)]
   );
+  if (q.rowCount) userDataChanged(userId);
   return q.rows[0] || null;
 }
 
@@ -604,6 +777,7 @@ export async function updateLinkNameForUserId(linkId, userId, newName) {
     `,
     [Number(linkId), Number(userId), newName]
   );
+  if (q.rowCount) userDataChanged(userId);
   return q.rows[0] || null;
 }
 
@@ -625,22 +799,76 @@ function __fydParsePrice(raw) {
 export async function getLinksForWorker() {
   const q = await pool.query(
     `
-    SELECT id, user_id, name, url, source, active, chat_id, thread_id, last_key, filters, max_items_per_loop
-    FROM links
-    WHERE active = TRUE
-    ORDER BY id ASC
+    SELECT l.id, l.user_id, l.name, l.url, l.source, l.active, l.chat_id, l.thread_id,
+           l.last_key, l.last_seen_at, l.filters, l.max_items_per_loop,
+           l.next_poll_at, l.poll_interval_ms,
+           u.telegram_user_id
+    FROM links l
+    LEFT JOIN users u ON u.id = l.user_id
+    WHERE l.active = TRUE
+    ORDER BY l.id ASC
     `
   );
   return q.rows || [];
 }
 
+/**
+ * Limity planu dla wielu userów naraz (worker) – to samo co features w /me,
+ * ale jednym zapytaniem zamiast HTTP per user. Zwraca Map tgId -> { userId, limits }.
+ */
+export async function getWorkerUserLimits(telegramIds = []) {
+  const ids = [...new Set((telegramIds || []).map((x) => String(x || "").trim()).filter(Boolean))];
+  const out = new Map();
+  if (!ids.length) return out;
+
+  const q = await pool.query(
+    `
+    SELECT
+      u.id AS user_id,
+      u.telegram_user_id::text AS tg_id,
+      LOWER(MAX(COALESCE(NULLIF(ent.plan_code, ''), u.plan_name))) AS plan_code,
+      COALESCE(
+        jsonb_object_agg(pf.feature_key, to_jsonb(pf.feature_value))
+          FILTER (WHERE pf.feature_key IS NOT NULL),
+        '{}'::jsonb
+      ) AS features
+    FROM users u
+    LEFT JOIN user_entitlements_v ent ON ent.user_id = u.id
+    -- jak /me: plan z entitlements, bez wiersza – users.plan_name
+    LEFT JOIN plans p ON p.code = LOWER(COALESCE(NULLIF(ent.plan_code, ''), NULLIF(u.plan_name, '')))
+    LEFT JOIN plan_features pf ON pf.plan_id = p.id
+    WHERE u.telegram_user_id::text = ANY($1::text[])
+    GROUP BY u.id, u.telegram_user_id
+    `,
+    [ids]
+  );
+
+  for (const r of q.rows || []) {
+    const f = r.features || {};
+    out.set(String(r.tg_id), {
+      userId: Number(r.user_id),
+      limits: {
+        sources_allowed: Array.isArray(f.sources_allowed) ? f.sources_allowed : null,
+        history_keep_per_link: Number(f.history_keep_per_link || 0) || null,
+        max_items_per_link_per_loop: Number(f.max_items_per_link_per_loop || 0) || null,
+        links_limit: Number(f.links_limit || 0) || null,
+        plan_code: r.plan_code || null,
+        poll_interval_min_sec: Number(f.poll_interval_min_sec || 0) || null,
+      },
+    });
+  }
+  return out;
+}
+
+const GET_SEEN_ITEM_KEYS = statement(
+  "getSeenItemKeys",
+  `SELECT item_key FROM link_items WHERE link_id = $1 AND item_key = ANY($2::text[])`
+);
+
 export async function getSeenItemKeys(linkId, keys = []) {
   const arr = Array.isArray(keys) ? keys.filter(Boolean).map(String) : [];
   if (!arr.length) return new Set();
-  const q = await pool.query(
-    `SELECT item_key FROM link_items WHERE link_id = $1 AND item_key = ANY($2::text[])`,
-    [Number(linkId), arr]
-  );
+  const q = await query(GET_SEEN_ITEM_KEYS, [Number(linkId), arr]);
   return new Set((q.rows || []).map(r => r.item_key));
 }
 
@@ -667,8 +895,9 @@ export async function insertLinkItems(linkId, items = []) {
       await pool.query(
         `
         INSERT INTO link_items (link_id, item_key, title, price, currency, brand, size, condition, url)
-        VALUES ($1,$2,$3,$4,$5,$6,$7,$8,$9)
-        ON CONFLICT (link_id, item_key) DO NOTHING
+        SELECT $1::int, $2::text, $3::text, $4::numeric, $5::text, $6::text, $7::text, $8::text, $9::text
+        WHERE NOT EXISTS (SELECT 1 FROM link_items li WHERE li.link_id = $1 AND li.item_key = $2)
+        ON CONFLICT DO NOTHING
         `,
         [Number(linkId), item_key, title, pp.price, pp.currency, brand, size, condition, url]
       );
@@ -680,35 +909,271 @@ export async function insertLinkItems(linkId, items = []) {
   return inserted;
 }
 
-export async function updateLastKey(linkId, lastKey) {
-  await pool.query(
-    `
+const UPDATE_LAST_KEY = statement(
+  "updateLastKey",
+  `
     UPDATE links
     SET last_key = $2,
         last_seen_at = NOW()
     WHERE id = $1
+  `
+);
+
+export async function updateLastKey(linkId, lastKey) {
+  await query(UPDATE_LAST_KEY, [Number(linkId), lastKey ? String(lastKey) : null]);
+  return true;
+}
+
+export async function pruneLinkItems(linkId, keep = 500, client = pool) {
+  return pruneLinkItemsBatch([{ linkId, keep }], client);
+}
+
+/**
+ * Przycina historię wielu linków jednym zapytaniem.
+ * Dla każdego linku szukamy "cutoff row" (keep-ty najnowszy wiersz) po indeksie
+ * (link_id, first_seen_at DESC, id DESC) i kasujemy wszystko od niego starsze –
+ * bez NOT IN po całej historii linku.
+ */
+export async function pruneLinkItemsBatch(entries = [], client = pool) {
+  const linkIds = [];
+  const keeps = [];
+  for (const e of Array.isArray(entries) ? entries : []) {
+    const id = Number(e?.linkId);
+    const k = Number(e?.keep);
+    if (!Number.isFinite(id) || !Number.isFinite(k) || k <= 0) continue;
+    linkIds.push(id);
+    keeps.push(Math.floor(k));
+  }
+  if (!linkIds.length) return 0;
+
+  const q = await client.query(
+    `
+    WITH t AS (
+      SELECT * FROM UNNEST($1::int[], $2::int[]) AS t(link_id, keep)
+    ),
+    cutoff AS (
+      SELECT t.link_id, c.first_seen_at, c.id
+      FROM t
+      CROSS JOIN LATERAL (
+        SELECT li.first_seen_at, li.id
+        FROM link_items li
+        WHERE li.link_id = t.link_id
+        ORDER BY li.first_seen_at DESC, li.id DESC
+        OFFSET t.keep
+        LIMIT 1
+      ) c
+    )
+    DELETE FROM link_items li
+    USING cutoff
+    WHERE li.link_id = cutoff.link_id
+      AND (li.first_seen_at, li.id) <= (cutoff.first_seen_at, cutoff.id)
     `,
-    [Number(linkId), lastKey ? String(lastKey) : null]
+    [linkIds, keeps]
   );
-  return true;
+  return q.rowCount || 0;
+}
+
+// ===== Worker: ścieżka bulk (seen-check + insert w 1 zapytaniu) =====
+function __fydLinkItemRow(it) {
+  const item_key = String(it?.item_key || it?.itemKey || it?.key || it?.url || "").trim();
+  if (!item_key) return null;
+
+  const raw = it?.rawPrice ?? it?.price ?? null;
+  const pp = __fydParsePrice(raw);
+
+  return {
+    item_key,
+    title: it?.title ? String(it.title).trim() : null,
+    price: pp.price,
+    currency: pp.currency,
+    brand: it?.brand ? String(it.brand) : null,
+    size: it?.size ? String(it.size) : null,
+    condition: it?.condition ? String(it.condition) : null,
+    url: it?.url ? String(it.url).trim() : null,
+  };
+}
+
+/**
+ * Wstawia wszystkie itemy jednym INSERT ... SELECT FROM unnest(...)
+ * i zwraca Set item_key faktycznie wstawionych (= dotąd nie widzianych).
+ * Zastępuje parę getSeenItemKeys + insertLinkItems w workerze.
+ */
+export async function insertNewLinkItems(linkId, items = []) {
+  const rows = [];
+  const seen = new Set();
+  for (const it of Array.isArray(items) ? items : []) {
+    const r = __fydLinkItemRow(it);
+    if (!r || seen.has(r.item_key)) continue;
+    seen.add(r.item_key);
+    rows.push(r);
+  }
+  if (!rows.length) return new Set();
+
+  const q = await withLinkDedupeLock(LINK_DEDUPE_LOCK.link_items, [linkId], (client) => client.query(
+    `
+    INSERT INTO link_items (link_id, item_key, title, price, currency, brand, size, condition, url)
+    SELECT $1, x.item_key, x.title, x.price, x.currency, x.brand, x.size, x.condition, x.url
+    FROM UNNEST(
+      $2::text[],
+      $3::text[],
+      $4::numeric[],
+      $5::text[],
+      $6::text[],
+      $7::text[],
+      $8::text[],
+      $9::text[]
+    ) AS x(item_key, title, price, currency, brand, size, condition, url)
+    WHERE NOT EXISTS (
+      SELECT 1 FROM link_items li
+      WHERE li.link_id = $1 AND li.item_key = x.item_key
+        AND li.first_seen_at >= NOW() - $10::int * INTERVAL '1 day'
+    )
+    ON CONFLICT DO NOTHING
+    RETURNING item_key
+    `,
+    [
+      Number(linkId),
+      rows.map((r) => r.item_key),
+      rows.map((r) => r.title),
+      rows.map((r) => r.price),
+      rows.map((r) => r.currency),
+      rows.map((r) => r.brand),
+      rows.map((r) => r.size),
+      rows.map((r) => r.condition),
+      rows.map((r) => r.url),
+      LINK_ITEMS_DEDUPE_DAYS,
+    ]
+  ));
+  return new Set((q.rows || []).map((r) => r.item_key));
+}
+
+/**
+ * Koniec przebiegu linku: last_key + przycięcie historii w jednej transakcji.
+ */
+export async function finishLinkPass(linkId, lastKey, keep = 0) {
+  const client = await pool.connect();
+  try {
+    await client.query("BEGIN");
+
+    if (lastKey) {
+      await client.query(
+        `UPDATE links SET last_key = $2, last_seen_at = NOW() WHERE id = $1`,
+        [Number(linkId), String(lastKey)]
+      );
+    }
+
+    const pruned = await pruneLinkItems(linkId, keep, client);
+
+    await client.query("COMMIT");
+    return { pruned };
+  } catch (err) {
+    await client.query("ROLLBACK").catch(() => null);
+    throw err;
+  } finally {
+    client.release();
+  }
 }
 
-export async function pruneLinkItems(linkId, keep = 500) {
-  const k = Number(keep);
-  if (!Number.isFinite(k) || k <= 0) return 0;
+// =======================
+// Leasing linków (wiele replik workera)
+// =======================
+
+const HAS_DUE_LINKS = statement(
+  "hasDueLinks",
+  `
+    SELECT EXISTS (
+      SELECT 1
+      FROM links
+      WHERE active = TRUE
+        AND (next_poll_at IS NULL OR next_poll_at <= NOW())
+        AND (lease_until IS NULL OR lease_until < NOW() OR lease_owner = $1)
+    ) AS due
+  `
+);
+
+/**
+ * Tani test przed pełną pętlą: czy jakiś aktywny, niezajęty link ma termin (next_poll_at).
+ */
+export async function hasDueLinks(owner) {
+  const q = await query(HAS_DUE_LINKS, [String(owner || "")]);
+  return q.rows?.[0]?.due === true;
+}
+
+/**
+ * Zajmij linki do przetworzenia (FOR UPDATE SKIP LOCKED + lease_until).
+ * dueIds – tylko jeśli next_poll_at minął, rideIds – bez sprawdzania next_poll_at
+ * (to samo wyszukiwanie i tak jest pobierane). Zwraca świeże wiersze zajętych linków.
+ */
+export async function claimLinkLeases(owner, { dueIds = [], rideIds = [], leaseMs = 120000, limit = 50 } = {}) {
+  const due = (dueIds || []).map(Number).filter(Number.isFinite);
+  const ride = (rideIds || []).map(Number).filter(Number.isFinite);
+  if (!due.length && !ride.length) return [];
 
   const q = await pool.query(
     `
-    DELETE FROM link_items
-    WHERE link_id = $1
-      AND id NOT IN (
-        SELECT id FROM link_items
-        WHERE link_id = $1
-        ORDER BY first_seen_at DESC, id DESC
-        LIMIT $2
-      )
+    WITH c AS (
+      SELECT id
+      FROM links
+      WHERE active = TRUE
+        AND (id = ANY($1::int[]) OR id = ANY($2::int[]))
+        AND (lease_until IS NULL OR lease_until < NOW() OR lease_owner = $3)
+        AND (next_poll_at IS NULL OR next_poll_at <= NOW() OR id = ANY($2::int[]))
+      ORDER BY (lease_owner = $3) DESC NULLS LAST, next_poll_at NULLS FIRST, id
+      LIMIT $5
+      FOR UPDATE SKIP LOCKED
+    )
+    UPDATE links l
+    SET lease_owner = $3,
+        lease_until = NOW() + ($4::int * INTERVAL '1 millisecond')
+    FROM c
+    WHERE l.id = c.id
+    RETURNING l.id, l.url, l.source, l.active, l.chat_id, l.thread_id,
+              l.last_key, l.last_seen_at, l.filters, l.max_items_per_loop
     `,
-    [Number(linkId), k]
+    [due, ride, String(owner), Math.max(1000, Number(leaseMs) || 0), Math.max(1, Number(limit) || 1)]
+  );
+  return q.rows || [];
+}
+
+// heartbeat – przedłuż lease trzymanych linków
+export async function renewLinkLeases(owner, linkIds = [], leaseMs = 120000) {
+  const ids = (linkIds || []).map(Number).filter(Number.isFinite);
+  if (!ids.length) return 0;
+  const q = await pool.query(
+    `
+    UPDATE links
+    SET lease_until = NOW() + ($3::int * INTERVAL '1 millisecond')
+    WHERE id = ANY($2::int[]) AND lease_owner = $1
+    `,
+    [String(owner), ids, Math.max(1000, Number(leaseMs) || 0)]
+  );
+  return q.rowCount || 0;
+}
+
+// po processLink: zwolnij lease + zapisz kadencję (wspólna dla replik)
+export async function releaseLinkLease(owner, linkId, { nextPollAt = null, pollIntervalMs = null } = {}) {
+  await pool.query(
+    `
+    UPDATE links
+    SET lease_until = NULL,
+        next_poll_at = COALESCE($3::timestamptz, next_poll_at),
+        poll_interval_ms = COALESCE($4::int, poll_interval_ms)
+    WHERE id = $2 AND lease_owner = $1
+    `,
+    [
+      String(owner),
+      Number(linkId),
+      nextPollAt ? new Date(nextPollAt) : null,
+      Number.isFinite(Number(pollIntervalMs)) && pollIntervalMs != null ? Math.round(Number(pollIntervalMs)) : null,
+    ]
+  );
+}
+
+// shutdown repliki – oddaj wszystko od razu (bez czekania na wygaśnięcie)
+export async function releaseAllLinkLeases(owner) {
+  const q = await pool.query(
+    `UPDATE links SET lease_until = NULL WHERE lease_owner = $1 AND lease_until IS NOT NULL`,
+    [String(owner)]
   );
   return q.rowCount || 0;
 }
@@ -752,6 +1217,7 @@ export async function setQuietHours(chatId, fromHour, toHour) {
     `,
     [String(chatId), f, t]
   );
+  userDataChanged(null, chatId);
   return q.rows[0] || null;
 }
 
@@ -767,6 +1233,7 @@ export async function disableQuietHours(chatId) {
     `,
     [String(chatId)]
   );
+  userDataChanged(null, chatId);
   return q.rows[0] || null;
 }
 
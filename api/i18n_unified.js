@@ -1,4 +1,5 @@
 // Unified i18n system with EN as base and hard fallback
+import { compileCatalog } from "./src/i18n/catalog.js";
 
 const TRANSLATIONS = {
   en: {
@@ -48,6 +49,7 @@ const TRANSLATIONS = {
       help_notif_off_desc: "– disable",
       help_notif_single_desc: "– single cards",
       help_notif_batch_desc: "– batch list",
+      help_notif_album_desc: "– photo albums (up to 10 offers per message)",
       help_value: "value",
       help_perlink_max_desc: "– limit items per loop (e.g. /max 18 3 or /max 18 off)",
       help_quiet_show_desc: "– show",
@@ -151,6 +153,8 @@ const TRANSLATIONS = {
       disabled: "⛔ Notifications DISABLED for this chat.",
       mode_single: "📨 Mode set: <b>single</b> (default for this chat).",
       mode_batch: "📦 Mode set: <b>batch</b> (default for this chat).",
+      mode_album: "🖼 Mode set: <b>album</b> (default for this chat).",
+      album_more: "+ {count} more offers – /{command} {id}",
     },
     
     // Quiet hours
@@ -209,6 +213,7 @@ const TRANSLATIONS = {
     mode: {
       single: "single",
       batch: "batch",
+      album: "album",
       off: "off",
     },
     
@@ -321,6 +326,7 @@ const TRANSLATIONS = {
       help_notif_off_desc: "– wyłącz",
       help_notif_single_desc: "– pojedyncze karty",
       help_notif_batch_desc: "– zbiorcza lista",
+      help_notif_album_desc: "– albumy zdjęć (do 10 ofert w jednej wiadomości)",
       help_value: "wartość",
       help_perlink_max_desc: "– limit ofert na pętlę (np. /max 18 3 lub /max 18 off)",
       help_quiet_show_desc: "– pokaż",
@@ -439,6 +445,8 @@ const TRANSLATIONS = {
       disabled: "⛔ Powiadomienia WYŁĄCZONE na tym czacie.",
       mode_single: "📨 Ustawiono tryb: <b>pojedynczo</b> (domyślny na tym czacie).",
       mode_batch: "📦 Ustawiono tryb: <b>zbiorczo</b> (domyślny na tym czacie).",
+      mode_album: "🖼 Ustawiono tryb: <b>album</b> (domyślny na tym czacie).",
+      album_more: "+ {count} dodatkowych ofert – /{command} {id}",
     },
     
     quiet: {
@@ -492,6 +500,7 @@ const TRANSLATIONS = {
     mode: {
       single: "pojedyncze",
       batch: "zbiorcze",
+      album: "album",
       off: "wyłączone",
     },
     
@@ -544,6 +553,7 @@ const TRANSLATIONS = {
       help_notif_off_desc: "– deaktivieren",
       help_notif_single_desc: "– einzelne Karten",
       help_notif_batch_desc: "– gesammelte Liste",
+      help_notif_album_desc: "– Fotoalben (bis zu 10 Angebote pro Nachricht)",
       help_value: "Wert",
       help_perlink_max_desc: "– Artikel pro Schleife begrenzen (z.B. /max 18 3 oder /max 18 off)",
       help_quiet_show_desc: "– anzeigen",
@@ -625,6 +635,8 @@ const TRANSLATIONS = {
       disabled: "⛔ Benachrichtigungen DEAKTIVIERT für diesen Chat.",
       mode_single: "📨 Modus setzen: <b>einzeln</b> (default für diesen Chat).",
       mode_batch: "📦 Modus setzen: <b>gesammelt</b> (default für diesen Chat).",
+      mode_album: "🖼 Modus setzen: <b>Album</b> (default für diesen Chat).",
+      album_more: "+ {count} weitere Angebote – /{command} {id}",
     },
     
     // Quiet hours
@@ -683,6 +695,7 @@ const TRANSLATIONS = {
     mode: {
       single: "einzeln",
       batch: "gesammelt",
+      album: "Album",
       off: "aus",
     },
     
@@ -790,6 +803,7 @@ const TRANSLATIONS = {
       help_notif_off_desc: "– désactiver",
       help_notif_single_desc: "– cartes uniques",
       help_notif_batch_desc: "– liste groupée",
+      help_notif_album_desc: "– albums photo (jusqu'à 10 offres par message)",
       help_value: "valeur",
       help_perlink_max_desc: "– limiter les articles par boucle (par ex. /max 18 3 ou /max 18 off)",
       help_quiet_show_desc: "– afficher",
@@ -871,6 +885,8 @@ const TRANSLATIONS = {
       disabled: "⛔ Notifications DÉSACTIVÉ pour ce chat.",
       mode_single: "📨 Mode définir: <b>unique</b> (default pour ce chat).",
       mode_batch: "📦 Mode définir: <b>groupe</b> (default pour ce chat).",
+      mode_album: "🖼 Mode définir: <b>album</b> (default pour ce chat).",
+      album_more: "+ {count} offres supplémentaires – /{command} {id}",
     },
     
     // Quiet hours
@@ -929,6 +945,7 @@ const TRANSLATIONS = {
     mode: {
       single: "unique",
       batch: "groupé",
+      album: "album",
       off: "désactivé",
     },
     
@@ -1036,6 +1053,7 @@ const TRANSLATIONS = {
       help_notif_off_desc: "– disattivare",
       help_notif_single_desc: "– carte singole",
       help_notif_batch_desc: "– lista di gruppo",
+      help_notif_album_desc: "– album di foto (fino a 10 offerte per messaggio)",
       help_value: "valore",
       help_perlink_max_desc: "– limitare gli articoli per ciclo (es. /max 18 3 o /max 18 off)",
       help_quiet_show_desc: "– mostrare",
@@ -1117,6 +1135,8 @@ const TRANSLATIONS = {
       disabled: "⛔ notifiche DISATTIVATO per questa chat.",
       mode_single: "📨 Modalità impostare: <b>singola</b> (default per questa chat).",
       mode_batch: "📦 Modalità impostare: <b>gruppo</b> (default per questa chat).",
+      mode_album: "🖼 Modalità impostare: <b>album</b> (default per questa chat).",
+      album_more: "+ {count} offerte aggiuntive – /{command} {id}",
     },
     
     // Quiet hours
@@ -1175,6 +1195,7 @@ const TRANSLATIONS = {
     mode: {
       single: "singolo",
       batch: "raggruppato",
+      album: "album",
       off: "disattivato",
     },
     
@@ -1282,6 +1303,7 @@ const TRANSLATIONS = {
       help_notif_off_desc: "– desactivar",
       help_notif_single_desc: "– tarjetas individuales",
       help_notif_batch_desc: "– lista por lotes",
+      help_notif_album_desc: "– álbumes de fotos (hasta 10 ofertas por mensaje)",
       help_value: "valor",
       help_perlink_max_desc: "– limitar artículos por ciclo (ej. /max 18 3 o /max 18 off)",
       help_quiet_show_desc: "– mostrar",
@@ -1363,6 +1385,8 @@ const TRANSLATIONS = {
       disabled: "⛔ notificaciones DESACTIVADO para este chat.",
       mode_single: "📨 Modo establecer: <b>individual</b> (default para este chat).",
       mode_batch: "📦 Modo establecer: <b>lote</b> (default para este chat).",
+      mode_album: "🖼 Modo establecer: <b>álbum</b> (default para este chat).",
+      album_more: "+ {count} ofertas más – /{command} {id}",
     },
     
     // Quiet hours
@@ -1421,6 +1445,7 @@ const TRANSLATIONS = {
     mode: {
       single: "individual",
       batch: "agrupado",
+      album: "álbum",
       off: "desactivado",
     },
     
@@ -1528,6 +1553,7 @@ const TRANSLATIONS = {
       help_notif_off_desc: "– desativar",
       help_notif_single_desc: "– cartões individuais",
       help_notif_batch_desc: "– lista em lote",
+      help_notif_album_desc: "– álbuns de fotos (até 10 ofertas por mensagem)",
       help_value: "valor",
       help_perlink_max_desc: "– limitar itens por ciclo (ex. /max 18 3 ou /max 18 off)",
       help_quiet_show_desc: "– mostrar",
@@ -1609,6 +1635,8 @@ const TRANSLATIONS = {
       disabled: "⛔ notificações DESATIVADO para este chat.",
       mode_single: "📨 Modo definir: <b>individual</b> (default para este chat).",
       mode_batch: "📦 Modo definir: <b>lote</b> (default para este chat).",
+      mode_album: "🖼 Modo definir: <b>álbum</b> (default para este chat).",
+      album_more: "+ {count} ofertas adicionais – /{command} {id}",
     },
     
     // Quiet hours
@@ -1667,6 +1695,7 @@ const TRANSLATIONS = {
     mode: {
       single: "individual",
       batch: "agrupado",
+      album: "álbum",
       off: "desactivado",
     },
     
@@ -1774,6 +1803,7 @@ const TRANSLATIONS = {
       help_notif_off_desc: "– deaktivovat",
       help_notif_single_desc: "– jednotlivé karty",
       help_notif_batch_desc: "– dávkový seznam",
+      help_notif_album_desc: "– fotoalba (až 10 nabídek v jedné zprávě)",
       help_value: "hodnota",
       help_perlink_max_desc: "– omezit položky na cyklus (např. /max 18 3 nebo /max 18 off)",
       help_quiet_show_desc: "– zobrazit",
@@ -1855,6 +1885,8 @@ const TRANSLATIONS = {
       disabled: "⛔ oznámení DEAKTIVOVÁNO pro tento chat.",
       mode_single: "📨 Režim nastavit: <b>jednotlivé</b> (default pro tento chat).",
       mode_batch: "📦 Režim nastavit: <b>dávkové</b> (default pro tento chat).",
+      mode_album: "🖼 Režim nastavit: <b>album</b> (default pro tento chat).",
+      album_more: "+ {count} dalších nabídek – /{command} {id}",
     },
     
     // Quiet hours
@@ -1913,6 +1945,7 @@ const TRANSLATIONS = {
     mode: {
       single: "jednotlivé",
       batch: "dávka",
+      album: "album",
       off: "vypnuto",
     },
     
@@ -2020,6 +2053,7 @@ const TRANSLATIONS = {
       help_notif_off_desc: "– deaktivovať",
       help_notif_single_desc: "– jednotlivé karty",
       help_notif_batch_desc: "– dávkový zoznam",
+      help_notif_album_desc: "– fotoalbumy (až 10 ponúk v jednej správe)",
       help_value: "hodnota",
       help_perlink_max_desc: "– obmedziť položky na cyklus (napr. /max 18 3 alebo /max 18 off)",
       help_quiet_show_desc: "– zobraziť",
@@ -2101,6 +2135,8 @@ const TRANSLATIONS = {
       disabled: "⛔ upozornenia DEAKTIVOVANÉ pre tento chat.",
       mode_single: "📨 Režim nastaviť: <b>jednotlivé</b> (default pre tento chat).",
       mode_batch: "📦 Režim nastaviť: <b>dávkové</b> (default pre tento chat).",
+      mode_album: "🖼 Režim nastaviť: <b>album</b> (default pre tento chat).",
+      album_more: "+ {count} ďalších ponúk – /{command} {id}",
     },
     
     // Quiet hours
@@ -2159,6 +2195,7 @@ const TRANSLATIONS = {
     mode: {
       single: "jednotlivé",
       batch: "dávka",
+      album: "album",
       off: "vypnuté",
     },
     
@@ -2266,6 +2303,7 @@ const TRANSLATIONS = {
       help_notif_off_desc: "– dezactivează",
       help_notif_single_desc: "– carduri individuale",
       help_notif_batch_desc: "– listă în lot",
+      help_notif_album_desc: "– albume foto (până la 10 oferte pe mesaj)",
       help_value: "valoare",
       help_perlink_max_desc: "– limitează articolele pe ciclu (ex. /max 18 3 sau /max 18 off)",
       help_quiet_show_desc: "– arată",
@@ -2347,6 +2385,8 @@ const TRANSLATIONS = {
       disabled: "⛔ notificări DEZACTIVAT pentru acest chat.",
       mode_single: "📨 Mod setează: <b>individual</b> (default pentru acest chat).",
       mode_batch: "📦 Mod setează: <b>lot</b> (default pentru acest chat).",
+      mode_album: "🖼 Mod setează: <b>album</b> (default pentru acest chat).",
+      album_more: "+ {count} oferte suplimentare – /{command} {id}",
     },
     
     // Quiet hours
@@ -2405,6 +2445,7 @@ const TRANSLATIONS = {
     mode: {
       single: "individual",
       batch: "grupat",
+      album: "album",
       off: "dezactivat",
     },
     
@@ -2512,6 +2553,7 @@ const TRANSLATIONS = {
       help_notif_off_desc: "– deactiveren",
       help_notif_single_desc: "– enkele kaarten",
       help_notif_batch_desc: "– batch lijst",
+      help_notif_album_desc: "– fotoalbums (tot 10 aanbiedingen per bericht)",
       help_value: "waarde",
       help_perlink_max_desc: "– beperk items per cyclus (bijv. /max 18 3 of /max 18 off)",
       help_quiet_show_desc: "– toon",
@@ -2593,6 +2635,8 @@ const TRANSLATIONS = {
       disabled: "⛔ meldingen GEDEACTIVEERD voor deze chat.",
       mode_single: "📨 Modus instellen: <b>enkel</b> (default voor deze chat).",
       mode_batch: "📦 Modus instellen: <b>batch</b> (default voor deze chat).",
+      mode_album: "🖼 Modus instellen: <b>album</b> (default voor deze chat).",
+      album_more: "+ {count} extra aanbiedingen – /{command} {id}",
     },
     
     // Quiet hours
@@ -2651,6 +2695,7 @@ const TRANSLATIONS = {
     mode: {
       single: "enkel",
       batch: "gegroepeerd",
+      album: "album",
       off: "uit",
     },
     
@@ -2719,47 +2764,20 @@ const TRANSLATIONS = {
   
 };
 
-// Interpolate variables in string
-function interpolate(str, vars = {}) {
-  return String(str).replace(/\{(\w+)\}/g, (_, key) => {
-    return vars[key] !== undefined && vars[key] !== null ? String(vars[key]) : `{${key}}`;
-  });
-}
-
-// Get translation by path (e.g. "cmd.help")
-function getByPath(obj, path) {
-  const parts = String(path).split(".");
-  let cur = obj;
-  for (const p of parts) {
-    if (!cur || typeof cur !== "object" || !(p in cur)) return null;
-    cur = cur[p];
-  }
-  return cur;
-}
+// Katalog skompilowany raz przy imporcie: płaskie klucze, szablony, fallback EN rozwiązany z góry
+const CATALOG = compileCatalog(TRANSLATIONS, {
+  fallbackLang: "en",
+  onMissing: (lang, key) => console.error(`[i18n_missing] lang=${lang} key=${key} fallback=en (NOT FOUND)`),
+});
 
 // Main translation function with EN fallback
 export function t(lang, key, vars = {}) {
-  // Try requested language first
-  let dict = TRANSLATIONS[lang];
-  let val = dict ? getByPath(dict, key) : null;
-  
-  // Fallback to EN (hard requirement)
-  if (val === null) {
-    dict = TRANSLATIONS.en;
-    val = dict ? getByPath(dict, key) : null;
-    
-    // Log missing translation
-    if (val === null) {
-      console.error(`[i18n_missing] lang=${lang} key=${key} fallback=en (NOT FOUND)`);
-      return key; // Return key as last resort
-    }
-    
-    if (lang !== "en") {
-      console.log(`[i18n_fallback] lang=${lang} key=${key} -> en`);
-    }
-  }
-  
-  return interpolate(val, vars);
+  return CATALOG.t(lang, key, vars);
+}
+
+// liczniki wywołań / fallbacków / brakujących kluczy (log okresowy w bocie i workerze, /metrics workera)
+export function i18nStats(opts) {
+  return CATALOG.stats(opts);
 }
 
 // Normalize language code: "pl-PL" → "pl", validate against supported languages
@@ -2789,4 +2807,4 @@ export function getUserLang(user) {
   return "en";
 }
 
-export default { t, getUserLang, TRANSLATIONS };
+export default { t, getUserLang, i18nStats, TRANSLATIONS };
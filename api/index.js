@@ -7,6 +7,7 @@ import {
   countEnabledLinksForUserId
 } from "./db.js";
 import { registerStripeWebhookRoutes } from "./stripe-webhook.js";
+import { createUpdateDispatcher, formatDispatcherStats } from "./src/bot/updates/dispatcher.js";
 import Stripe from "stripe";
 const stripeApi = new Stripe(process.env.STRIPE_SECRET_KEY || process.env.STRIPE_API_KEY || "", { apiVersion: "2023-10-16" });
 
@@ -24,20 +25,17 @@ const app = express();
 import { makeRequireUser } from "./panel-dev-auth.js";
 import { createTelegramClient } from "./telegram.js";
 import { createLinkCounters } from "./link-counters.js";
-import pg from "pg";
-const { Pool } = pg;
-// FYD hotfix: db dla endpointów używających db.query(...)
-const db =
-  globalThis.__FYD_DB__ ||
-  (globalThis.__FYD_DB__ =
-    process.env.DATABASE_URL
-      ? new Pool({ connectionString: process.env.DATABASE_URL })
-      : new Pool());
+import { createSchemaSnapshot } from "./src/db/schema-snapshot.js";
+import { pool as sharedPool } from "./src/db/pool.js";
+// FYD hotfix: db dla endpointów używających db.query(...) – wspólna pula procesu (PG_POOL_MAX_API)
+const db = globalThis.__FYD_DB__ || (globalThis.__FYD_DB__ = sharedPool);
 
 // sqlPool alias: używamy jednej puli DB w całym pliku
 const sqlPool = db;
 
-const { countActiveLinksForUserId, countAllLinksForUserId } = createLinkCounters(db);
+// snapshot information_schema – raz na start (odświeżany po initDb())
+const schema = createSchemaSnapshot(db);
+const { countActiveLinksForUserId, countAllLinksForUserId } = createLinkCounters(db, { schema });
 
 
 
@@ -851,12 +849,26 @@ app.post("/activate", requireUser, async (req, res) => {
 });
 
 // =================== TELEGRAM WEBHOOK (zostaje) ===================
-app.post("/telegram-webhook", async (req, res) => {
+// 200 od razu, obsługa przez dispatcher: równolegle między czatami, po kolei w czacie
+const telegramWebhookDispatcher = createUpdateDispatcher({
+  handleUpdate: handleTelegramWebhookUpdate,
+  maxInFlight: Number(process.env.TG_WEBHOOK_CONCURRENCY || 16),
+});
+
+app.post("/telegram-webhook", (req, res) => {
   console.log("Webhook:", JSON.stringify(req.body, null, 2));
   res.sendStatus(200);
+  if (req.body && typeof req.body === "object") telegramWebhookDispatcher.dispatch(req.body);
+});
 
+setInterval(() => {
+  const st = telegramWebhookDispatcher.stats({ reset: true });
+  if (st.handled || st.failed || st.queued) console.log(formatDispatcherStats(st, "tg-webhook"));
+}, 60000).unref();
+
+async function handleTelegramWebhookUpdate(update) {
   try {
-    const msg = req.body?.message;
+    const msg = update?.message;
     if (!msg) return;
 
     const chatId = msg.chat?.id;
@@ -908,23 +920,18 @@ app.post("/telegram-webhook", async (req, res) => {
   } catch (e) {
     console.error("ERR:", e);
   }
-});
+}
 
 // START SERVER
 initDb().then(() => {
   console.log("DB OK");
+  schema.reload();
   
 
 // --- WooCommerce webhook (create activation token) ---
-let __wcPool = null;
+// dawniej osobna pula – teraz ta sama co reszta API
 async function wcDb() {
-  if (__wcPool) return __wcPool;
-  const pgMod = await import("pg");
-  const pgAny = (pgMod && (pgMod.default || pgMod)) || pgMod;
-  const Pool = pgAny.Pool || (pgAny.default && pgAny.default.Pool);
-  if (!Pool) throw new Error("pg Pool not found");
-  __wcPool = new Pool({ connectionString: process.env.DATABASE_URL });
-  return __wcPool;
+  return db;
 }
 
 async function wcRandomToken() {
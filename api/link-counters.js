@@ -3,8 +3,12 @@
  * Extracted from api/index.js to keep the main file smaller.
  *
  * Expects a pg Pool-like object with .query(sql, params)
+ * and optionally opts.schema = createSchemaSnapshot(db) (shared startup snapshot).
  */
-export function createLinkCounters(db) {
+import { loadSchemaSnapshot } from "./src/db/schema-snapshot.js";
+
+export function createLinkCounters(db, opts = {}) {
+  const { schema = null } = opts;
   // Auto-detekcja tabeli z linkami + liczniki dla /me i /status (żeby nie wywalało API)
   let __fydLinksMetaPromise = null;
 
@@ -22,18 +26,8 @@ export function createLinkCounters(db) {
     if (__fydLinksMetaPromise) return __fydLinksMetaPromise;
 
     __fydLinksMetaPromise = (async () => {
-      const { rows } = await db.query(`
-        SELECT table_name, column_name
-        FROM information_schema.columns
-        WHERE table_schema='public'
-        ORDER BY table_name, ordinal_position
-      `);
-
-      const tables = new Map(); // table -> Set(columns)
-      for (const r of rows) {
-        if (!tables.has(r.table_name)) tables.set(r.table_name, new Set());
-        tables.get(r.table_name).add(r.column_name);
-      }
+      const snapshot = schema ? await schema.get() : await loadSchemaSnapshot(db);
+      const tables = snapshot.tables; // table -> Set(columns)
 
       let best = null;
       let bestScore = -1;
@@ -61,6 +55,7 @@ export function createLinkCounters(db) {
       }
 
       if (!best) {
+        __fydLinksMetaPromise = null; // np. snapshot sprzed initDb() – spróbuj przy następnym wywołaniu
         throw new Error("[FYD] Nie wykryłem tabeli z linkami (brak tabeli z user_id/telegram_user_id + url/link)");
       }
       return best;
@@ -16,6 +16,26 @@ const PER_LINK_LIMITS = {
   platinum: 20,
 };
 
+// Dzienny limit powiadomień per czat (worker). Platinum: +100 za każdy pakiet dodatkowy.
+const DAILY_NOTIFICATION_LIMITS = {
+  trial: 50,
+  starter: 200,
+  growth: 400,
+  platinum: 700,
+};
+
+const DAILY_NOTIFICATIONS_PER_EXTRA_PACK = {
+  platinum: 100,
+};
+
+// Minimalny odstęp między odpytaniami jednego linku (worker, adaptacyjny polling), sekundy.
+const MIN_POLL_INTERVAL_SEC = {
+  trial: 300,
+  starter: 180,
+  growth: 120,
+  platinum: 60,
+};
+
 function isUserObject(obj) {
   return obj && typeof obj === "object" && !Number.isFinite(obj);
 }
@@ -83,6 +103,22 @@ export function getPerLinkItemLimit(userOrId) {
   return typeof PER_LINK_LIMITS[plan] === "number" ? PER_LINK_LIMITS[plan] : 20;
 }
 
+export function getDailyNotificationLimit(planName, extraPacks = 0) {
+  const plan = String(planName || "none").toLowerCase();
+  const base = DAILY_NOTIFICATION_LIMITS[plan] ?? 0;
+  if (base <= 0) return 0;
+
+  const perPack = DAILY_NOTIFICATIONS_PER_EXTRA_PACK[plan] ?? 0;
+  const packs = Number(extraPacks || 0);
+  return base + (Number.isFinite(packs) ? packs : 0) * perPack;
+}
+
+export function getMinPollIntervalMs(planName) {
+  const plan = String(planName || "none").toLowerCase();
+  const sec = MIN_POLL_INTERVAL_SEC[plan] ?? MIN_POLL_INTERVAL_SEC.trial;
+  return sec * 1000;
+}
+
 export function isPlanActive(userOrId, now = new Date()) {
   if (!isUserObject(userOrId)) return true; // dev/test
 
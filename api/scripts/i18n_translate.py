@@ -2,9 +2,29 @@
 """
 Automatic translation generator for bot i18n (9 languages)
 Preserves: commands /..., placeholders {var}, HTML tags, emoji, proper nouns
+
+Incremental: TRANSLATIONS in i18n_unified.js is parsed as a JS object literal
+(keys by dotted path), EN values are hashed and compared with the cache
+(i18n_translate.cache.json, per language), and only keys that are missing or
+whose EN text changed since the last run are translated and merged into the
+existing language sections. Everything else in the file is left untouched.
+
+Usage:
+  python3 api/scripts/i18n_translate.py                  # all 9 languages
+  python3 api/scripts/i18n_translate.py --lang de,fr --dry-run
+  python3 api/scripts/i18n_translate.py --jobs 4         # languages in parallel
+  python3 api/scripts/i18n_translate.py --force          # ignore cache, re-translate all
 """
 
+import argparse
+import hashlib
+import json
+import os
 import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from pathlib import Path
 
 # Translation dictionaries for common terms (informal tu/du style)
 TRANSLATIONS = {
@@ -325,175 +345,441 @@ TRANSLATIONS = {
     },
 }
 
+LANGUAGES = ["de", "fr", "it", "es", "pt", "cs", "sk", "ro", "nl"]
+SOURCE_LANG = "en"
+
+DEFAULT_FILE = Path(__file__).resolve().parent.parent / "i18n_unified.js"
+DEFAULT_CACHE = Path(__file__).resolve().parent / "i18n_translate.cache.json"
+CACHE_VERSION = 1
+
+# Fragments copied verbatim: URLs, {placeholders}, HTML tags, &entities;, /commands
+PROTECTED_RE = r"https?://\S+|\{[^}]+\}|<[^>]+>|&#?\w+;|/[a-z_]+"
+
+
+# ===== matcher =====
+
+@lru_cache(maxsize=None)
+def compile_matcher(lang):
+    """One regex per language: protected fragments first, then all dictionary
+    terms as a single alternation sorted longest-first (so "Quiet hours" wins
+    over "Quiet"). One left-to-right pass, so already translated text is never
+    matched again by a later term."""
+    terms = TRANSLATIONS.get(lang) or {}
+    exact = dict(terms)
+    folded = {}
+    for en_term, trans_term in terms.items():
+        folded.setdefault(en_term.lower(), trans_term)  # case-insensitive: first entry wins
+
+    alts = "|".join(re.escape(t) for t in sorted(terms, key=len, reverse=True))
+    body = f"({PROTECTED_RE})" + (rf"|(?<!\w)(?:{alts})(?!\w)" if alts else "")
+    pattern = re.compile(body, re.IGNORECASE)
+
+    def repl(m):
+        if m.group(1):
+            return m.group(0)
+        s = m.group(0)
+        return exact.get(s) or folded.get(s.lower(), s)
+
+    return lambda text: pattern.sub(repl, text)
+
+
 def translate_text(text, lang):
     """Translate text preserving commands, placeholders, HTML, emoji"""
-    
-    # Don't translate if it's just a command
-    if re.match(r'^/[a-z_]+$', text.strip()):
-        return text
-    
-    # Extract placeholders {var} before translation
-    placeholders = re.findall(r'\{[^}]+\}', text)
-    temp_text = text
-    for i, placeholder in enumerate(placeholders):
-        temp_text = temp_text.replace(placeholder, f'__PH{i}__', 1)
-    
-    result = temp_text
-    
-    # Translate using dictionary
-    if lang in TRANSLATIONS:
-        trans_dict = TRANSLATIONS[lang]
-        for en_term, trans_term in trans_dict.items():
-            # Case insensitive replacement
-            result = re.sub(r'\b' + re.escape(en_term) + r'\b', trans_term, result, flags=re.IGNORECASE)
-    
-    # Restore placeholders
-    for i, placeholder in enumerate(placeholders):
-        result = result.replace(f'__PH{i}__', placeholder, 1)
-    
-    return result
-
-def parse_en_section(file_path):
-    """Parse EN section from i18n_unified.js"""
-    with open(file_path, "r", encoding="utf-8") as f:
-        lines = f.readlines()
-    
-    # Find EN section (line 4 to line before pl:)
-    en_start = None
-    en_end = None
-    pl_start = None
-    
-    for i, line in enumerate(lines):
-        if line.strip() == "en: {":
-            en_start = i + 1  # Start after "en: {"
-        elif line.strip() == "pl: {":
-            pl_start = i
-            break
-    
-    if en_start is None or pl_start is None:
-        print("ERROR: Could not find EN or PL section markers")
-        return None
-    
-    # Find end of EN (should be "  }," before pl:)
-    for i in range(pl_start - 1, en_start, -1):
-        if lines[i].strip() in ["},", "},"]:
-            en_end = i
-            break
-    
-    if en_end is None:
-        print("ERROR: Could not find EN section end")
-        return None
-    
-    # Extract EN content (between en: { and closing })
-    en_text = ''.join(lines[en_start:en_end])
-    return en_text
-
-def generate_translation(en_text, lang):
-    """Generate translation for a language"""
-    lines = en_text.split('\n')
-    translated_lines = []
-    
-    for line in lines:
-        # Skip empty lines and comments
-        if not line.strip() or line.strip().startswith('//'):
-            translated_lines.append(line)
+    return compile_matcher(lang)(text)
+
+
+def translate_batch(lang, items):
+    """[(path, en_text)] -> (lang, {path: translated}) – runs in a worker process with --jobs"""
+    return lang, {path: translate_text(text, lang) for path, text in items}
+
+
+# ===== JS object literal parser =====
+
+class JSParseError(ValueError):
+    pass
+
+
+class StrValue:
+    """String literal in the source: decoded value + [start, end) span of the literal."""
+
+    def __init__(self, value, start, end, translatable=True):
+        self.value = value
+        self.start = start
+        self.end = end
+        self.translatable = translatable
+
+
+class RawValue:
+    """Anything that is not a plain string / object (numbers, arrays, template with ${})."""
+
+    def __init__(self, start, end):
+        self.start = start
+        self.end = end
+
+
+class ObjNode:
+    """Object literal: ordered entries + offsets needed to append new entries in place."""
+
+    def __init__(self, open_pos):
+        self.open = open_pos
+        self.close = None
+        self.entries = {}  # key -> ObjNode | StrValue | RawValue (insertion order = source order)
+        self.entry_col = None  # column of the first key (indent for new entries)
+        self.last_end = None  # offset right after the last entry (incl. its comma)
+        self.last_has_comma = False
+
+
+_ESCAPES = {"n": "\n", "t": "\t", "r": "\r", "b": "\b", "f": "\f", "v": "\v", "0": "\0"}
+_IDENT_RE = re.compile(r"[A-Za-z_$][\w$]*")
+_NUMBER_RE = re.compile(r"-?\d+(?:\.\d+)?")
+
+
+class JSObjectParser:
+    """Parses the subset of JS used by i18n_unified.js: nested object literals with
+    bare / quoted keys, '...' "..." `...` strings, comments and trailing commas."""
+
+    def __init__(self, src):
+        self.src = src
+
+    def error(self, pos, msg):
+        line = self.src.count("\n", 0, pos) + 1
+        raise JSParseError(f"{msg} at line {line}")
+
+    def skip(self, i):
+        src, n = self.src, len(self.src)
+        while i < n:
+            c = src[i]
+            if c.isspace():
+                i += 1
+            elif src.startswith("//", i):
+                j = src.find("\n", i)
+                i = n if j < 0 else j + 1
+            elif src.startswith("/*", i):
+                j = src.find("*/", i + 2)
+                if j < 0:
+                    self.error(i, "unterminated comment")
+                i = j + 2
+            else:
+                break
+        return i
+
+    def column(self, pos):
+        return pos - (self.src.rfind("\n", 0, pos) + 1)
+
+    def parse_string(self, i):
+        src, q = self.src, self.src[i]
+        out = []
+        translatable = True
+        j = i + 1
+        while j < len(src):
+            c = src[j]
+            if c == q:
+                return StrValue("".join(out), i, j + 1, translatable), j + 1
+            if c == "\\":
+                e = src[j + 1 : j + 2]
+                if e == "\n":
+                    j += 2
+                    continue
+                if e == "u":
+                    if src[j + 2 : j + 3] == "{":
+                        k = src.index("}", j + 3)
+                        out.append(chr(int(src[j + 3 : k], 16)))
+                        j = k + 1
+                    else:
+                        out.append(chr(int(src[j + 2 : j + 6], 16)))
+                        j += 6
+                    continue
+                if e == "x":
+                    out.append(chr(int(src[j + 2 : j + 4], 16)))
+                    j += 4
+                    continue
+                out.append(_ESCAPES.get(e, e))
+                j += 2
+                continue
+            if q == "`" and src.startswith("${", j):
+                translatable = False
+            elif c == "\n" and q != "`":
+                self.error(j, "newline in string literal")
+            out.append(c)
+            j += 1
+        self.error(i, "unterminated string")
+
+    def parse_key(self, i):
+        c = self.src[i]
+        if c in "\"'":
+            s, j = self.parse_string(i)
+            return s.value, j
+        m = _IDENT_RE.match(self.src, i) or _NUMBER_RE.match(self.src, i)
+        if not m:
+            self.error(i, f"unexpected {c!r} in object key")
+        return m.group(0), m.end()
+
+    def parse_value(self, i):
+        c = self.src[i]
+        if c == "{":
+            return self.parse_object(i)
+        if c in "\"'`":
+            return self.parse_string(i)
+        # nie-string: zeskanuj do przecinka / zamknięcia na tym samym poziomie
+        depth, j = 0, i
+        while j < len(self.src):
+            c = self.src[j]
+            if c in "\"'`":
+                _, j = self.parse_string(j)
+                continue
+            if c in "[({":
+                depth += 1
+            elif c in "])}":
+                if depth == 0:
+                    break
+                depth -= 1
+            elif c == "," and depth == 0:
+                break
+            j += 1
+        return RawValue(i, j), j
+
+    def parse_object(self, i):
+        if self.src[i] != "{":
+            self.error(i, "expected '{'")
+        node = ObjNode(i)
+        j = self.skip(i + 1)
+        while True:
+            if j >= len(self.src):
+                self.error(i, "unterminated object")
+            if self.src[j] == "}":
+                node.close = j
+                return node, j + 1
+            if node.entry_col is None:
+                node.entry_col = self.column(j)
+            key, j = self.parse_key(j)
+            j = self.skip(j)
+            if self.src[j : j + 1] != ":":
+                self.error(j, f"expected ':' after key {key!r}")
+            value, j = self.parse_value(self.skip(j + 1))
+            node.entries[key] = value
+            node.last_end, node.last_has_comma = j, False
+            j = self.skip(j)
+            if self.src[j : j + 1] == ",":
+                node.last_end, node.last_has_comma = j + 1, True
+                j = self.skip(j + 1)
+            elif self.src[j : j + 1] != "}":
+                self.error(j, "expected ',' or '}'")
+
+
+def parse_translations(src):
+    m = re.search(r"\bconst\s+TRANSLATIONS\s*=\s*\{", src)
+    if not m:
+        raise JSParseError("const TRANSLATIONS = { ... } not found")
+    node, _ = JSObjectParser(src).parse_object(m.end() - 1)
+    return node
+
+
+def flatten(node, prefix=""):
+    """ObjNode -> {"cmd.help": StrValue} (objects recursed, raw values skipped)"""
+    out = {}
+    for key, value in node.entries.items():
+        path = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, ObjNode):
+            out.update(flatten(value, path))
+        elif isinstance(value, StrValue):
+            out[path] = value
+    return out
+
+
+# ===== rendering / merge =====
+
+def render_key(key):
+    return key if _IDENT_RE.fullmatch(key) else json.dumps(key, ensure_ascii=False)
+
+
+def render_str(value):
+    return json.dumps(value, ensure_ascii=False)
+
+
+def render_entries(tree, indent):
+    out = []
+    for key, value in tree.items():
+        if isinstance(value, dict):
+            out.append(f"\n{indent}{render_key(key)}: {{{render_entries(value, indent + '  ')}\n{indent}}},")
+        else:
+            out.append(f"\n{indent}{render_key(key)}: {render_str(value)},")
+    return "".join(out)
+
+
+def line_indent(src, pos):
+    start = src.rfind("\n", 0, pos) + 1
+    return src[start : start + len(src[start:pos]) - len(src[start:pos].lstrip())]
+
+
+def plan_edits(src, root, lang, values):
+    """values: {dotted path without lang: text} -> [(start, end, text)]
+
+    Existing literals are replaced in place; missing keys are appended to the
+    deepest object that already exists (creating nested objects as needed)."""
+    edits = []
+    appends = {}  # id(ObjNode) -> (node, tree of new entries)
+
+    for path, text in values.items():
+        parts = [lang] + path.split(".")
+        node, k = root, 0
+        while k < len(parts) - 1 and isinstance(node.entries.get(parts[k]), ObjNode):
+            node = node.entries[parts[k]]
+            k += 1
+
+        existing = node.entries.get(parts[k])
+        if k == len(parts) - 1 and isinstance(existing, StrValue):
+            edits.append((existing.start, existing.end, render_str(text)))
+            continue
+        if existing is not None:
+            print(f"  ⚠️  {lang}.{path}: structure differs from EN, skipping")
             continue
-        
-        # Match key: value pattern
-        match = re.match(r'(\s*)([a-z_]+):\s*["`](.+?)["`](,?)(\s*)', line)
-        if match:
-            indent = match.group(1)
-            key = match.group(2)
-            value = match.group(3)
-            comma = match.group(4)
-            trailing = match.group(5)
-            
-            # Translate value
-            translated_value = translate_text(value, lang)
-            
-            # Preserve original quote style
-            quote = '"'
-            translated_line = f'{indent}{key}: {quote}{translated_value}{quote}{comma}{trailing}'
-            translated_lines.append(translated_line)
+
+        _, tree = appends.setdefault(id(node), (node, {}))
+        for part in parts[k:-1]:
+            tree = tree.setdefault(part, {})
+        tree[parts[-1]] = text
+
+    for node, tree in appends.values():
+        if node.entries:
+            indent = " " * node.entry_col
+            text = ("" if node.last_has_comma else ",") + render_entries(tree, indent)
+            edits.append((node.last_end, node.last_end, text))
         else:
-            # Keep line as-is if pattern doesn't match
-            translated_lines.append(line)
-    
-    return '\n'.join(translated_lines)
-
-def main():
-    file_path = "/opt/findyourdeal/api/i18n_unified.js"
-    
-    print("📖 Parsing EN section...")
-    en_text = parse_en_section(file_path)
-    if not en_text:
-        return
-    
-    print(f"✅ Found EN section with {len(en_text.split(chr(10)))} lines")
-    
-    # Read original file
-    with open(file_path, "r", encoding="utf-8") as f:
-        content = f.read()
-    
-    # Generate translations for 9 languages
-    languages = ["de", "fr", "it", "es", "pt", "cs", "sk", "ro", "nl"]
-    
-    # Find insertion point after PL section
-    lines = content.split('\n')
-    pl_start = None
-    pl_end_line = None
-    
-    # Find PL section start
-    for i, line in enumerate(lines):
-        if line.strip() == "pl: {":
-            pl_start = i
-            break
-    
-    if pl_start is None:
-        print("ERROR: Could not find PL section start")
-        return
-    
-    # Find PL section end by counting braces
-    brace_count = 0
-    for i in range(pl_start, len(lines)):
-        if '{' in lines[i]:
-            brace_count += lines[i].count('{')
-        if '}' in lines[i]:
-            brace_count -= lines[i].count('}')
-        
-        # When braces balance, we found the end
-        if brace_count == 0 and i > pl_start:
-            pl_end_line = i + 1  # Insert after closing },
-            break
-    
-    if pl_end_line is None:
-        print("ERROR: Could not find PL section end")
-        return
-    
-    for lang in languages:
-        print(f"🔄 Generating {lang.upper()} translations...")
-        translated_text = generate_translation(en_text, lang)
-        
-        # Check if language section already exists
-        if f"  {lang}: {{" in content:
-            print(f"  ⚠️  {lang.upper()} section already exists, skipping...")
+            outer = line_indent(src, node.close)
+            text = render_entries(tree, outer + "  ") + "\n" + outer
+            edits.append((node.open + 1, node.close, text))
+
+    return edits
+
+
+def apply_edits(src, edits):
+    for start, end, text in sorted(edits, key=lambda e: (e[0], e[1]), reverse=True):
+        src = src[:start] + text + src[end:]
+    return src
+
+
+# ===== cache =====
+
+def content_hash(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+
+def load_cache(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        print(f"⚠️  Cache {path} unreadable ({e}), starting fresh")
+        return {}
+    return data.get("langs", {}) if data.get("version") == CACHE_VERSION else {}
+
+
+def save_cache(path, langs):
+    tmp = Path(f"{path}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"version": CACHE_VERSION, "source": SOURCE_LANG, "langs": langs}, f, ensure_ascii=False, indent=1, sort_keys=True)
+        f.write("\n")
+    os.replace(tmp, path)
+
+
+def plan_language(lang, en_flat, en_hashes, target_flat, cached, force):
+    """-> (to_translate [(path, en_text)], added, changed)
+
+    Key missing in the language -> translate. Key present and EN text changed since
+    the hash recorded for this language -> re-translate. Key present but unknown to
+    the cache (first run / added by hand) -> kept as is, hash recorded."""
+    todo, added, changed = [], 0, 0
+    for path, sv in en_flat.items():
+        if not sv.translatable:
             continue
-        
-        # Insert new section
-        new_section = f"  {lang}: {{\n{translated_text}  }},\n"
-        lines.insert(pl_end_line, new_section)
-        pl_end_line += 1  # Adjust for next insertion
-        print(f"  ✅ {lang.upper()} section added")
-    
-    # Rejoin content
-    content = '\n'.join(lines)
-    
-    # Write back
-    with open(file_path, "w", encoding="utf-8") as f:
-        f.write(content)
-    
-    print("\n✅ All 9 languages generated and injected into i18n_unified.js")
-    print("⚠️  Next step: Run validation with: node /opt/findyourdeal/api/i18n-check.js")
+        current = target_flat.get(path)
+        if current is None:
+            todo.append((path, sv.value))
+            added += 1
+        elif force or (path in cached and cached[path] != en_hashes[path]):
+            todo.append((path, sv.value))
+            changed += 1
+    return todo, added, changed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Incrementally translate new / changed EN keys of i18n_unified.js")
+    parser.add_argument("--file", default=str(DEFAULT_FILE), help="path to i18n_unified.js")
+    parser.add_argument("--cache", default=str(DEFAULT_CACHE), help="content-hash cache (JSON)")
+    parser.add_argument("--lang", default=",".join(LANGUAGES), help="comma-separated languages (default: all 9)")
+    parser.add_argument("--jobs", type=int, default=1, help="languages translated in parallel (processes)")
+    parser.add_argument("--force", action="store_true", help="re-translate every key, ignoring the cache")
+    parser.add_argument("--dry-run", action="store_true", help="print the plan, do not write anything")
+    args = parser.parse_args(argv)
+
+    langs = [l.strip().lower() for l in args.lang.split(",") if l.strip()]
+    unknown = [l for l in langs if l not in TRANSLATIONS]
+    if unknown:
+        print(f"ERROR: no dictionary for: {', '.join(unknown)}")
+        return 2
+
+    with open(args.file, "r", encoding="utf-8") as f:
+        src = f.read()
+
+    print("📖 Parsing i18n_unified.js...")
+    try:
+        root = parse_translations(src)
+    except JSParseError as e:
+        print(f"ERROR: {e}")
+        return 1
+
+    en_node = root.entries.get(SOURCE_LANG)
+    if not isinstance(en_node, ObjNode):
+        print("ERROR: Could not find EN section")
+        return 1
+
+    en_flat = flatten(en_node)
+    en_hashes = {path: content_hash(sv.value) for path, sv in en_flat.items()}
+    print(f"✅ Found EN section with {len(en_flat)} keys")
+
+    cache = load_cache(args.cache)
+    plans = {}
+    for lang in langs:
+        target = root.entries.get(lang)
+        target_flat = flatten(target) if isinstance(target, ObjNode) else {}
+        todo, added, changed = plan_language(lang, en_flat, en_hashes, target_flat, cache.get(lang, {}), args.force)
+        stale = len(set(target_flat) - set(en_flat))
+        plans[lang] = todo
+        print(f"🔄 {lang.upper()}: {added} new, {changed} changed, {len(en_flat) - added - changed} kept" + (f", {stale} not in EN" if stale else ""))
+
+    work = [(lang, todo) for lang, todo in plans.items() if todo]
+    results = {}
+    if work and args.jobs > 1:
+        with ProcessPoolExecutor(max_workers=min(args.jobs, len(work))) as pool:
+            for lang, values in pool.map(translate_batch, *zip(*work)):
+                results[lang] = values
+    else:
+        for lang, todo in work:
+            results[lang] = translate_batch(lang, todo)[1]
+
+    if args.dry_run:
+        print("\n(dry run – nothing written)")
+        return 0
+
+    edits = []
+    for lang, values in results.items():
+        edits.extend(plan_edits(src, root, lang, values))
+    if edits:
+        with open(args.file, "w", encoding="utf-8") as f:
+            f.write(apply_edits(src, edits))
+
+    for lang in langs:
+        cache[lang] = dict(en_hashes)
+    save_cache(args.cache, cache)
+
+    total = sum(len(v) for v in results.values())
+    print(f"\n✅ {total} strings translated across {len(results)} languages, cache updated")
+    if total:
+        print("⚠️  Next step: Run validation with: npm run i18n:check")
+    return 0
+
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -189,6 +189,17 @@ export function createChatNotificationsHandlers(deps) {
     );
   }
 
+  async function handleModeAlbum(msg, user) {
+    const chatId = String(msg.chat.id);
+    await ensureChatNotificationsRowDb(chatId, user.id);
+    await dbQuery(`UPDATE chat_notifications SET mode='album', updated_at=NOW() WHERE chat_id=$1 AND user_id=$2`, [chatId, user.id]);
+    const lang = await fydResolveLang(chatId, user, msg?.from?.language_code || "");
+    await tgSend(chatId, lang === "pl"
+      ? "🖼 Ustawiono tryb: <b>album</b> (domyślny na tym czacie)."
+      : "🖼 Mode set: <b>album</b> (default in this chat)."
+    );
+  }
+
   return {
     handleQuiet,
     handleQuietOff,
@@ -198,5 +209,6 @@ export function createChatNotificationsHandlers(deps) {
     globalOnAndArm,
     handleModeSingle,
     handleModeBatch,
+    handleModeAlbum,
   };
 }
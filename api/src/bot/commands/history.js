@@ -9,7 +9,7 @@ export function createHistoryHandlers(ctx) {
     fydResolveLang,
     escapeHtml,
     dbQuery,
-    hasColumn,
+    schemaSnapshot,
     stripPrefixIcons,
     dedupePanelLoginUrlText,
     appendUrlFromKeyboard,
@@ -117,7 +117,7 @@ export function createHistoryHandlers(ctx) {
           `SELECT *
            FROM public.link_items
            WHERE link_id=$1
-           ORDER BY id DESC
+           ORDER BY first_seen_at DESC, id DESC
            LIMIT 120`,
           [linkIdArg]
         );
@@ -156,7 +156,7 @@ export function createHistoryHandlers(ctx) {
          FROM public.link_items li
          JOIN public.links l ON l.id=li.link_id
          WHERE l.user_id=$1 AND l.active=true
-         ORDER BY li.id DESC
+         ORDER BY li.first_seen_at DESC, li.id DESC
          LIMIT 240`,
         [Number(user.id)]
       );
@@ -193,21 +193,13 @@ export function createHistoryHandlers(ctx) {
     return `"${String(id).replace(/"/g, '""')}"`;
   }
   
+  // kolumny link_items ze snapshotu schematu (src/bot/schema-cache.js) – bez information_schema per wywołanie
   async function linkItemsMeta() {
     if (__LINKITEMS_META) return __LINKITEMS_META;
   
-    const colsR = await dbQuery(
-      `SELECT column_name
-       FROM information_schema.columns
-       WHERE table_schema='public' AND table_name='link_items'
-       ORDER BY ordinal_position`
-    );
-    const cols = new Set((colsR.rows || []).map((r) => String(r.column_name)));
-  
-    const pick = (cands) => {
-      for (const c of cands) if (cols.has(c)) return c;
-      return null;
-    };
+    const schema = await schemaSnapshot();
+    if (!schema.hasTable("link_items")) return {};
+    const pick = (cands) => schema.pick("link_items", cands);
   
     const ts = pick(["first_seen_at", "created_at", "seen_at", "inserted_at", "updated_at"]);
     const url = pick(["url", "item_url", "href", "link"]);
@@ -237,6 +229,7 @@ export function createHistoryHandlers(ctx) {
       await tgSend(chatId, t(lang, "hist_none"));
       return;
     }
+    const { ts, url, title, price, currency } = m;
 
     const where = useLink ? "AND li.link_id=$2" : "";
     const params = useLink ? [Number(user.id), linkId] : [Number(user.id)];
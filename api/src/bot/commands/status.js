@@ -1,6 +1,9 @@
 /**
  * /status extracted from api/telegram-bot.js
  * Deps are injected to avoid side-effects / TDZ.
+ *
+ * Liczniki, dodatki, tryb czatu, strefa, licznik dzienny, cisza nocna i linki
+ * z readModel.getSummary() (api/src/bot/read-model.js) – jedno zapytanie, cache per user+czat.
  */
 
 function formatWarsawDate(dt) {
@@ -20,17 +23,6 @@ function formatWarsawDate(dt) {
   return `${dd}/${mm}/${yyyy} ${hh}:${mi}`;
 }
 
-function safeTz(tz) {
-  const z = String(tz || "").trim();
-  if (!z || z.length > 64) return "Europe/Warsaw";
-  try {
-    new Intl.DateTimeFormat("en-US", { timeZone: z }).format(new Date());
-    return z;
-  } catch {
-    return "Europe/Warsaw";
-  }
-}
-
 export function createHandleStatus(deps) {
   const {
     tgSend,
@@ -39,7 +31,7 @@ export function createHandleStatus(deps) {
     normLang,
     planLabel,
     getUserEntitlementsByTelegramId,
-    getQuietHours,
+    readModel,
     dbQuery,
   } = deps;
 
@@ -61,13 +53,14 @@ export function createHandleStatus(deps) {
         notifOff: "⛔ Notifications DISABLED",
         mode: (m) => `Default mode in this chat: ${m}`,
         today: (c, lim) => `Today's notifications: ${c}/${lim}`,
-        change: "Change: /on /off /single /batch",
+        change: "Change: /on /off /single /batch /album",
         quietOff: "Quiet hours: disabled",
         quietOn: (f, t) => `Quiet hours: ENABLED, hours ${f}:00–${t}:00`,
         linksHdr: "All searches:",
-        perLink: "Per-link mode: /single_ID /batch_ID /off_ID /on_ID (e.g. /batch_18)",
+        perLink: "Per-link mode: /single_ID /batch_ID /album_ID /off_ID /on_ID (e.g. /batch_18)",
         mSingle: "single",
         mBatch: "batch",
+        mAlbum: "album",
       },
       pl: {
         title: "ℹ️ Status bota",
@@ -81,13 +74,14 @@ export function createHandleStatus(deps) {
         notifOff: "⛔ Powiadomienia WYŁĄCZONE",
         mode: (m) => `Tryb domyślny na tym czacie: ${m}`,
         today: (c, lim) => `Dzisiejsze powiadomienia: ${c}/${lim}`,
-        change: "Zmiana: /on /off /pojedyncze /zbiorcze",
+        change: "Zmiana: /on /off /pojedyncze /zbiorcze /album",
         quietOff: "Cisza nocna: wyłączona",
         quietOn: (f, t) => `Cisza nocna: WŁĄCZONA, godziny ${f}:00–${t}:00`,
         linksHdr: "Wszystkie wyszukiwania:",
-        perLink: "Tryb per link: /pojedyncze_ID /zbiorcze_ID /off_ID /on_ID (np. /zbiorcze_18)",
+        perLink: "Tryb per link: /pojedyncze_ID /zbiorcze_ID /album_ID /off_ID /on_ID (np. /zbiorcze_18)",
         mSingle: "pojedynczo",
         mBatch: "zbiorczo",
+        mAlbum: "album",
       },
     };
     const T = S[L] || S.en;
@@ -100,19 +94,14 @@ export function createHandleStatus(deps) {
     let linksLimit = Number(ent?.links_limit_total ?? 0);
     if (!Number.isFinite(linksLimit) || linksLimit <= 0) linksLimit = "?";
 
-    // addon qty (best effort)
-    let addons = 0;
+    // jedno zapytanie (best effort – bez niego sekcje zostają na wartościach domyślnych)
+    let summary = null;
     try {
-      const r = await dbQuery(
-        `SELECT COALESCE(SUM(COALESCE(addon_qty,0)),0)::int AS n
-         FROM subscriptions
-         WHERE user_id=$1 AND status='active'`,
-        [Number(user.id)]
-      );
-      addons = Number(r.rows?.[0]?.n ?? 0);
-      if (!Number.isFinite(addons) || addons < 0) addons = 0;
+      summary = await readModel.getSummary(Number(user.id), chatId);
     } catch {}
 
+    const addons = summary?.addons ?? 0;
+
     const baseHistory =
       planCode === "platinum" ? 800 :
       planCode === "growth" || planCode === "pro" ? 700 :
@@ -132,66 +121,24 @@ export function createHandleStatus(deps) {
     if (!Number.isFinite(dailyLimit) || dailyLimit <= 0) dailyLimit = baseDaily + addons * 100;
 
     // counts
-    let enabled = 0, total = 0;
-    try {
-      const r1 = await dbQuery(`SELECT COUNT(*)::int AS n FROM links WHERE user_id=$1 AND active=TRUE`, [Number(user.id)]);
-      enabled = Number(r1.rows?.[0]?.n ?? 0) || 0;
-      const r2 = await dbQuery(`SELECT COUNT(*)::int AS n FROM links WHERE user_id=$1`, [Number(user.id)]);
-      total = Number(r2.rows?.[0]?.n ?? 0) || 0;
-    } catch {}
+    const enabled = summary?.linksEnabled ?? 0;
+    const total = summary?.linksTotal ?? 0;
 
     // chat notifications (on/off + domyślny tryb czatu)
     let notifEnabled = true;
     let chatMode = "single";
-
-    try {
-      const r = await dbQuery(
-        `SELECT enabled, mode
-           FROM chat_notifications
-          WHERE chat_id=$1 AND user_id=$2
-          LIMIT 1`,
-        [String(chatId), Number(user.id)]
-      );
-      const row = r.rows?.[0];
-      if (row) {
-        notifEnabled = row.enabled !== false;
-        chatMode = String(row.mode || "single").toLowerCase() === "batch" ? "batch" : "single";
-      }
-    } catch {}
-
-    
-    // per-user timezone (default Europe/Warsaw)
-    let userTz = "Europe/Warsaw";
-    try {
-      const rTz = await dbQuery(
-        `SELECT COALESCE(NULLIF(timezone,''),'Europe/Warsaw') AS tz
-           FROM public.users
-          WHERE id=$1
-          LIMIT 1`,
-        [Number(user.id)]
-      );
-      userTz = safeTz(rTz.rows?.[0]?.tz || "Europe/Warsaw");
-    } catch {
-      userTz = "Europe/Warsaw";
+    const chatRow = summary?.chat;
+    if (chatRow) {
+      notifEnabled = chatRow.enabled !== false;
+      const cm = String(chatRow.mode || "single").toLowerCase();
+      chatMode = cm === "batch" || cm === "album" ? cm : "single";
     }
 
-// dzisiejsze powiadomienia — sumarycznie po wszystkich czatach użytkownika, bieżący dzień
-    let dailyCount = 0;
-    try {
-      const rDaily = await dbQuery(
-        `SELECT COALESCE(SUM(
-                  CASE
-                    WHEN daily_count_date IS DISTINCT FROM (NOW() AT TIME ZONE $2)::date THEN 0
-                    ELSE COALESCE(daily_count,0)
-                  END
-                ),0)::int AS c
-           FROM public.chat_notifications
-          WHERE user_id=$1`,
-        [Number(user.id), userTz]
-      );
-      const c = Number(rDaily?.rows?.[0]?.c ?? 0);
-      if (Number.isFinite(c) && c >= 0) dailyCount = c;
-    } catch {}
+    // per-user timezone (default Europe/Warsaw) – już zwalidowana w read modelu
+    const userTz = summary?.timezone || "Europe/Warsaw";
+
+    // dzisiejsze powiadomienia — sumarycznie po wszystkich czatach użytkownika, bieżący dzień
+    let dailyCount = summary?.dailyTotal ?? 0;
 
     // clamp i higiena: nie pokazujemy więcej niż limit
     if (!Number.isFinite(dailyCount) || dailyCount < 0) dailyCount = 0;
@@ -212,56 +159,30 @@ export function createHandleStatus(deps) {
             WHERE user_id=$1`,
           [Number(user.id), dailyLimit, userTz]
         );
+        readModel.invalidate({ userId: user.id });
       } catch {}
     }
 
-    const modeLabel = (m) => (m === "batch" ? T.mBatch : T.mSingle);
+    const modeLabel = (m) => (m === "batch" ? T.mBatch : m === "album" ? T.mAlbum : T.mSingle);
 
     // quiet hours
     let quietLine = T.quietOff;
-    try {
-      const qh = await getQuietHours(String(chatId));
-      if (qh && qh.quiet_enabled) quietLine = T.quietOn(qh.quiet_from, qh.quiet_to);
-    } catch {}
+    const qh = summary?.quiet;
+    if (qh && qh.quiet_enabled) quietLine = T.quietOn(qh.quiet_from, qh.quiet_to);
 
     // list enabled links + per-link mode
     let linksText = "";
-    try {
-      const r = await dbQuery(
-        `SELECT id,
-                COALESCE(NULLIF(label,''), NULLIF(name,''), 'Monitoring') AS name,
-                source,
-                active
-           FROM links
-          WHERE user_id=$1 AND active=TRUE
-          ORDER BY id ASC`,
-        [Number(user.id)]
-      );
-
-      for (const row of (r.rows || [])) {
-        let per = null;
-        try {
-          const m = await dbQuery(
-            `SELECT mode
-               FROM link_notification_modes
-              WHERE user_id=$1 AND chat_id=$2 AND link_id=$3
-              ORDER BY updated_at DESC
-              LIMIT 1`,
-            [Number(user.id), String(chatId), Number(row.id)]
-          );
-          per = m.rows?.[0]?.mode || null;
-        } catch {}
-
-        const eff = per ? String(per).toLowerCase() : chatMode;
-        const monOn = row.active === true || String(row.active) === "t" || String(row.active).toLowerCase() === "true";
-        const monIcon = monOn ? "✅" : "⛔";
-        const notifIcon = eff === "off" ? "🔕" : "🔔";
-        const src = String(row.source || "").toUpperCase() || "LINK";
-        const name = escapeHtml(row.name || "(no name)");
-        const mLabel = eff === "off" ? "OFF" : modeLabel(eff === "batch" ? "batch" : "single");
-        linksText += `• ${monIcon}${notifIcon} ${row.id} – ${name} (${src}) – ${L === "pl" ? "tryb" : "mode"}: ${escapeHtml(mLabel)}\n`;
-      }
-    } catch {}
+    for (const row of summary?.activeLinks || []) {
+      const per = row.link_mode || null;
+      const eff = per ? String(per).toLowerCase() : chatMode;
+      const monOn = row.active === true || String(row.active) === "t" || String(row.active).toLowerCase() === "true";
+      const monIcon = monOn ? "✅" : "⛔";
+      const notifIcon = eff === "off" ? "🔕" : "🔔";
+      const src = String(row.source || "").toUpperCase() || "LINK";
+      const name = escapeHtml(row.label || row.name || "Monitoring");
+      const mLabel = eff === "off" ? "OFF" : modeLabel(eff);
+      linksText += `• ${monIcon}${notifIcon} ${row.id} – ${name} (${src}) – ${L === "pl" ? "tryb" : "mode"}: ${escapeHtml(mLabel)}\n`;
+    }
 
     const out =
       `${T.title}\n\n` +
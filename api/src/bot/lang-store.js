@@ -1,13 +1,9 @@
-import pg from "pg";
+import { pool } from "../db/pool.js";
 import { hasColumn } from "./schema-cache.js";
 import { normLang } from "./utils.js";
 import { FYD_DEFAULT_LANG, isSupportedLang } from "./i18n.js";
 
-const { Pool } = pg;
-const DATABASE_URL = process.env.DATABASE_URL || "";
-const __pool = globalThis.__FYD_LANG_POOL_SINGLE || new Pool({ connectionString: DATABASE_URL });
-globalThis.__FYD_LANG_POOL_SINGLE = __pool;
-async function dbQuery(sql, params = []) { return __pool.query(sql, params); }
+async function dbQuery(sql, params = []) { return pool.query(sql, params); }
 
 // extracted from api/telegram-bot.js (NO behavior change)
 
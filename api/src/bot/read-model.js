@@ -0,0 +1,234 @@
+/**
+ * Per-user read model dla /status i historii (/najnowsze, /najtansze).
+ *
+ * getSummary(userId, chatId) – jedno zapytanie (buildSummarySql) zamiast ~8 osobnych:
+ * liczniki linków, dodatki, czaty usera (tryb, licznik dzienny, notify_from),
+ * cisza nocna czatu, linki z trybem per link. Wynik w pamięci (LRU + TTL).
+ *
+ * history(userId, chatId, key, loader) – wyniki zapytań historii trzymane przy tym
+ * samym wpisie; znikają razem z nim.
+ *
+ * invalidate({ userId, chatId }) – z zapisów w api/db.js (onUserDataChanged), zapisów
+ * w bocie i z LISTEN fyd_user_read (worker po wysyłkach, API). Pusty obiekt = wszystko.
+ * TTL ogranicza nieaktualność dla zapisów bez powiadomienia (np. panel).
+ *
+ * SQL budowany raz ze snapshotu schematu (src/db/schema-snapshot.js) – opcjonalne
+ * kolumny (users.timezone, links.label, subscriptions.addon_qty) tylko jeśli istnieją.
+ */
+
+const DEFAULT_TZ = "Europe/Warsaw";
+
+function safeTz(tz) {
+  const z = String(tz || "").trim();
+  if (!z || z.length > 64) return DEFAULT_TZ;
+  try {
+    new Intl.DateTimeFormat("en-US", { timeZone: z }).format(new Date());
+    return z;
+  } catch {
+    return DEFAULT_TZ;
+  }
+}
+
+// "YYYY-MM-DD" dzisiaj w strefie tz
+function todayIn(tz) {
+  return new Intl.DateTimeFormat("en-CA", { timeZone: tz, year: "numeric", month: "2-digit", day: "2-digit" }).format(new Date());
+}
+
+export function buildSummarySql(schema) {
+  const has = (t, c) => !!schema?.hasColumn(t, c);
+
+  const tz = has("users", "timezone")
+    ? `(SELECT COALESCE(NULLIF(timezone,''),'${DEFAULT_TZ}') FROM users WHERE id=$1)`
+    : `'${DEFAULT_TZ}'`;
+  const addons = has("subscriptions", "addon_qty")
+    ? `(SELECT COALESCE(SUM(COALESCE(addon_qty,0)),0)::int FROM subscriptions WHERE user_id=$1 AND status='active')`
+    : `0`;
+  const label = has("links", "label") ? `l.label` : `NULL::text`;
+  const notifyFrom = has("links", "notify_from") ? `l.notify_from` : `NULL::timestamp`;
+
+  return `
+    SELECT
+      ${tz} AS timezone,
+      ${addons} AS addons,
+      (SELECT COUNT(*)::int FROM links WHERE user_id=$1) AS links_total,
+      (SELECT COUNT(*)::int FROM links WHERE user_id=$1 AND active=TRUE) AS links_enabled,
+      COALESCE((
+        SELECT json_agg(c)
+        FROM (
+          SELECT chat_id, enabled, mode, daily_count, daily_count_date, notify_from
+          FROM chat_notifications
+          WHERE user_id=$1
+        ) c
+      ), '[]'::json) AS chats,
+      (
+        SELECT row_to_json(q)
+        FROM (
+          SELECT quiet_enabled, quiet_from, quiet_to
+          FROM chat_quiet_hours
+          WHERE chat_id=$2
+          LIMIT 1
+        ) q
+      ) AS quiet,
+      COALESCE((
+        SELECT json_agg(x ORDER BY x.id)
+        FROM (
+          SELECT l.id, l.name, ${label} AS label, l.url, l.source, l.active,
+                 ${notifyFrom} AS notify_from, lnm.mode AS link_mode
+          FROM links l
+          LEFT JOIN link_notification_modes lnm
+            ON lnm.user_id = l.user_id
+           AND lnm.chat_id = $2
+           AND lnm.link_id = l.id
+          WHERE l.user_id=$1
+        ) x
+      ), '[]'::json) AS links
+  `;
+}
+
+export function shapeSummary(row, userId, chatId) {
+  const timezone = safeTz(row?.timezone);
+  const today = todayIn(timezone);
+  const chats = Array.isArray(row?.chats) ? row.chats : [];
+
+  // licznik dzienny sumarycznie po czatach usera – tylko wpisy z dzisiejszą datą (strefa usera)
+  let dailyTotal = 0;
+  for (const c of chats) {
+    if (String(c.daily_count_date || "").slice(0, 10) === today) dailyTotal += Number(c.daily_count) || 0;
+  }
+
+  const links = Array.isArray(row?.links) ? row.links : [];
+  return {
+    userId: Number(userId),
+    chatId: String(chatId),
+    timezone,
+    addons: Math.max(0, Number(row?.addons) || 0),
+    linksTotal: Number(row?.links_total) || 0,
+    linksEnabled: Number(row?.links_enabled) || 0,
+    dailyTotal,
+    chat: chats.find((c) => String(c.chat_id) === String(chatId)) || null,
+    chats,
+    quiet: row?.quiet || null,
+    links,
+    activeLinks: links.filter((l) => l.active === true),
+    linkById: new Map(links.map((l) => [Number(l.id), l])),
+    loadedAt: Date.now(),
+  };
+}
+
+export function createUserReadModel(opts = {}) {
+  const { db, schema = null, ttlMs = 60 * 1000, max = 2000 } = opts;
+  if (!db) throw new Error("db missing in createUserReadModel(opts)");
+
+  const entries = new Map(); // "userId:chatId" -> { userId, chatId, summary, history, expiresAt } (kolejność = LRU)
+  const keysByUser = new Map(); // userId -> Set(key)
+  let summarySql = null;
+  let generation = 0; // każde invalidate() – wyniki zapytań rozpoczętych wcześniej nie trafiają do cache
+  let stats = { hits: 0, misses: 0, historyHits: 0, historyMisses: 0, invalidations: 0 };
+
+  const keyOf = (userId, chatId) => `${Number(userId)}:${String(chatId)}`;
+
+  function drop(key) {
+    const e = entries.get(key);
+    if (!e) return;
+    entries.delete(key);
+    const set = keysByUser.get(e.userId);
+    if (set) {
+      set.delete(key);
+      if (!set.size) keysByUser.delete(e.userId);
+    }
+  }
+
+  function entryFor(userId, chatId, create) {
+    const key = keyOf(userId, chatId);
+    const e = entries.get(key);
+    if (e && Date.now() < e.expiresAt) {
+      entries.delete(key);
+      entries.set(key, e); // LRU touch
+      return e;
+    }
+    if (e) drop(key);
+    if (!create) return null;
+
+    const fresh = { userId: Number(userId), chatId: String(chatId), summary: null, history: new Map(), expiresAt: Date.now() + ttlMs };
+    entries.set(key, fresh);
+    if (!keysByUser.has(fresh.userId)) keysByUser.set(fresh.userId, new Set());
+    keysByUser.get(fresh.userId).add(key);
+    while (entries.size > max) drop(entries.keys().next().value);
+    return fresh;
+  }
+
+  async function sql() {
+    if (summarySql) return summarySql;
+    const snapshot = schema ? await schema.get() : null;
+    const built = buildSummarySql(snapshot);
+    if (snapshot?.tables?.size) summarySql = built; // pusty snapshot (błąd) – spróbuj przy następnym
+    return built;
+  }
+
+  async function getSummary(userId, chatId) {
+    const cached = entryFor(userId, chatId, false);
+    if (cached?.summary) {
+      stats.hits++;
+      return cached.summary;
+    }
+    stats.misses++;
+
+    const gen = generation;
+    const res = await db.query(await sql(), [Number(userId), String(chatId)]);
+    const summary = shapeSummary(res.rows?.[0] || {}, userId, chatId);
+    if (gen === generation) entryFor(userId, chatId, true).summary = summary;
+    return summary;
+  }
+
+  /**
+   * key – np. "latest:18" / "cheapest:"; loader() – zapytanie, wynik (rows) trafia do cache.
+   */
+  async function history(userId, chatId, key, loader) {
+    const cached = entryFor(userId, chatId, false);
+    if (cached?.history.has(key)) {
+      stats.historyHits++;
+      return cached.history.get(key);
+    }
+    stats.historyMisses++;
+
+    const gen = generation;
+    const value = await loader();
+    if (gen === generation) entryFor(userId, chatId, true).history.set(key, value);
+    return value;
+  }
+
+  function invalidate({ userId = null, chatId = null } = {}) {
+    generation++;
+    stats.invalidations++;
+    const uid = userId != null && Number.isFinite(Number(userId)) ? Number(userId) : null;
+    const cid = chatId != null && String(chatId) ? String(chatId) : null;
+
+    if (uid == null && cid == null) {
+      entries.clear();
+      keysByUser.clear();
+      return;
+    }
+    if (uid != null) {
+      for (const key of [...(keysByUser.get(uid) || [])]) {
+        if (cid == null || entries.get(key)?.chatId === cid) drop(key);
+      }
+      return;
+    }
+    for (const [key, e] of [...entries]) if (e.chatId === cid) drop(key);
+  }
+
+  // payload z LISTEN fyd_user_read: { user_ids?, chat_id? }
+  function onNotify(payload = {}) {
+    const ids = Array.isArray(payload.user_ids) ? payload.user_ids : [];
+    if (!ids.length) return invalidate({ chatId: payload.chat_id ?? null });
+    for (const id of ids) invalidate({ userId: id, chatId: payload.chat_id ?? null });
+  }
+
+  function statsSnapshot({ reset = false } = {}) {
+    const out = { ...stats, size: entries.size };
+    if (reset) stats = { hits: 0, misses: 0, historyHits: 0, historyMisses: 0, invalidations: 0 };
+    return out;
+  }
+
+  return { getSummary, history, invalidate, onNotify, stats: statsSnapshot };
+}
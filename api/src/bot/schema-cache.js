@@ -1,26 +1,23 @@
-// extracted from api/telegram-bot.js (NO behavior change)
+// extracted from api/telegram-bot.js
 
 // ---------- schema cache ----------
-const __colCache = new Map(); // key: "table.column" -> boolean
-async function hasColumn(table, column) {
-  const key = `${table}.${column}`;
-  if (__colCache.has(key)) return __colCache.get(key);
+// Snapshot information_schema wczytany raz na start (createSchemaSnapshot w telegram-bot.js)
+// zamiast zapytania per kolumna. initSchemaCache(schema) – współdzielona instancja.
+import { schemaSnapshotFromRows } from "../db/schema-snapshot.js";
+
+let __schema = null;
+
+function initSchemaCache(schema) {
+  __schema = schema;
+}
 
-  try {
-    const r = await dbQuery(
-      `SELECT 1
-       FROM information_schema.columns
-       WHERE table_schema='public' AND table_name=$1 AND column_name=$2
-       LIMIT 1`,
-      [String(table), String(column)]
-    );
-    const ok = !!r.rowCount;
-    __colCache.set(key, ok);
-    return ok;
-  } catch {
-    __colCache.set(key, false);
-    return false;
-  }
+async function schemaSnapshot() {
+  return __schema ? __schema.get() : schemaSnapshotFromRows([]);
+}
+
+async function hasColumn(table, column) {
+  const s = await schemaSnapshot();
+  return s.hasColumn(table, column);
 }
 
-export { hasColumn };
+export { initSchemaCache, schemaSnapshot, hasColumn };
@@ -26,6 +26,7 @@ export function createHandleCallback(ctx) {
   function modeLabel(lang, mode) {
     const m = String(mode || "single").toLowerCase();
     if (m === "batch") return t(lang, "mode_batch");
+    if (m === "album") return t(lang, "mode_album");
     if (m === "off") return t(lang, "mode_off");
     return t(lang, "mode_single");
   }
@@ -61,7 +62,7 @@ export function createHandleCallback(ctx) {
       return;
     }
 
-    const m = data.match(/^lnmode:(\d+):(off|single|batch)$/i);
+    const m = data.match(/^lnmode:(\d+):(off|single|batch|album)$/i);
     if (m) {
       const linkId = Number(m[1]);
       const mode = String(m[2]).toLowerCase();
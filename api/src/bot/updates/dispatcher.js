@@ -0,0 +1,254 @@
+/**
+ * Parallel update dispatcher (long polling + /telegram-webhook).
+ *
+ * - różne czaty obsługiwane równolegle (do maxInFlight naraz),
+ * - w obrębie jednego czatu kolejność zachowana (1 update w locie na czat),
+ * - wolna komenda (/status, /latest) blokuje tylko swój czat.
+ *
+ * ctx:
+ * - handleUpdate(update)
+ * - maxInFlight (default 16)
+ * - maxQueued (default 1000) – powyżej tego waitForCapacity() czeka
+ * - log (console-like)
+ *
+ * Histogramy latencji per rodzaj update'u (komenda / callback / ...):
+ * wait = od przyjęcia do startu, handle = czas handleUpdate.
+ */
+
+const LATENCY_BUCKETS_MS = [10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000];
+
+function createHistogram() {
+  return { buckets: new Array(LATENCY_BUCKETS_MS.length + 1).fill(0), count: 0, sum: 0, max: 0 };
+}
+
+function observe(h, ms) {
+  let i = 0;
+  while (i < LATENCY_BUCKETS_MS.length && ms > LATENCY_BUCKETS_MS[i]) i++;
+  h.buckets[i]++;
+  h.count++;
+  h.sum += ms;
+  if (ms > h.max) h.max = ms;
+}
+
+// przybliżony percentyl z histogramu (górna granica kubełka)
+function quantile(h, q) {
+  if (!h.count) return 0;
+  const target = Math.ceil(h.count * q);
+  let acc = 0;
+  for (let i = 0; i < h.buckets.length; i++) {
+    acc += h.buckets[i];
+    if (acc >= target) return i < LATENCY_BUCKETS_MS.length ? Math.min(LATENCY_BUCKETS_MS[i], h.max) : h.max;
+  }
+  return h.max;
+}
+
+export function updateChatKey(update) {
+  const u = update || {};
+  const chat =
+    u.message?.chat ||
+    u.edited_message?.chat ||
+    u.callback_query?.message?.chat ||
+    u.my_chat_member?.chat ||
+    u.chat_member?.chat ||
+    null;
+  if (chat?.id != null) return `c${chat.id}`;
+
+  const from = u.callback_query?.from || u.inline_query?.from || u.pre_checkout_query?.from || null;
+  if (from?.id != null) return `u${from.id}`;
+  return null; // bez kolejności
+}
+
+export function updateKind(update) {
+  const u = update || {};
+  if (u.callback_query) return "callback";
+  const msg = u.message || u.edited_message;
+  if (msg) {
+    const text = String(msg.text || "").trim();
+    if (text.startsWith("/")) {
+      const cmd = text.split(/\s+/)[0].split("@")[0].toLowerCase();
+      // /on_18, /single_5 -> /on_*, /single_*
+      return cmd.replace(/_\d+$/, "_*").slice(0, 32);
+    }
+    return "message";
+  }
+  return "other";
+}
+
+export function createUpdateDispatcher(ctx) {
+  const { handleUpdate, maxInFlight = 16, maxQueued = 1000, log = console } = ctx;
+  if (!handleUpdate) throw new Error("handleUpdate missing in createUpdateDispatcher(ctx)");
+
+  const chats = new Map(); // chatKey -> { queue, busy }
+  const ready = []; // chatKey-e z pracą do zrobienia (FIFO)
+  const loose = []; // update'y bez czatu
+  let inFlight = 0;
+  let queued = 0;
+  let capacityWaiters = [];
+  let idleWaiters = [];
+
+  let metrics = createMetrics();
+
+  function createMetrics() {
+    return { handled: 0, failed: 0, inFlightPeak: 0, queuedPeak: 0, wait: createHistogram(), byKind: new Map() };
+  }
+
+  function kindHist(kind) {
+    let h = metrics.byKind.get(kind);
+    if (!h) {
+      h = createHistogram();
+      metrics.byKind.set(kind, h);
+    }
+    return h;
+  }
+
+  function notifyWaiters() {
+    if (queued < maxQueued && capacityWaiters.length) {
+      const w = capacityWaiters;
+      capacityWaiters = [];
+      w.forEach((r) => r());
+    }
+    if (!queued && !inFlight && idleWaiters.length) {
+      const w = idleWaiters;
+      idleWaiters = [];
+      w.forEach((r) => r());
+    }
+  }
+
+  function nextJob() {
+    if (loose.length) return { job: loose.shift(), chat: null };
+    for (let i = 0; i < ready.length; i++) {
+      const c = chats.get(ready[i]);
+      if (!c || c.busy) continue;
+      const key = ready[i];
+      ready.splice(i, 1);
+      return { job: c.queue.shift(), chat: c, key };
+    }
+    return null;
+  }
+
+  function pump() {
+    while (inFlight < maxInFlight) {
+      const next = nextJob();
+      if (!next) break;
+      run(next);
+    }
+    notifyWaiters();
+  }
+
+  function run({ job, chat, key }) {
+    queued--;
+    inFlight++;
+    if (inFlight > metrics.inFlightPeak) metrics.inFlightPeak = inFlight;
+    if (chat) chat.busy = true;
+
+    const startedAt = Date.now();
+    observe(metrics.wait, startedAt - job.receivedAt);
+
+    Promise.resolve()
+      .then(() => handleUpdate(job.update))
+      .then(
+        () => {
+          metrics.handled++;
+        },
+        (e) => {
+          metrics.failed++;
+          log.error("handleUpdate error:", e);
+        }
+      )
+      .finally(() => {
+        observe(kindHist(updateKind(job.update)), Date.now() - startedAt);
+        inFlight--;
+        if (chat) {
+          chat.busy = false;
+          if (chat.queue.length) ready.push(key);
+          else chats.delete(key);
+        }
+        job.resolve();
+        pump();
+      });
+  }
+
+  /**
+   * Przyjmij update. Zwraca Promise rozwiązywany po obsłudze (nigdy nie odrzuca).
+   */
+  function dispatch(update) {
+    return new Promise((resolve) => {
+      const job = { update, resolve, receivedAt: Date.now() };
+      const key = updateChatKey(update);
+
+      queued++;
+      if (queued > metrics.queuedPeak) metrics.queuedPeak = queued;
+
+      if (key === null) {
+        loose.push(job);
+      } else {
+        let c = chats.get(key);
+        if (!c) {
+          c = { queue: [], busy: false };
+          chats.set(key, c);
+        }
+        c.queue.push(job);
+        if (!c.busy && c.queue.length === 1) ready.push(key);
+      }
+      pump();
+    });
+  }
+
+  // backpressure dla long pollingu: czekaj, aż kolejka zejdzie poniżej maxQueued
+  function waitForCapacity() {
+    if (queued < maxQueued) return Promise.resolve();
+    return new Promise((r) => capacityWaiters.push(r));
+  }
+
+  function drain() {
+    if (!queued && !inFlight) return Promise.resolve();
+    return new Promise((r) => idleWaiters.push(r));
+  }
+
+  function stats({ reset = false } = {}) {
+    const kinds = {};
+    for (const [k, h] of metrics.byKind.entries()) {
+      kinds[k] = {
+        count: h.count,
+        avgMs: h.count ? Math.round(h.sum / h.count) : 0,
+        p50Ms: quantile(h, 0.5),
+        p99Ms: quantile(h, 0.99),
+        maxMs: h.max,
+        buckets: Object.fromEntries(
+          h.buckets.map((n, i) => [i < LATENCY_BUCKETS_MS.length ? `le_${LATENCY_BUCKETS_MS[i]}` : "le_inf", n])
+        ),
+      };
+    }
+    const out = {
+      queued,
+      inFlight,
+      handled: metrics.handled,
+      failed: metrics.failed,
+      inFlightPeak: metrics.inFlightPeak,
+      queuedPeak: metrics.queuedPeak,
+      waitP50Ms: quantile(metrics.wait, 0.5),
+      waitP99Ms: quantile(metrics.wait, 0.99),
+      kinds,
+    };
+    if (reset) metrics = createMetrics();
+    return out;
+  }
+
+  return { dispatch, waitForCapacity, drain, stats };
+}
+
+/**
+ * Jedna linia logu ze statystyk (+ najwolniejsze rodzaje update'ów).
+ */
+export function formatDispatcherStats(st, label = "updates", top = 5) {
+  const slow = Object.entries(st.kinds)
+    .sort((a, b) => b[1].p99Ms - a[1].p99Ms)
+    .slice(0, top)
+    .map(([k, v]) => `${k}:n=${v.count},p50=${v.p50Ms},p99=${v.p99Ms},max=${v.maxMs}`)
+    .join(" ");
+  return (
+    `[${label}] handled=${st.handled} failed=${st.failed} queued=${st.queued} in_flight=${st.inFlight} ` +
+    `in_flight_peak=${st.inFlightPeak} queued_peak=${st.queuedPeak} wait_p50_ms=${st.waitP50Ms} ` +
+    `wait_p99_ms=${st.waitP99Ms}${slow ? " slow=" + slow : ""}`
+  );
+}
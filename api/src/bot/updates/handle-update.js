@@ -12,12 +12,12 @@
  * - dbQuery(sql, params)
  * - clearLinkNotificationMode(userId, chatId, linkId)
  * - setPerLinkMode(chatId, userId, linkId, mode)
- * - hasColumn(table, column) [not used here, but keep ctx consistent elsewhere]
+ * - hasColumn(table, column) [not used here, but keep ctx consistent elsewhere; snapshot-backed, src/bot/schema-cache.js]
  * - fydResolveLang(chatId, user, fromLanguageCode)
  * - handlers: handleHelp, handleLang, handleStatus, handlePlans, handleBuyPlan, handleAddon10,
  *            handleCena, handleRozmiar, handleMarka, handleFiltry, handleResetFiltry,
  *            handleNewestStrict, handleCheapest, handlePanel, handleList, handleRemove, handleAdd,
- *            globalOnAndArm, globalOff, handleModeSingle, handleModeBatch, handleDefault,
+ *            globalOnAndArm, globalOff, handleModeSingle, handleModeBatch, handleModeAlbum, handleDefault,
  *            handleQuietOff, handleQuiet, handleUsunUzytkownika, handleDajAdmina, handleNazwa, handleTechnik
  * - t(lang, key) function for unknown command fallback
  */
@@ -61,6 +61,7 @@ export function createHandleUpdate(ctx) {
     globalOff,
     handleModeSingle,
     handleModeBatch,
+    handleModeAlbum,
     handleDefault,
 
     handleQuietOff,
@@ -91,7 +92,7 @@ export function createHandleUpdate(ctx) {
       ["/najnowsze", "/latest"], ["/latest", "/latest"],
       ["/najtansze", "/cheapest"], ["/cheapest", "/cheapest"],
       ["/pojedyncze", "/single"], ["/pojedynczo", "/single"], ["/single", "/single"],
-      ["/zbiorcze", "/batch"], ["/batch", "/batch"], ["/domyslnie", "/default"],
+      ["/zbiorcze", "/batch"], ["/batch", "/batch"], ["/album", "/album"], ["/domyslnie", "/default"],
       ["/on", "/on"], ["/off", "/off"],
       ["/panel", "/panel"],
       ["/lang", "/lang"],
@@ -112,6 +113,7 @@ export function createHandleUpdate(ctx) {
   function modeLabel(lang, mode) {
     const m = String(mode || "single").toLowerCase();
     if (m === "batch") return t(lang, "mode_batch");
+    if (m === "album") return t(lang, "mode_album");
     if (m === "off") return t(lang, "mode_off");
     return t(lang, "mode_single");
   }
@@ -144,7 +146,7 @@ export function createHandleUpdate(ctx) {
 
     // allow spaced variants: /on 18 etc => /on_18
     let text = String(msg.text ?? "").trim();
-    const mSpace = text.match(/^\/(on|off|single|batch|pojedyncze|pojedynczo|zbiorcze)(?:@\w+)?\s+(\d+)\b/i);
+    const mSpace = text.match(/^\/(on|off|single|batch|album|pojedyncze|pojedynczo|zbiorcze)(?:@\w+)?\s+(\d+)\b/i);
     if (mSpace) {
       const cmd = mSpace[1].toLowerCase() === "pojedynczo" ? "pojedyncze" : mSpace[1].toLowerCase();
       text = `/${cmd}_${mSpace[2]}`;
@@ -166,8 +168,8 @@ export function createHandleUpdate(ctx) {
     const command = normalizeCommand(__cmd0);
     const argText = rest.join(" ").trim();
 
-    // per-link commands: /single_18 /batch_18 /off_18 /on_18 (+ pl: /pojedyncze_18 /zbiorcze_18)
-    const perLink = command.match(/^\/(pojedyncze|zbiorcze|single|batch|off|on)_(\d+)$/i);
+    // per-link commands: /single_18 /batch_18 /album_18 /off_18 /on_18 (+ pl: /pojedyncze_18 /zbiorcze_18)
+    const perLink = command.match(/^\/(pojedyncze|zbiorcze|single|batch|album|off|on)_(\d+)$/i);
     if (perLink) {
       const kind = perLink[1].toLowerCase();
       const linkId = Number(perLink[2]);
@@ -186,7 +188,7 @@ export function createHandleUpdate(ctx) {
         return;
       }
 
-      const mode = (kind === "zbiorcze" || kind === "batch") ? "batch" : kind === "off" ? "off" : "single";
+      const mode = (kind === "zbiorcze" || kind === "batch") ? "batch" : kind === "album" ? "album" : kind === "off" ? "off" : "single";
       const res = await setPerLinkMode(chatId, user.id, linkId, mode);
       if (!res.ok) {
         await tgSend(chatId, t(lang, "link_not_owned", { linkId }));
@@ -229,6 +231,7 @@ export function createHandleUpdate(ctx) {
     if (command === "/off") return globalOff(msg, user);
     if (command === "/single") return handleModeSingle(msg, user);
     if (command === "/batch") return handleModeBatch(msg, user);
+    if (command === "/album") return handleModeAlbum(msg, user);
     if (command === "/default") return handleDefault(msg, user, argText);
 
     if (command === "/quiet_off") return handleQuietOff(msg, user);
@@ -7,9 +7,11 @@
  * - sleep(ms)
  * - handleUpdate(update)
  * - log (console-like, must support .log/.error)
+ * - dispatcher (optional, createUpdateDispatcher) – równoległa obsługa między czatami;
+ *   bez niego update'y idą po kolei jak dawniej
  */
 export function createPollingRunner(ctx) {
-  const { TG, fetch, sleep, handleUpdate, log = console } = ctx;
+  const { TG, fetch, sleep, handleUpdate, dispatcher = null, log = console } = ctx;
 
   let offset = 0;
 
@@ -32,12 +34,17 @@ export function createPollingRunner(ctx) {
         const updates = await fetchUpdates();
         for (const u of updates) {
           offset = u.update_id + 1;
+          if (dispatcher) {
+            dispatcher.dispatch(u);
+            continue;
+          }
           try {
             await handleUpdate(u);
           } catch (e) {
             log.error("handleUpdate error:", e);
           }
         }
+        if (dispatcher) await dispatcher.waitForCapacity();
       } catch (e) {
         log.error("polling error:", e);
         await sleep(1500);
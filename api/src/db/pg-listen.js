@@ -0,0 +1,79 @@
+/**
+ * Postgres LISTEN na dedykowanym kliencie z auto-reconnectem.
+ *
+ * listenChannel(pool, channel, onPayload, { tag }) – onPayload(obj) dostaje sparsowany
+ * JSON payload; po (re)connect woła onPayload({}), bo mogliśmy zgubić NOTIFY.
+ * Używane przez user-limits-notify.js i user-read-notify.js.
+ */
+
+export function listenChannel(pool, channel, onPayload, { log = console, retryMs = 5000, tag = channel } = {}) {
+  let stopped = false;
+  let client = null;
+  let retryTimer = null;
+
+  async function connect() {
+    if (stopped) return;
+    try {
+      client = await pool.connect();
+      client.on("notification", (msg) => {
+        if (msg.channel !== channel) return;
+        let obj = {};
+        try {
+          obj = msg.payload ? JSON.parse(msg.payload) : {};
+        } catch {
+          obj = {};
+        }
+        try {
+          onPayload(obj || {});
+        } catch (e) {
+          log.error(`[${tag}] listener handler error`, e);
+        }
+      });
+      client.on("error", (err) => {
+        log.error(`[${tag}] LISTEN connection error`, err?.message || err);
+        reconnect();
+      });
+      await client.query(`LISTEN ${channel}`);
+      log.log(`[${tag}] LISTEN ${channel}`);
+      // po reconnect mogliśmy zgubić NOTIFY – unieważnij wszystko
+      onPayload({});
+    } catch (err) {
+      log.error(`[${tag}] LISTEN connect error`, err?.message || err);
+      reconnect();
+    }
+  }
+
+  function reconnect() {
+    if (retryTimer) return;
+    const c = client;
+    client = null;
+    if (c) {
+      c.removeAllListeners("notification");
+      c.removeAllListeners("error");
+      try {
+        c.release(true);
+      } catch {
+        // ignore
+      }
+    }
+    if (!stopped) {
+      retryTimer = setTimeout(() => {
+        retryTimer = null;
+        connect();
+      }, retryMs);
+    }
+  }
+
+  connect();
+
+  return {
+    stop() {
+      stopped = true;
+      if (client) {
+        client.removeAllListeners("error");
+        client.release(true);
+        client = null;
+      }
+    },
+  };
+}
@@ -1,12 +1,161 @@
+/**
+ * Wspólna pula pg na proces (api, worker, tg-bot, skrypty) + nazwane zapytania.
+ *
+ * - rola procesu: DB_POOL_ROLE, inaczej z nazwy skryptu (worker.js / telegram-bot.js / index.js),
+ * - rozmiar: PG_POOL_MAX_<ROLA> > PG_POOL_MAX > domyślny dla roli (ROLE_POOL_MAX),
+ *   application_name "fyd-<rola>" – widać w pg_stat_activity, kto trzyma połączenia,
+ * - statement(name, sql) – SQL poprzedzony komentarzem-tagiem "fyd:<name>" i nazwą
+ *   prepared statement (parse/plan raz na połączenie); PG_PREPARED=0 wyłącza nazwy
+ *   (np. PgBouncer w trybie transaction), komentarz zostaje,
+ * - query(stmt | sql, values, { db }) – czas wykonania per nazwa: dbStats(), onStatementTiming(),
+ *   log "[db] slow" powyżej DB_SLOW_QUERY_MS.
+ *
+ * pg_stat_statements grupuje po queryid (komentarz go nie zmienia) – tag widać w kolumnie
+ * query i w logach Postgresa; rolę – w application_name.
+ */
+
+import "../../env.js"; // .env przed odczytem PG_* / DATABASE_URL (importy ESM idą przed dotenv.config() callera)
+import path from "path";
 import pkg from "pg";
 const { Pool } = pkg;
 
+const ROLE_POOL_MAX = { api: 10, worker: 10, bot: 8, panel: 8, script: 2 };
+
+function roleFromArgv() {
+  const script = path.basename(process.argv[1] || "");
+  if (script === "worker.js") return "worker";
+  if (script === "telegram-bot.js" || script === "tg-bot.js") return "bot";
+  if (script === "index.js") return "api";
+  return "script";
+}
+
+export const DB_POOL_ROLE = String(process.env.DB_POOL_ROLE || roleFromArgv()).trim().toLowerCase();
+
+function intEnv(name) {
+  const raw = process.env[name];
+  if (raw == null || raw === "") return null;
+  const n = Number(raw);
+  return Number.isFinite(n) && n > 0 ? Math.floor(n) : null;
+}
+
+export const PG_POOL_MAX =
+  intEnv(`PG_POOL_MAX_${DB_POOL_ROLE.toUpperCase()}`) ?? intEnv("PG_POOL_MAX") ?? ROLE_POOL_MAX[DB_POOL_ROLE] ?? 5;
+
+const PG_PREPARED = process.env.PG_PREPARED !== "0";
+const DB_SLOW_QUERY_MS = Number(process.env.DB_SLOW_QUERY_MS || 1000); // 0 = bez logu
+
+const poolOptions = {
+  max: PG_POOL_MAX,
+  idleTimeoutMillis: intEnv("PG_POOL_IDLE_MS") ?? 30000,
+  application_name: `fyd-${DB_POOL_ROLE}`,
+};
+
+// Preferuj DATABASE_URL jeśli jest (Docker/produkcyjnie), inaczej PGHOST/PGUSER itd.
 export const pool = process.env.DATABASE_URL
-  ? new Pool({ connectionString: process.env.DATABASE_URL })
+  ? new Pool({ connectionString: process.env.DATABASE_URL, ...poolOptions })
   : new Pool({
       host: process.env.PGHOST,
       port: process.env.PGPORT ? Number(process.env.PGPORT) : undefined,
       user: process.env.PGUSER,
       password: process.env.PGPASSWORD,
       database: process.env.PGDATABASE,
+      ...poolOptions,
     });
+
+// bez handlera błąd bezczynnego klienta (restart Postgresa) kończy proces
+pool.on("error", (err) => {
+  console.error(`[db] idle client error role=${DB_POOL_ROLE}`, err?.message || err);
+});
+
+/**
+ * name – unikalny w procesie (nazwa prepared statement), text – SQL z $1..$n.
+ * Ta sama nazwa z innym SQL to błąd pg – nazwy definiować raz, na poziomie modułu.
+ */
+export function statement(name, text) {
+  if (!/^[A-Za-z][\w.-]*$/.test(String(name || ""))) throw new Error(`invalid statement name: ${name}`);
+  return Object.freeze({ name, text: `/* fyd:${name} */ ${String(text).trim()}` });
+}
+
+let timings = new Map(); // name -> { calls, errors, totalMs, maxMs }
+const timingListeners = new Set();
+
+function record(name, ms, ok) {
+  let t = timings.get(name);
+  if (!t) timings.set(name, (t = { calls: 0, errors: 0, totalMs: 0, maxMs: 0 }));
+  t.calls++;
+  if (!ok) t.errors++;
+  t.totalMs += ms;
+  if (ms > t.maxMs) t.maxMs = ms;
+
+  for (const fn of timingListeners) {
+    try {
+      fn(name, ms, ok);
+    } catch {}
+  }
+  if (DB_SLOW_QUERY_MS > 0 && ms >= DB_SLOW_QUERY_MS) {
+    console.warn(`[db] slow statement=${name} ms=${Math.round(ms)} role=${DB_POOL_ROLE}`);
+  }
+}
+
+/**
+ * stmt – wynik statement() albo zwykły SQL (tag "adhoc" lub opts.tag).
+ * opts.db – inna pula / klient transakcji (domyślnie wspólna pula).
+ */
+export async function query(stmt, values = [], opts = {}) {
+  const { db = pool, tag = "adhoc" } = opts;
+  const named = typeof stmt === "object" && stmt !== null;
+  const name = named ? stmt.name : tag;
+  const config = named
+    ? PG_PREPARED
+      ? { name: stmt.name, text: stmt.text, values }
+      : { text: stmt.text, values }
+    : { text: String(stmt), values };
+
+  const t0 = performance.now();
+  try {
+    const res = await db.query(config);
+    record(name, performance.now() - t0, true);
+    return res;
+  } catch (err) {
+    record(name, performance.now() - t0, false);
+    throw err;
+  }
+}
+
+// fn(name, ms, ok) – np. histogram w /metrics workera
+export function onStatementTiming(fn) {
+  timingListeners.add(fn);
+  return () => timingListeners.delete(fn);
+}
+
+export function dbStats({ reset = false } = {}) {
+  const statements = [...timings.entries()]
+    .map(([name, t]) => ({
+      name,
+      calls: t.calls,
+      errors: t.errors,
+      avgMs: t.calls ? Math.round((t.totalMs / t.calls) * 10) / 10 : 0,
+      maxMs: Math.round(t.maxMs),
+      totalMs: Math.round(t.totalMs),
+    }))
+    .sort((a, b) => b.totalMs - a.totalMs);
+  if (reset) timings = new Map();
+
+  return {
+    role: DB_POOL_ROLE,
+    max: PG_POOL_MAX,
+    total: pool.totalCount,
+    idle: pool.idleCount,
+    waiting: pool.waitingCount,
+    statements,
+  };
+}
+
+// jedna linia do logu: "[db] role=worker max=10 total=4 idle=3 waiting=0 getSeenItemKeys=120x/2.1ms ..."
+export function formatDbStats(s, topN = 5) {
+  const top = s.statements
+    .slice(0, topN)
+    .map((x) => `${x.name}=${x.calls}x/${x.avgMs}ms${x.errors ? `/err${x.errors}` : ""}`)
+    .join(" ");
+  return `[db] role=${s.role} max=${s.max} total=${s.total} idle=${s.idle} waiting=${s.waiting}${top ? ` ${top}` : ""}`;
+}
@@ -0,0 +1,74 @@
+/**
+ * Snapshot kolumn schematu public – jedno zapytanie do information_schema na start.
+ *
+ * Zastępuje wykrywanie per kolumna (hasColumn z zapytaniem na każdy klucz,
+ * link-counters.js, /najtansze). Zmiany schematu wymagają restartu procesu
+ * (albo reload() po migracji / initDb()).
+ *
+ * - loadSchemaSnapshot(db)        – { tables, hasTable, hasColumn, columns, pick, loadedAt },
+ * - createSchemaSnapshot(db, opts) – współdzielony, leniwy snapshot: get() / reload() / current().
+ */
+
+export const SCHEMA_SNAPSHOT_SQL = `
+  SELECT table_name, column_name
+  FROM information_schema.columns
+  WHERE table_schema='public'
+  ORDER BY table_name, ordinal_position
+`;
+
+export function schemaSnapshotFromRows(rows = []) {
+  const tables = new Map(); // table -> Set(columns)
+  for (const r of rows) {
+    const t = String(r.table_name);
+    if (!tables.has(t)) tables.set(t, new Set());
+    tables.get(t).add(String(r.column_name));
+  }
+
+  const hasTable = (table) => tables.has(String(table));
+  const hasColumn = (table, column) => !!tables.get(String(table))?.has(String(column));
+  const columns = (table) => tables.get(String(table)) || new Set();
+
+  // pierwsza istniejąca kolumna z listy kandydatów (albo null)
+  function pick(table, candidates) {
+    const cols = tables.get(String(table));
+    if (!cols) return null;
+    for (const c of candidates) if (cols.has(c)) return c;
+    return null;
+  }
+
+  return { tables, hasTable, hasColumn, columns, pick, loadedAt: Date.now() };
+}
+
+export async function loadSchemaSnapshot(db) {
+  const { rows } = await db.query(SCHEMA_SNAPSHOT_SQL);
+  return schemaSnapshotFromRows(rows || []);
+}
+
+export function createSchemaSnapshot(db, { log = console } = {}) {
+  if (!db) throw new Error("db missing in createSchemaSnapshot(db)");
+
+  let snapshot = null;
+  let loading = null;
+
+  function reload() {
+    loading = loadSchemaSnapshot(db)
+      .then((s) => {
+        snapshot = s;
+        log.log(`[schema] snapshot tables=${s.tables.size}`);
+        return s;
+      })
+      .catch((err) => {
+        log.error("[schema] snapshot error", err?.message || err);
+        loading = null; // następne get() spróbuje ponownie
+        return snapshot || schemaSnapshotFromRows([]);
+      });
+    return loading;
+  }
+
+  async function get() {
+    if (snapshot) return snapshot;
+    return loading || reload();
+  }
+
+  return { get, reload, current: () => snapshot };
+}
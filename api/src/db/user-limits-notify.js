@@ -0,0 +1,31 @@
+/**
+ * Postgres LISTEN/NOTIFY channel for plan / entitlement changes.
+ *
+ * Writer (np. stripe-webhook) woła notifyUserLimitsChanged() po zmianie planu,
+ * worker słucha kanału i unieważnia cache limitów (api/src/worker/user-limits-cache.js).
+ *
+ * payload: JSON { user_id?, telegram_user_id? } – pusty obiekt = unieważnij wszystko.
+ */
+
+import { listenChannel } from "./pg-listen.js";
+
+export const USER_LIMITS_CHANNEL = "fyd_user_limits";
+
+export async function notifyUserLimitsChanged(db, { userId = null, telegramUserId = null } = {}) {
+  const payload = {};
+  if (userId != null && Number.isFinite(Number(userId))) payload.user_id = Number(userId);
+  if (telegramUserId != null && String(telegramUserId).trim()) payload.telegram_user_id = String(telegramUserId);
+
+  try {
+    await db.query(`SELECT pg_notify($1, $2)`, [USER_LIMITS_CHANNEL, JSON.stringify(payload)]);
+  } catch (err) {
+    console.error("[user-limits] notify error", err?.message || err);
+  }
+}
+
+/**
+ * Dedykowany klient LISTEN z auto-reconnectem. onPayload(obj) dostaje sparsowany payload.
+ */
+export function listenUserLimitsChanged(pool, onPayload, { log = console, retryMs = 5000 } = {}) {
+  return listenChannel(pool, USER_LIMITS_CHANNEL, onPayload, { log, retryMs, tag: "user-limits" });
+}
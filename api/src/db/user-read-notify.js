@@ -0,0 +1,40 @@
+/**
+ * Postgres LISTEN/NOTIFY channel for data shown by bot read commands (/status, historia).
+ *
+ * Writerzy (api/db.js – linki, tryby, cisza nocna; worker – wysłane oferty / liczniki
+ * dzienne) wołają notifyUserReadChanged(), bot słucha kanału i unieważnia
+ * read model (api/src/bot/read-model.js).
+ *
+ * payload: JSON { user_ids?: number[], chat_id?: string } – pusty obiekt = unieważnij wszystko.
+ */
+
+import { listenChannel } from "./pg-listen.js";
+
+export const USER_READ_CHANNEL = "fyd_user_read";
+
+// NOTIFY payload < 8000 B – większe listy userów idą w kilku paczkach
+const USER_IDS_PER_NOTIFY = 500;
+
+export async function notifyUserReadChanged(db, { userIds = [], chatId = null } = {}) {
+  const ids = [...new Set((userIds || []).map(Number).filter((n) => Number.isFinite(n) && n > 0))];
+  const chat = chatId != null && String(chatId).trim() ? String(chatId) : null;
+  if (!ids.length && !chat) return;
+
+  const payloads = [];
+  for (let i = 0; i < ids.length; i += USER_IDS_PER_NOTIFY) {
+    payloads.push({ user_ids: ids.slice(i, i + USER_IDS_PER_NOTIFY), ...(chat ? { chat_id: chat } : {}) });
+  }
+  if (!payloads.length) payloads.push({ chat_id: chat });
+
+  try {
+    for (const p of payloads) {
+      await db.query(`SELECT pg_notify($1, $2)`, [USER_READ_CHANNEL, JSON.stringify(p)]);
+    }
+  } catch (err) {
+    console.error("[user-read] notify error", err?.message || err);
+  }
+}
+
+export function listenUserReadChanged(pool, onPayload, { log = console, retryMs = 5000 } = {}) {
+  return listenChannel(pool, USER_READ_CHANNEL, onPayload, { log, retryMs, tag: "user-read" });
+}
@@ -0,0 +1,126 @@
+/**
+ * Precompiled i18n catalog (i18n_unified.js; kopia TS: panel/app/_lib/i18n-catalog.ts).
+ *
+ * compileCatalog(translations, { fallbackLang }) raz na starcie:
+ * - zagnieżdżone słowniki -> płaskie mapy "cmd.help" -> funkcja szablonu per język,
+ * - fallback do fallbackLang rozwiązany z góry (brakujące klucze języka wskazują na szablon EN),
+ * - "{name}" skompilowane do listy kawałków – bez regexa przy każdym t().
+ *
+ * t(lang, key, vars) – jak dawniej: brak zmiennej zostaje jako "{name}", brak klucza -> key.
+ * Fallbacki i brakujące klucze idą do liczników (stats()), nie do logu przy każdym wywołaniu.
+ */
+
+const PLACEHOLDER_RE = /\{(\w+)\}/g;
+
+export function compileTemplate(value) {
+  const str = String(value);
+  const parts = []; // naprzemiennie: tekst, nazwa zmiennej, tekst, ...
+  let last = 0;
+  for (const m of str.matchAll(PLACEHOLDER_RE)) {
+    parts.push(str.slice(last, m.index), m[1]);
+    last = m.index + m[0].length;
+  }
+  if (!parts.length) return () => str;
+  parts.push(str.slice(last));
+
+  return (vars) => {
+    let out = parts[0];
+    for (let i = 1; i < parts.length; i += 2) {
+      const v = vars ? vars[parts[i]] : undefined;
+      out += (v !== undefined && v !== null ? String(v) : `{${parts[i]}}`) + parts[i + 1];
+    }
+    return out;
+  };
+}
+
+// { cmd: { help: "..." } } -> Map("cmd.help" -> "...")
+export function flattenMessages(obj, prefix = "", out = new Map()) {
+  for (const [k, v] of Object.entries(obj || {})) {
+    const key = prefix ? `${prefix}.${k}` : k;
+    if (v !== null && typeof v === "object" && !Array.isArray(v)) flattenMessages(v, key, out);
+    else if (v !== null && v !== undefined) out.set(key, v);
+  }
+  return out;
+}
+
+export function compileCatalog(translations, opts = {}) {
+  const { fallbackLang = "en", onMissing = null } = opts;
+
+  const compiled = new Map(); // lang -> Map(key -> template)
+  for (const [lang, dict] of Object.entries(translations || {})) {
+    const flat = new Map();
+    for (const [key, value] of flattenMessages(dict)) flat.set(key, compileTemplate(value));
+    compiled.set(lang, flat);
+  }
+
+  const base = compiled.get(fallbackLang) || new Map();
+  const fallbackKeys = new Map(); // lang -> Set kluczy wziętych z fallbackLang
+  for (const [lang, flat] of compiled) {
+    if (lang === fallbackLang) continue;
+    const fb = new Set();
+    for (const [key, tpl] of base) {
+      if (!flat.has(key)) {
+        flat.set(key, tpl);
+        fb.add(key);
+      }
+    }
+    fallbackKeys.set(lang, fb);
+  }
+
+  let counters = { calls: 0, fallback: new Map(), missing: new Map() }; // "lang:key" -> n
+
+  function bump(map, lang, key) {
+    const k = `${lang}:${key}`;
+    const n = (map.get(k) || 0) + 1;
+    map.set(k, n);
+    return n;
+  }
+
+  // undefined = brak klucza (caller decyduje, co zwrócić)
+  function lookup(lang, key, vars) {
+    counters.calls++;
+    const tpl = (compiled.get(lang) || base).get(key);
+
+    if (!tpl) {
+      if (bump(counters.missing, lang, key) === 1 && onMissing) onMissing(lang, key);
+      return undefined;
+    }
+    if (lang !== fallbackLang && (!compiled.has(lang) || fallbackKeys.get(lang)?.has(key))) {
+      bump(counters.fallback, lang, key);
+    }
+    return tpl(vars);
+  }
+
+  // brak klucza -> sam klucz (ostatnia deska ratunku – jak dawniej)
+  function t(lang, key, vars) {
+    return lookup(lang, key, vars) ?? key;
+  }
+
+  function has(lang, key) {
+    return !!(compiled.get(lang) || base).get(key);
+  }
+
+  function top(map, n) {
+    return [...map.entries()].sort((a, b) => b[1] - a[1]).slice(0, n);
+  }
+
+  function sum(map) {
+    let s = 0;
+    for (const v of map.values()) s += v;
+    return s;
+  }
+
+  function stats({ reset = false, topN = 5 } = {}) {
+    const out = {
+      calls: counters.calls,
+      fallback: sum(counters.fallback),
+      missing: sum(counters.missing),
+      topFallback: top(counters.fallback, topN),
+      topMissing: top(counters.missing, topN),
+    };
+    if (reset) counters = { calls: 0, fallback: new Map(), missing: new Map() };
+    return out;
+  }
+
+  return { t, lookup, has, stats, langs: [...compiled.keys()], keys: base.size };
+}
@@ -0,0 +1,304 @@
+/**
+ * Outbound Telegram queue with token-bucket rate shaping.
+ * Shared by api/worker.js (sendTelegram) and api/telegram-bot.js (tgApi).
+ *
+ * Buckets:
+ * - global   ~30 msg/s (per proces – worker i bot dzielą limit tokena, stąd ENV),
+ * - per chat ~1 msg/s (prywatne czaty),
+ * - per group 20 msg/min (chat_id < 0).
+ *
+ * Wiadomości jednego czatu idą po kolei (1 w locie na czat), różne czaty równolegle
+ * (do maxConcurrent). 429 blokuje tylko ten czat na retry_after – reszta kolejki leci dalej.
+ *
+ * send(method, payload) -> { ok, status, body, rawText } (jak dawne sendTelegram w workerze)
+ */
+
+function createBucket(capacity, refillPerSec) {
+  return {
+    capacity,
+    tokens: capacity,
+    refillPerMs: refillPerSec / 1000,
+    last: Date.now(),
+  };
+}
+
+function refill(b, now) {
+  if (now > b.last) {
+    b.tokens = Math.min(b.capacity, b.tokens + (now - b.last) * b.refillPerMs);
+    b.last = now;
+  }
+}
+
+// ile ms do dostępnego tokena (0 = można teraz)
+function waitMs(b, now) {
+  refill(b, now);
+  if (b.tokens >= 1) return 0;
+  return Math.ceil((1 - b.tokens) / b.refillPerMs);
+}
+
+function percentile(sorted, p) {
+  if (!sorted.length) return 0;
+  const i = Math.min(sorted.length - 1, Math.floor((p / 100) * sorted.length));
+  return sorted[i];
+}
+
+export function createTelegramSendQueue(opts = {}) {
+  const {
+    token,
+    fetch,
+    globalPerSec = 30,
+    perChatPerSec = 1,
+    perGroupPerMin = 20,
+    maxConcurrent = 8,
+    max429Retries = 5,
+    log = console,
+    logDebug = () => {},
+    label = "sendTelegram",
+    apiBase = "https://api.telegram.org",
+    onRateLimited = null, // (retryAfterSec, method) – metryki
+    onSent = null, // (method, ok, latencyMs) – metryki
+  } = opts;
+
+  if (!fetch) throw new Error("fetch missing in createTelegramSendQueue(opts)");
+
+  const globalBucket = createBucket(Math.max(1, globalPerSec), Math.max(0.1, globalPerSec));
+  const chats = new Map(); // chatKey -> { queue, bucket, inFlight, blockedUntil }
+  const ready = []; // chatKey-e z niepustą kolejką (FIFO między czatami)
+  const noChatQueue = []; // bez chat_id (np. answerCallbackQuery) – tylko globalny bucket
+  let inFlight = 0;
+  let timer = null;
+
+  const metrics = {
+    sent: 0,
+    failed: 0,
+    rateLimited: 0,
+    latencies: [], // ostatnie N (enqueue -> odpowiedź), ms
+    queuedPeak: 0,
+  };
+  const LAT_WINDOW = 1000;
+
+  function chatKeyOf(payload) {
+    const id = payload?.chat_id;
+    return id === undefined || id === null || id === "" ? null : String(id);
+  }
+
+  function getChat(key) {
+    let c = chats.get(key);
+    if (!c) {
+      const isGroup = /^-/.test(key);
+      c = {
+        queue: [],
+        bucket: isGroup
+          ? createBucket(Math.max(1, Math.min(3, perGroupPerMin)), perGroupPerMin / 60)
+          : createBucket(1, perChatPerSec),
+        inFlight: false,
+        blockedUntil: 0,
+      };
+      chats.set(key, c);
+    }
+    return c;
+  }
+
+  function queueDepth() {
+    let n = 0;
+    for (const c of chats.values()) n += c.queue.length;
+    return n + noChatQueue.length;
+  }
+
+  let timerAt = 0;
+
+  function schedule(ms) {
+    const at = Date.now() + Math.max(1, ms);
+    if (timer && timerAt <= at) return;
+    if (timer) clearTimeout(timer);
+    timerAt = at;
+    timer = setTimeout(() => {
+      timer = null;
+      pump();
+    }, Math.max(1, ms));
+  }
+
+  function pump() {
+    const now = Date.now();
+    let nextWake = Infinity;
+
+    while (inFlight < maxConcurrent) {
+      const g = waitMs(globalBucket, now);
+      if (g > 0) {
+        nextWake = Math.min(nextWake, g);
+        break;
+      }
+
+      let job = null;
+      let chat = null;
+
+      if (noChatQueue.length) {
+        job = noChatQueue.shift();
+      } else {
+        for (let i = 0; i < ready.length; i++) {
+          const key = ready[i];
+          const c = chats.get(key);
+          if (!c || !c.queue.length) {
+            ready.splice(i--, 1);
+            continue;
+          }
+          if (c.inFlight) continue;
+          if (c.blockedUntil > now) {
+            nextWake = Math.min(nextWake, c.blockedUntil - now);
+            continue;
+          }
+          const w = waitMs(c.bucket, now);
+          if (w > 0) {
+            nextWake = Math.min(nextWake, w);
+            continue;
+          }
+          // round-robin: czat na koniec listy
+          ready.splice(i, 1);
+          ready.push(key);
+          chat = c;
+          job = c.queue.shift();
+          break;
+        }
+      }
+
+      if (!job) break;
+
+      globalBucket.tokens -= 1;
+      if (chat) {
+        chat.bucket.tokens -= 1;
+        chat.inFlight = true;
+      }
+      inFlight++;
+      execute(job, chat).finally(() => {
+        inFlight--;
+        if (chat) chat.inFlight = false;
+        pump();
+      });
+    }
+
+    if (nextWake !== Infinity) schedule(nextWake);
+  }
+
+  async function execute(job, chat) {
+    const { method, payload } = job;
+    const url = `${apiBase}/bot${token}/${method}`;
+
+    try {
+      logDebug(
+        `${label}: request`,
+        JSON.stringify({ method, chat_id: payload && payload.chat_id })
+      );
+
+      const res = await fetch(url, {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify(payload),
+      });
+
+      const text = await res.text().catch(() => "");
+      let parsed = null;
+      try {
+        parsed = JSON.parse(text);
+      } catch {
+        parsed = null;
+      }
+
+      if (res.status === 429 && job.attempts < max429Retries) {
+        const retry = Number(parsed?.parameters?.retry_after) || 30;
+        metrics.rateLimited++;
+        job.attempts++;
+        if (onRateLimited) onRateLimited(retry, method);
+        log.warn(
+          `${label}: rate limit 429, chat=${payload?.chat_id ?? "-"} retry_after=${retry}s (queued, other chats continue)`
+        );
+        if (chat) {
+          chat.blockedUntil = Date.now() + retry * 1000;
+          chat.queue.unshift(job); // zachowaj kolejność w czacie
+        } else {
+          globalBucket.tokens = -retry * globalBucket.refillPerMs * 1000;
+          noChatQueue.unshift(job);
+        }
+        return;
+      }
+
+      const ok = res.ok && parsed?.ok !== false;
+      if (ok) metrics.sent++;
+      else {
+        metrics.failed++;
+        log.error(
+          `${label}: HTTP/Telegram error`,
+          JSON.stringify({ status: res.status, statusText: res.statusText, body: text })
+        );
+      }
+
+      finish(job, { ok, status: res.status, body: parsed ?? text, rawText: text });
+    } catch (err) {
+      metrics.failed++;
+      log.error(`${label}: exception`, err);
+      finish(job, { ok: false, status: 0, body: null, rawText: null });
+    }
+  }
+
+  function finish(job, result) {
+    const lat = Date.now() - job.enqueuedAt;
+    if (onSent) onSent(job.method, result.ok, lat);
+    metrics.latencies.push(lat);
+    if (metrics.latencies.length > LAT_WINDOW) metrics.latencies.shift();
+    job.resolve(result);
+  }
+
+  function send(method, payload) {
+    if (!token) {
+      log.error(`${label}: brak TELEGRAM_BOT_TOKEN (TG) – nie wysyłam wiadomości`);
+      return Promise.resolve({ ok: false, status: 0, body: null, rawText: null });
+    }
+
+    return new Promise((resolve) => {
+      const job = { method, payload, resolve, attempts: 0, enqueuedAt: Date.now() };
+      const key = chatKeyOf(payload);
+
+      if (key === null) {
+        noChatQueue.push(job);
+      } else {
+        const c = getChat(key);
+        c.queue.push(job);
+        if (!ready.includes(key)) ready.push(key);
+      }
+
+      const depth = queueDepth();
+      if (depth > metrics.queuedPeak) metrics.queuedPeak = depth;
+      pump();
+    });
+  }
+
+  function stats({ reset = false } = {}) {
+    const sorted = [...metrics.latencies].sort((a, b) => a - b);
+    const out = {
+      queueDepth: queueDepth(),
+      queuedPeak: metrics.queuedPeak,
+      inFlight,
+      sent: metrics.sent,
+      failed: metrics.failed,
+      rateLimited: metrics.rateLimited,
+      latencyP50: percentile(sorted, 50),
+      latencyP99: percentile(sorted, 99),
+    };
+    if (reset) {
+      metrics.sent = 0;
+      metrics.failed = 0;
+      metrics.rateLimited = 0;
+      metrics.latencies = [];
+      metrics.queuedPeak = 0;
+    }
+    // sprzątanie pustych czatów
+    const now = Date.now();
+    for (const [k, c] of chats.entries()) {
+      refill(c.bucket, now);
+      if (c.queue.length || c.inFlight || c.blockedUntil > now) continue;
+      if (c.bucket.tokens >= c.bucket.capacity) chats.delete(k);
+    }
+    return out;
+  }
+
+  return { send, stats, queueDepth };
+}
@@ -0,0 +1,219 @@
+/**
+ * Long-lived Chromium pool for the worker (OLX scraping).
+ *
+ * Zamiast chromium.launch() per link trzymamy N przeglądarek z ciepłym
+ * kontekstem i leasujemy strony. Przeglądarka jest recyklingowana gdy:
+ * - obsłużyła maxPagesPerBrowser stron,
+ * - padła (disconnected / lease zwrócony z crashed=true),
+ * - jej drzewo procesów przekroczyło maxRssMb (sprawdzane co memoryCheckEvery stron).
+ *
+ * deps:
+ * - chromium (playwright)
+ * - launchOptions, contextOptions
+ * - setupPage(page) – wołane raz na nową stronę (np. blokowanie zasobów)
+ */
+import { readFile } from "fs/promises";
+
+async function readRssKb(pid) {
+  try {
+    const txt = await readFile(`/proc/${pid}/status`, "utf8");
+    const m = txt.match(/^VmRSS:\s+(\d+)\s+kB/m);
+    return m ? Number(m[1]) : 0;
+  } catch {
+    return 0;
+  }
+}
+
+export function createBrowserPool(opts = {}) {
+  const {
+    chromium,
+    launchOptions = {},
+    contextOptions = {},
+    setupPage = async () => {},
+    size = 1,
+    maxPagesPerBrowser = 200,
+    maxIdlePagesPerBrowser = 2,
+    maxRssMb = 0,
+    memoryCheckEvery = 20,
+    log = console,
+    label = "browser-pool",
+  } = opts;
+
+  if (!chromium) throw new Error("chromium missing in createBrowserPool(opts)");
+
+  const poolSize = Math.max(1, Number(size) || 1);
+  const slots = [];
+  let nextSlotId = 1;
+
+  function isAlive(slot) {
+    return !!slot && !slot.dead && !slot.retiring && slot.browser?.isConnected?.();
+  }
+
+  async function launchSlot() {
+    const slot = {
+      id: nextSlotId++,
+      browser: null,
+      context: null,
+      launching: null,
+      idlePages: [],
+      busy: 0,
+      pages: 0,
+      dead: false,
+      retiring: false,
+    };
+    slots.push(slot);
+
+    slot.launching = (async () => {
+      const browser = await chromium.launch(launchOptions);
+      browser.on("disconnected", () => {
+        if (!slot.dead) log.log(`[${label}] browser #${slot.id} disconnected`);
+        slot.dead = true;
+        removeSlot(slot);
+      });
+      slot.browser = browser;
+      slot.context = await browser.newContext(contextOptions);
+      log.log(`[${label}] browser #${slot.id} launched`);
+    })();
+
+    try {
+      await slot.launching;
+    } catch (e) {
+      slot.dead = true;
+      removeSlot(slot);
+      throw e;
+    } finally {
+      slot.launching = null;
+    }
+    return slot;
+  }
+
+  function removeSlot(slot) {
+    const i = slots.indexOf(slot);
+    if (i >= 0) slots.splice(i, 1);
+  }
+
+  async function closeSlot(slot, reason) {
+    slot.retiring = true;
+    removeSlot(slot);
+    log.log(`[${label}] recycling browser #${slot.id} reason=${reason} pages=${slot.pages}`);
+    for (const p of slot.idlePages.splice(0)) await p.close().catch(() => null);
+    await slot.context?.close().catch(() => null);
+    await slot.browser?.close().catch(() => null);
+  }
+
+  async function browserRssMb(slot) {
+    // CDP zna PID-y wszystkich procesów Chromium (browser + renderery + gpu)
+    let session = null;
+    try {
+      session = await slot.browser.newBrowserCDPSession();
+      const info = await session.send("SystemInfo.getProcessInfo");
+      let kb = 0;
+      for (const p of info?.processInfo || []) kb += await readRssKb(p.id);
+      return Math.round(kb / 1024);
+    } catch {
+      return 0;
+    } finally {
+      await session?.detach().catch(() => null);
+    }
+  }
+
+  async function pickSlot() {
+    const alive = slots.filter((s) => isAlive(s) || s.launching);
+    if (alive.length < poolSize) return launchSlot();
+
+    // najmniej obciążona
+    let best = alive[0];
+    for (const s of alive) if (s.busy < best.busy) best = s;
+    if (best.launching) await best.launching;
+    if (!isAlive(best)) return launchSlot();
+    return best;
+  }
+
+  async function acquirePage(slot) {
+    while (slot.idlePages.length) {
+      const p = slot.idlePages.pop();
+      if (!p.isClosed()) return p;
+    }
+    const p = await slot.context.newPage();
+    await setupPage(p);
+    return p;
+  }
+
+  /**
+   * Zwraca lease: { page, newPage(), release({ crashed }) }.
+   * release() trzeba zawołać zawsze (finally).
+   */
+  async function lease() {
+    const slot = await pickSlot();
+    slot.busy++;
+
+    let page;
+    try {
+      page = await acquirePage(slot);
+    } catch (e) {
+      slot.busy--;
+      await closeSlot(slot, "page_error");
+      throw e;
+    }
+
+    let released = false;
+
+    const handle = {
+      page,
+
+      // strona się wysypała – daj nową z tego samego kontekstu
+      async newPage() {
+        await handle.page.close().catch(() => null);
+        handle.page = await acquirePage(slot);
+        return handle.page;
+      },
+
+      async release({ crashed = false } = {}) {
+        if (released) return;
+        released = true;
+        slot.busy--;
+        slot.pages++;
+
+        const p = handle.page;
+        if (crashed || p.isClosed() || slot.idlePages.length >= maxIdlePagesPerBrowser) {
+          await p.close().catch(() => null);
+        } else {
+          slot.idlePages.push(p);
+        }
+
+        if (slot.retiring || slot.dead) return;
+
+        let reason = null;
+        if (crashed) reason = "crash";
+        else if (maxPagesPerBrowser > 0 && slot.pages >= maxPagesPerBrowser) reason = "max_pages";
+        else if (maxRssMb > 0 && slot.pages % Math.max(1, memoryCheckEvery) === 0) {
+          const rss = await browserRssMb(slot);
+          if (rss > maxRssMb) reason = `rss_${rss}mb`;
+        }
+
+        if (reason) {
+          slot.retiring = true;
+          removeSlot(slot);
+          // poczekaj aż inne leasy z tej przeglądarki się skończą
+          const waitIdle = async () => {
+            while (slot.busy > 0) await new Promise((r) => setTimeout(r, 250));
+            await closeSlot(slot, reason);
+          };
+          waitIdle().catch(() => null);
+        }
+      },
+    };
+
+    return handle;
+  }
+
+  async function close() {
+    for (const s of slots.splice(0)) await closeSlot(s, "shutdown");
+  }
+
+  function stats() {
+    return slots.map((s) => ({ id: s.id, busy: s.busy, pages: s.pages, idle: s.idlePages.length }));
+  }
+
+  return { lease, close, stats };
+}
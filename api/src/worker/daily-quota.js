@@ -0,0 +1,115 @@
+/**
+ * In-memory daily notification quota for the worker loop.
+ *
+ * Zamiast COUNT po sent_offers per czat per link:
+ * - load() – jedno zapytanie na początku loopOnce (dzisiejsze liczniki wszystkich czatów),
+ * - add() – aktualizacja w pamięci przy każdym insertSentOffers,
+ * - flush() – jeden UPDATE chat_notifications (daily_count / last_notified_at) na koniec pętli.
+ *
+ * sent_offers zostaje SoT – liczniki w pamięci są odtwarzane z niej co pętlę.
+ */
+
+function keyOf(userId, chatId) {
+  return `${Number(userId)}:${String(chatId)}`;
+}
+
+export function createDailyQuotaTracker(opts = {}) {
+  const { pool, log = console } = opts;
+  if (!pool) throw new Error("pool missing in createDailyQuotaTracker(opts)");
+
+  let dayStart = null; // Date (UTC midnight)
+  let counts = new Map(); // "userId:chatId" -> sent today
+  let touched = new Map(); // "userId:chatId" -> { userId, chatId, notified }
+
+  function dayKey(d) {
+    return d ? d.toISOString().slice(0, 10) : null;
+  }
+
+  async function load(todayStart) {
+    const res = await pool.query(
+      `
+      SELECT user_id, chat_id, COUNT(*)::int AS cnt
+      FROM sent_offers
+      WHERE sent_at >= $1
+      GROUP BY user_id, chat_id
+      `,
+      [todayStart]
+    );
+
+    dayStart = todayStart;
+    counts = new Map();
+    for (const r of res.rows || []) counts.set(keyOf(r.user_id, r.chat_id), Number(r.cnt) || 0);
+    return counts.size;
+  }
+
+  // nowa doba w trakcie pętli – liczniki od zera
+  function ensureDay(todayStart) {
+    if (dayKey(dayStart) !== dayKey(todayStart)) {
+      dayStart = todayStart;
+      counts = new Map();
+    }
+  }
+
+  function isLoaded() {
+    return dayStart !== null;
+  }
+
+  function get(userId, chatId, todayStart) {
+    ensureDay(todayStart);
+    return counts.get(keyOf(userId, chatId)) || 0;
+  }
+
+  function add(userId, chatId, n = 1) {
+    const k = keyOf(userId, chatId);
+    counts.set(k, (counts.get(k) || 0) + (Number(n) || 0));
+  }
+
+  // zapamiętaj czat do zapisu daily_count przy flush()
+  function touch(userId, chatId, { notified = false } = {}) {
+    const k = keyOf(userId, chatId);
+    const prev = touched.get(k);
+    touched.set(k, {
+      userId: Number(userId),
+      chatId: String(chatId),
+      notified: !!(notified || prev?.notified),
+    });
+  }
+
+  async function flush() {
+    if (!dayStart) {
+      // load() padł – bez dnia nie wiadomo, do której doby zapisać; następna pętla zaczyna od nowa
+      touched = new Map();
+      return 0;
+    }
+    if (!touched.size) return 0;
+
+    const rows = [...touched.values()];
+    touched = new Map();
+
+    try {
+      const res = await pool.query(
+        `
+        UPDATE chat_notifications cn
+        SET daily_count = x.cnt,
+            daily_count_date = $5::date,
+            last_notified_at = CASE WHEN x.notified THEN NOW() ELSE cn.last_notified_at END
+        FROM UNNEST($1::text[], $2::int[], $3::int[], $4::boolean[]) AS x(chat_id, user_id, cnt, notified)
+        WHERE cn.chat_id = x.chat_id AND cn.user_id = x.user_id
+        `,
+        [
+          rows.map((r) => r.chatId),
+          rows.map((r) => r.userId),
+          rows.map((r) => counts.get(keyOf(r.userId, r.chatId)) || 0),
+          rows.map((r) => r.notified),
+          dayKey(dayStart),
+        ]
+      );
+      return res.rowCount || 0;
+    } catch (err) {
+      log.error("dailyQuota.flush error", err);
+      return 0;
+    }
+  }
+
+  return { load, isLoaded, get, add, touch, flush };
+}
@@ -0,0 +1,134 @@
+/**
+ * Adaptive per-link polling cadence for the worker.
+ *
+ * Każdy link ma własny interwał:
+ * - są świeże itemy -> interwał /2, najwyżej baseMs (do minimum planu),
+ * - pusto -> interwał *backoff (do maxMs) – martwe wyszukiwania odpytujemy rzadko,
+ * - błąd -> interwał bez zmian (nie młotkujemy źródła).
+ *
+ * Start (nowy link / restart workera): interwał szacowany z links.last_seen_at
+ * (kiedy ostatnio przesunął się last_key) – link i tak jest odpytany od razu.
+ * Zmiana url/filtrów linku = reset do baseMs.
+ * Przy leasingu (wiele replik) interwał i termin trzyma też DB: links.poll_interval_ms / next_poll_at.
+ */
+
+function clamp(v, lo, hi) {
+  return Math.max(lo, Math.min(hi, v));
+}
+
+function signatureOf(link) {
+  const f = link?.filters;
+  return `${link?.url || ""}|${typeof f === "string" ? f : JSON.stringify(f ?? null)}`;
+}
+
+export function createLinkCadence(opts = {}) {
+  const {
+    baseMs = 5 * 60 * 1000,
+    minMs = 60 * 1000,
+    maxMs = 6 * 60 * 60 * 1000,
+    backoff = 1.5,
+    speedup = 2,
+  } = opts;
+
+  const state = new Map(); // linkId -> { intervalMs, nextDueAt, lastFreshAt, sig, floorMs }
+
+  function seed(link, floorMs, now) {
+    const lastSeen = link?.last_seen_at ? new Date(link.last_seen_at).getTime() : NaN;
+    // ~ćwierć czasu od ostatniej nowości: link bez zmian od doby -> ~6h, od 20 min -> 5 min
+    const guess = Number.isFinite(lastSeen) ? (now - lastSeen) / 4 : baseMs;
+    // interwał zapisany przez (inną) replikę – links.poll_interval_ms
+    const stored = Number(link?.poll_interval_ms || 0);
+    return {
+      intervalMs: clamp(stored > 0 ? stored : Math.max(guess, Math.min(baseMs, maxMs)), floorMs, maxMs),
+      nextDueAt: now,
+      lastFreshAt: Number.isFinite(lastSeen) ? lastSeen : null,
+      sig: signatureOf(link),
+      floorMs,
+    };
+  }
+
+  function entry(link, floorMs, now) {
+    const id = Number(link.id);
+    let s = state.get(id);
+    if (!s || s.sig !== signatureOf(link)) {
+      s = seed(link, floorMs, now);
+      if (state.has(id)) s.intervalMs = clamp(baseMs, floorMs, maxMs); // edycja linku
+      state.set(id, s);
+    } else if (s.floorMs !== floorMs) {
+      // zmiana planu – nowe minimum
+      s.floorMs = floorMs;
+      s.intervalMs = clamp(s.intervalMs, floorMs, maxMs);
+      s.nextDueAt = Math.min(s.nextDueAt, (s.lastPolledAt || now) + s.intervalMs);
+    }
+    return s;
+  }
+
+  /**
+   * Czy link powinien być odpytany w tej pętli. floorMs = minimum planu.
+   */
+  function isDue(link, floorMs = minMs, now = Date.now()) {
+    const s = entry(link, Math.max(minMs, Number(floorMs) || 0), now);
+    return now >= s.nextDueAt;
+  }
+
+  // stan kadencji linku (leasing: zapis next_poll_at / poll_interval_ms do DB)
+  function get(linkId) {
+    const s = state.get(Number(linkId));
+    return s ? { intervalMs: s.intervalMs, nextDueAt: s.nextDueAt } : null;
+  }
+
+  /**
+   * Wynik przebiegu: fresh = liczba nowych itemów, null = błąd.
+   */
+  function record(linkId, fresh, now = Date.now()) {
+    const s = state.get(Number(linkId));
+    if (!s) return;
+
+    if (fresh === null) {
+      // błąd – bez zmiany interwału
+    } else if (fresh > 0) {
+      s.lastFreshAt = now;
+      // zimny link, który ożył, wraca od razu co najmniej do baseMs
+      s.intervalMs = clamp(Math.min(s.intervalMs / speedup, baseMs), s.floorMs, maxMs);
+    } else {
+      s.intervalMs = clamp(s.intervalMs * backoff, s.floorMs, maxMs);
+    }
+    s.lastPolledAt = now;
+    s.nextDueAt = now + s.intervalMs;
+  }
+
+  // usuń stan linków, których już nie ma / są nieaktywne
+  function retain(activeIds) {
+    const keep = new Set([...activeIds].map(Number));
+    for (const id of state.keys()) if (!keep.has(id)) state.delete(id);
+  }
+
+  // najbliższy termin spośród znanych linków (null = brak stanu)
+  function nextDueAt() {
+    let min = null;
+    for (const s of state.values()) if (min === null || s.nextDueAt < min) min = s.nextDueAt;
+    return min;
+  }
+
+  function stats(now = Date.now()) {
+    let due = 0;
+    let hot = 0;
+    let cold = 0;
+    let sum = 0;
+    for (const s of state.values()) {
+      if (now >= s.nextDueAt) due++;
+      if (s.intervalMs <= s.floorMs) hot++;
+      if (s.intervalMs >= maxMs) cold++;
+      sum += s.intervalMs;
+    }
+    return {
+      links: state.size,
+      due,
+      hot,
+      cold,
+      avgIntervalMs: state.size ? Math.round(sum / state.size) : 0,
+    };
+  }
+
+  return { isDue, record, get, retain, nextDueAt, stats };
+}
@@ -0,0 +1,136 @@
+/**
+ * Minimal Prometheus-style metrics for the worker (bez zależności od prom-client).
+ *
+ * registry.histogram(name, help, labelNames, buckets) -> { observe(labels, value) }
+ * registry.counter(name, help, labelNames)            -> { inc(labels, n) }
+ * registry.gauge(name, help, labelNames)              -> { set(labels, value) }
+ * registry.render() -> text exposition format (GET /metrics)
+ */
+
+import http from "http";
+
+export const DEFAULT_SECONDS_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120];
+
+function escapeLabel(v) {
+  return String(v ?? "").replace(/\\/g, "\\\\").replace(/\n/g, "\\n").replace(/"/g, '\\"');
+}
+
+function labelKey(labelNames, labels = {}) {
+  return labelNames.map((n) => String(labels[n] ?? "")).join("\u0001");
+}
+
+function renderLabels(labelNames, values, extra = null) {
+  const parts = labelNames.map((n, i) => `${n}="${escapeLabel(values[i])}"`);
+  if (extra) parts.push(`${extra[0]}="${escapeLabel(extra[1])}"`);
+  return parts.length ? `{${parts.join(",")}}` : "";
+}
+
+function formatNum(v) {
+  if (v === Infinity) return "+Inf";
+  return Number.isInteger(v) ? String(v) : String(+v.toFixed(6));
+}
+
+export function createMetricsRegistry() {
+  const metrics = [];
+
+  function histogram(name, help, labelNames = [], buckets = DEFAULT_SECONDS_BUCKETS) {
+    const series = new Map(); // labelKey -> { values, counts, sum, count }
+    const bounds = [...buckets].sort((a, b) => a - b);
+
+    function observe(labels, value) {
+      const v = Number(value);
+      if (!Number.isFinite(v)) return;
+      const k = labelKey(labelNames, labels);
+      let s = series.get(k);
+      if (!s) {
+        s = { values: labelNames.map((n) => labels?.[n] ?? ""), counts: new Array(bounds.length).fill(0), sum: 0, count: 0 };
+        series.set(k, s);
+      }
+      for (let i = 0; i < bounds.length; i++) if (v <= bounds[i]) s.counts[i]++;
+      s.sum += v;
+      s.count++;
+    }
+
+    function render() {
+      const out = [`# HELP ${name} ${help}`, `# TYPE ${name} histogram`];
+      for (const s of series.values()) {
+        bounds.forEach((b, i) => {
+          out.push(`${name}_bucket${renderLabels(labelNames, s.values, ["le", formatNum(b)])} ${s.counts[i]}`);
+        });
+        out.push(`${name}_bucket${renderLabels(labelNames, s.values, ["le", "+Inf"])} ${s.count}`);
+        out.push(`${name}_sum${renderLabels(labelNames, s.values)} ${formatNum(s.sum)}`);
+        out.push(`${name}_count${renderLabels(labelNames, s.values)} ${s.count}`);
+      }
+      return out.join("\n");
+    }
+
+    metrics.push({ render });
+    return { observe };
+  }
+
+  function scalar(type, name, help, labelNames = []) {
+    const series = new Map(); // labelKey -> { values, value }
+
+    function entry(labels) {
+      const k = labelKey(labelNames, labels);
+      let s = series.get(k);
+      if (!s) {
+        s = { values: labelNames.map((n) => labels?.[n] ?? ""), value: 0 };
+        series.set(k, s);
+      }
+      return s;
+    }
+
+    function render() {
+      const out = [`# HELP ${name} ${help}`, `# TYPE ${name} ${type}`];
+      for (const s of series.values()) out.push(`${name}${renderLabels(labelNames, s.values)} ${formatNum(s.value)}`);
+      return out.join("\n");
+    }
+
+    metrics.push({ render });
+    return { entry };
+  }
+
+  function counter(name, help, labelNames = []) {
+    const c = scalar("counter", name, help, labelNames);
+    return {
+      inc(labels = {}, n = 1) {
+        c.entry(labels).value += Number(n) || 0;
+      },
+    };
+  }
+
+  function gauge(name, help, labelNames = []) {
+    const g = scalar("gauge", name, help, labelNames);
+    return {
+      set(labels = {}, v = 0) {
+        g.entry(labels).value = Number(v) || 0;
+      },
+    };
+  }
+
+  function render() {
+    return metrics.map((m) => m.render()).join("\n") + "\n";
+  }
+
+  return { histogram, counter, gauge, render };
+}
+
+/**
+ * GET /metrics na osobnym porcie (worker nie ma express).
+ */
+export function startMetricsServer({ registry, port, host = "0.0.0.0", log = console }) {
+  const server = http.createServer((req, res) => {
+    if (req.method === "GET" && (req.url === "/metrics" || req.url?.startsWith("/metrics?"))) {
+      res.writeHead(200, { "content-type": "text/plain; version=0.0.4; charset=utf-8" });
+      res.end(registry.render());
+      return;
+    }
+    res.writeHead(404);
+    res.end();
+  });
+
+  server.on("error", (err) => log.error("[metrics] server error", err?.message || err));
+  server.listen(port, host, () => log.log(`[metrics] listening on ${host}:${port}/metrics`));
+  return server;
+}
@@ -0,0 +1,99 @@
+/**
+ * Loop-wide notification routing snapshot for the worker.
+ *
+ * Zamiast joinu links + chat_notifications + users + link_notification_modes +
+ * chat_quiet_hours per link z nowymi itemami:
+ * - load() – jedno zapytanie na początku loopOnce dla wszystkich aktywnych linków,
+ * - rowsFor(linkId) – czaty linku z pamięci (ten sam kształt wierszy co dawny join).
+ *
+ * Zmiany trybu / ciszy nocnej / planu w trakcie pętli działają od następnej pętli.
+ * Warianty zapytania to nazwane statements (src/db/pool.js) – plan raz na połączenie.
+ */
+
+import { query, statement } from "../db/pool.js";
+
+export const NOTIFY_ROUTING_SELECT = `
+  SELECT
+    l.id AS link_id,
+    cn.chat_id,
+    cn.user_id,
+    cn.enabled,
+    cn.mode AS chat_mode,
+    cn.daily_count,
+    cn.daily_count_date,
+    LOWER(COALESCE(lnm.mode, cn.mode)) AS effective_mode,
+    lnm.mode AS link_mode,
+    u.plan_name,
+    u.extra_link_packs,
+    COALESCE(NULLIF(u.lang,''), 'en') AS lang,
+    qh.quiet_enabled,
+    qh.quiet_from,
+    qh.quiet_to
+  FROM links l
+  JOIN chat_notifications cn
+    ON cn.user_id = l.user_id
+   AND (l.chat_id IS NULL OR cn.chat_id = l.chat_id)
+  JOIN users u
+    ON u.id = l.user_id
+  LEFT JOIN link_notification_modes lnm
+    ON lnm.user_id = cn.user_id
+   AND lnm.chat_id = cn.chat_id
+   AND lnm.link_id = l.id
+  LEFT JOIN chat_quiet_hours qh
+    ON qh.chat_id = cn.chat_id
+`;
+
+const NOTIFY_ROUTING_BY_LINKS = statement("notifyRoutingByLinks", `${NOTIFY_ROUTING_SELECT} WHERE l.id = ANY($1::int[])`);
+const NOTIFY_ROUTING_ACTIVE = statement("notifyRoutingActive", `${NOTIFY_ROUTING_SELECT} WHERE l.active = TRUE`);
+
+// fallback workera (snapshot niezaładowany) – czaty jednego linku
+export const NOTIFY_ROUTING_BY_LINK = statement("notifyRoutingByLink", `${NOTIFY_ROUTING_SELECT} WHERE l.id = $1`);
+
+export function createNotifyRoutingSnapshot(opts = {}) {
+  const { pool } = opts;
+  if (!pool) throw new Error("pool missing in createNotifyRoutingSnapshot(opts)");
+
+  let byLink = null; // linkId -> rows[]
+  let loadedAt = 0;
+
+  /**
+   * linkIds – linki tej pętli (pusta lista = wszystkie aktywne).
+   */
+  async function load(linkIds = []) {
+    const ids = [...new Set((linkIds || []).map(Number).filter(Number.isFinite))];
+    const res = ids.length
+      ? await query(NOTIFY_ROUTING_BY_LINKS, [ids], { db: pool })
+      : await query(NOTIFY_ROUTING_ACTIVE, [], { db: pool });
+
+    const next = new Map();
+    for (const row of res.rows || []) {
+      const id = Number(row.link_id);
+      if (!next.has(id)) next.set(id, []);
+      next.get(id).push(row);
+    }
+    byLink = next;
+    loadedAt = Date.now();
+    return res.rowCount || 0;
+  }
+
+  function isLoaded() {
+    return byLink !== null;
+  }
+
+  function rowsFor(linkId) {
+    return byLink?.get(Number(linkId)) || [];
+  }
+
+  // po pętli – następna buduje od nowa (fallback do zapytania per link, jeśli load() padnie)
+  function clear() {
+    byLink = null;
+  }
+
+  function stats() {
+    let chats = 0;
+    for (const rows of byLink?.values() || []) chats += rows.length;
+    return { links: byLink?.size || 0, chats, ageMs: loadedAt ? Date.now() - loadedAt : null };
+  }
+
+  return { load, isLoaded, rowsFor, clear, stats };
+}
@@ -0,0 +1,99 @@
+/**
+ * OLX listing bez przeglądarki: strona listingu ma wyniki w osadzonym stanie
+ *   window.__PRERENDERED_STATE__ = "<JSON jako string JS>";
+ *
+ * Zamiast DOM-u (Chromium + $$eval po div[data-cy="l-card"]) wycinamy jednym
+ * przejściem sam literal stanu z HTML i parsujemy tylko jego – bez budowania
+ * drzewa strony. null = nie udało się wyciągnąć (caller robi fallback na Playwright).
+ */
+
+const STATE_MARKERS = ["window.__PRERENDERED_STATE__", "__PRERENDERED_STATE__"];
+
+// Wytnij literal string JS ("..." albo '...') zaczynający się od html[start]; zwraca surowy środek.
+function sliceJsString(html, start) {
+  const quote = html[start];
+  if (quote !== '"' && quote !== "'") return null;
+
+  for (let i = start + 1; i < html.length; i++) {
+    const ch = html.charCodeAt(i);
+    if (ch === 92 /* \ */) {
+      i++;
+      continue;
+    }
+    if (html[i] === quote) return html.slice(start + 1, i);
+    if (ch === 10 /* \n */) return null;
+  }
+  return null;
+}
+
+function decodeJsString(body, quote) {
+  if (quote === '"') return JSON.parse(`"${body}"`);
+  // '...' – zamień na poprawny literal JSON
+  return JSON.parse(`"${body.replace(/\\'/g, "'").replace(/"/g, '\\"')}"`);
+}
+
+/**
+ * Zwraca surowy obiekt stanu albo null.
+ */
+export function extractOlxPrerenderedState(html) {
+  const s = String(html || "");
+
+  for (const marker of STATE_MARKERS) {
+    const at = s.indexOf(marker);
+    if (at < 0) continue;
+
+    let i = s.indexOf("=", at + marker.length);
+    if (i < 0) continue;
+    i++;
+    while (i < s.length && /\s/.test(s[i])) i++;
+
+    try {
+      if (s[i] === '"' || s[i] === "'") {
+        const body = sliceJsString(s, i);
+        if (body === null) continue;
+        return JSON.parse(decodeJsString(body, s[i]));
+      }
+      if (s[i] === "{") {
+        // stan jako obiekt JS/JSON – do średnika kończącego instrukcję w tym <script>
+        const end = s.indexOf("</script>", i);
+        const raw = s.slice(i, end < 0 ? undefined : end).trim().replace(/;\s*$/, "");
+        return JSON.parse(raw);
+      }
+    } catch {
+      // spróbuj kolejnego markera
+    }
+  }
+  return null;
+}
+
+/**
+ * Ogłoszenia z listingu (kolejność jak na stronie) albo null, gdy stanu brak / ma inny kształt.
+ */
+export function extractOlxListingAds(html) {
+  const state = extractOlxPrerenderedState(html);
+  if (!state || typeof state !== "object") return null;
+
+  const ads = state?.listing?.listing?.ads ?? state?.listing?.ads ?? null;
+  return Array.isArray(ads) ? ads : null;
+}
+
+// "https://ireland.apollo.olx.cdn/v1/files/.../image;s={width}x{height}" -> konkretny rozmiar
+export function olxPhotoUrl(ad, size = "1000x700") {
+  const p = Array.isArray(ad?.photos) ? ad.photos[0] : null;
+  const raw = typeof p === "string" ? p : p?.link || p?.url || null;
+  if (!raw) return null;
+  return String(raw).replace(/\{width\}x\{height\}/, size);
+}
+
+// tekst ceny jak w karcie ("1 200 zł", "Za darmo", "Zamienię") – dalej idzie przez parsePrice()
+export function olxPriceText(ad) {
+  const pr = ad?.price || {};
+  if (pr.displayValue) return String(pr.displayValue);
+  const v = pr.regularPrice?.value;
+  if (v != null) return `${v} ${pr.regularPrice?.currencySymbol || pr.regularPrice?.currencyCode || ""}`.trim();
+  return "";
+}
+
+export function olxHasDelivery(ad) {
+  return !!(ad?.delivery?.rock?.active || ad?.delivery?.active);
+}
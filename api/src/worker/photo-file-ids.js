@@ -0,0 +1,154 @@
+/**
+ * Telegram file_id cache dla zdjęć ofert (sendPhoto / sendMediaGroup).
+ *
+ * Pierwsza udana wysyłka zdjęcia po URL zwraca file_id – kolejne wysyłki tej samej
+ * oferty (inne czaty, wspólne linki, grupy + DM) idą po file_id, więc Telegram
+ * nie pobiera obrazka ponownie z (wolnego) hosta marketplace'u.
+ *
+ * - get(url)         – file_id z pamięci (LRU, max wpisów) albo null,
+ * - prefetch(urls)   – jedno zapytanie do tg_photo_file_ids dla brakujących w pamięci,
+ * - remember(url, id) / forget(url) – po udanej / odrzuconej wysyłce,
+ * - flush()          – zbiorczy upsert nowych / użytych wpisów na koniec pętli
+ *                      (+ co jakiś czas kasowanie nieużywanych od ttlDays).
+ *
+ * file_id jest ważny tylko dla bota, który go dostał (ten sam TELEGRAM_BOT_TOKEN).
+ */
+
+const MAX_URL_LEN = 2048;
+
+// największy rozmiar z Message.photo (PhotoSize[] rosnąco)
+export function photoFileIdOf(message) {
+  const sizes = Array.isArray(message?.photo) ? message.photo : null;
+  return sizes?.length ? sizes[sizes.length - 1]?.file_id || null : null;
+}
+
+// 400 z powodu samego file_id ("wrong file identifier", "wrong remote file identifier",
+// wygasła referencja) – tylko wtedy warto zapomnieć file_id i wysłać po URL;
+// inne 400 (chat not found, caption) skończą się tak samo
+const FILE_ID_REJECTED_RE = /wrong (remote )?file identifier|file reference|wrong file id|FILE_ID_INVALID/i;
+
+export function isFileIdRejected(res) {
+  if (res?.ok || res?.status !== 400) return false;
+  const desc = typeof res.body === "object" && res.body ? res.body.description : res.rawText || res.body;
+  return FILE_ID_REJECTED_RE.test(String(desc || ""));
+}
+
+export function createPhotoFileIdCache(opts = {}) {
+  const { pool, max = 5000, ttlDays = 30, pruneEveryMs = 6 * 60 * 60 * 1000, log = console } = opts;
+  if (!pool) throw new Error("pool missing in createPhotoFileIdCache(opts)");
+
+  const enabled = max > 0;
+  const mem = new Map(); // url -> file_id (kolejność Map = LRU)
+  let pending = new Map(); // url -> file_id do zapisu w flush()
+  let lastPruneAt = 0;
+  let stats = { hits: 0, misses: 0, stored: 0, dbLoaded: 0, forgotten: 0 };
+
+  function keyOf(url) {
+    const k = typeof url === "string" ? url.trim() : "";
+    return k && k.length <= MAX_URL_LEN ? k : null;
+  }
+
+  function put(k, fileId) {
+    mem.delete(k);
+    mem.set(k, fileId);
+    while (mem.size > max) mem.delete(mem.keys().next().value);
+  }
+
+  function get(url) {
+    const k = enabled ? keyOf(url) : null;
+    if (!k) return null;
+    const fileId = mem.get(k);
+    if (!fileId) {
+      stats.misses++;
+      return null;
+    }
+    put(k, fileId);
+    pending.set(k, fileId); // odśwież last_used_at
+    stats.hits++;
+    return fileId;
+  }
+
+  async function prefetch(urls = []) {
+    if (!enabled) return 0;
+    const missing = [...new Set(urls.map(keyOf).filter(Boolean))].filter((k) => !mem.has(k));
+    if (!missing.length) return 0;
+
+    try {
+      const res = await pool.query(
+        `SELECT photo_url, file_id FROM tg_photo_file_ids WHERE photo_url = ANY($1::text[])`,
+        [missing]
+      );
+      for (const r of res.rows || []) put(r.photo_url, r.file_id);
+      stats.dbLoaded += res.rowCount || 0;
+      return res.rowCount || 0;
+    } catch (err) {
+      log.error("photoFileIds.prefetch error", err?.message || err);
+      return 0;
+    }
+  }
+
+  function remember(url, fileId) {
+    const k = enabled ? keyOf(url) : null;
+    if (!k || !fileId) return;
+    put(k, String(fileId));
+    pending.set(k, String(fileId));
+    stats.stored++;
+  }
+
+  // Telegram odrzucił file_id (np. "wrong file identifier") – następnym razem po URL
+  function forget(url) {
+    const k = keyOf(url);
+    if (!k) return;
+    mem.delete(k);
+    pending.delete(k);
+    stats.forgotten++;
+  }
+
+  async function flush() {
+    if (!enabled) return 0;
+    let written = 0;
+
+    if (pending.size) {
+      const rows = [...pending.entries()];
+      pending = new Map();
+      try {
+        const res = await pool.query(
+          `
+          INSERT INTO tg_photo_file_ids (photo_url, file_id, created_at, last_used_at)
+          SELECT x.photo_url, x.file_id, NOW(), NOW()
+          FROM UNNEST($1::text[], $2::text[]) AS x(photo_url, file_id)
+          ON CONFLICT (photo_url) DO UPDATE SET
+            file_id = EXCLUDED.file_id,
+            last_used_at = NOW()
+          `,
+          [rows.map((r) => r[0]), rows.map((r) => r[1])]
+        );
+        written = res.rowCount || 0;
+      } catch (err) {
+        log.error("photoFileIds.flush error", err?.message || err);
+      }
+    }
+
+    if (Date.now() - lastPruneAt >= pruneEveryMs) {
+      lastPruneAt = Date.now();
+      try {
+        await pool.query(
+          `DELETE FROM tg_photo_file_ids WHERE last_used_at < NOW() - ($1::int * INTERVAL '1 day')`,
+          [ttlDays]
+        );
+      } catch (err) {
+        log.error("photoFileIds.prune error", err?.message || err);
+      }
+    }
+
+    return written;
+  }
+
+  function statsSnapshot({ reset = false } = {}) {
+    const out = { ...stats, size: mem.size };
+    if (reset) stats = { hits: 0, misses: 0, stored: 0, dbLoaded: 0, forgotten: 0 };
+    return out;
+  }
+
+  return { get, prefetch, remember, forget, flush, stats: statsSnapshot };
+}
@@ -0,0 +1,65 @@
+/**
+ * Decides when link_items history should be pruned (used by api/worker.js).
+ *
+ * Zamiast przycinać po każdym przebiegu linku liczymy w pamięci ile wierszy
+ * link dostał od ostatniego przycięcia:
+ * - link przycinamy inline dopiero gdy przekroczy keep o `slack` wierszy,
+ * - pierwszy przebieg linku po starcie procesu (stan nieznany) przycina zawsze,
+ * - co `sweepEveryMs` robimy batchowy sweep wszystkich linków z zaległościami.
+ */
+
+export function createPruneTracker(opts = {}) {
+  const { slack = 50, sweepEveryMs = 60 * 60 * 1000 } = opts;
+
+  const state = new Map(); // linkId -> { pending, keep }
+  let lastSweepAt = Date.now();
+
+  function note(linkId, inserted, keep) {
+    const id = Number(linkId);
+    const k = Number(keep);
+    if (!Number.isFinite(id) || !Number.isFinite(k) || k <= 0) return;
+
+    const st = state.get(id);
+    if (!st) {
+      state.set(id, { pending: Infinity, keep: k });
+      return;
+    }
+    st.pending += Number(inserted) || 0;
+    st.keep = k;
+  }
+
+  /**
+   * Zwraca keep jeśli link trzeba przyciąć teraz (i zeruje licznik), inaczej 0.
+   */
+  function take(linkId) {
+    const st = state.get(Number(linkId));
+    if (!st || st.pending < Math.max(1, slack)) return 0;
+    st.pending = 0;
+    return st.keep;
+  }
+
+  function sweepDue(now = Date.now()) {
+    return sweepEveryMs > 0 && now - lastSweepAt >= sweepEveryMs;
+  }
+
+  /**
+   * Wszystkie linki z zaległościami (pending > 0) – liczniki są zerowane.
+   */
+  function takeSweep(now = Date.now()) {
+    lastSweepAt = now;
+    const out = [];
+    for (const [linkId, st] of state.entries()) {
+      if (st.pending > 0) {
+        out.push({ linkId, keep: st.keep });
+        st.pending = 0;
+      }
+    }
+    return out;
+  }
+
+  function forget(linkId) {
+    state.delete(Number(linkId));
+  }
+
+  return { note, take, sweepDue, takeSweep, forget };
+}
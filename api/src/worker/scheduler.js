@@ -0,0 +1,119 @@
+/**
+ * Bounded-concurrency scheduler for worker links (used by loopOnce in api/worker.js).
+ *
+ * Limits are enforced at three levels:
+ * - global (max links in flight),
+ * - per source (olx / vinted – separate budgets),
+ * - per user (default 1, so links of one user keep their order
+ *   and daily limits are not counted concurrently).
+ *
+ * Tasks start FIFO; a task whose source/user slot is full is skipped
+ * until a slot frees up, the rest of the queue keeps moving.
+ */
+
+export function createLinkScheduler(opts = {}) {
+  const {
+    concurrency = 4,
+    perSource = {},
+    perUser = 1,
+    log = console,
+  } = opts;
+
+  const maxGlobal = Math.max(1, Number(concurrency) || 1);
+  const maxPerUser = Math.max(1, Number(perUser) || 1);
+
+  function sourceLimit(source) {
+    const v = Number(perSource?.[source] || 0);
+    return v > 0 ? v : maxGlobal;
+  }
+
+  /**
+   * tasks: [{ link, source, userKey }]
+   * worker: async (link) => void
+   *
+   * Zwraca statystyki pętli (do logów / strojenia limitów).
+   */
+  async function run(tasks, worker) {
+    const queue = [...(tasks || [])].map((t) => ({ ...t, enqueuedAt: Date.now() }));
+    const stats = {
+      total: queue.length,
+      done: 0,
+      failed: 0,
+      queueStart: queue.length,
+      inFlightPeak: 0,
+      waitMaxMs: 0,
+      waitSumMs: 0,
+      wallMs: 0,
+    };
+
+    const startedAt = Date.now();
+    if (!queue.length) return stats;
+
+    const runningBySource = new Map();
+    const runningByUser = new Map();
+    let inFlight = 0;
+
+    const inc = (m, k) => m.set(k, (m.get(k) || 0) + 1);
+    const dec = (m, k) => {
+      const n = (m.get(k) || 0) - 1;
+      if (n > 0) m.set(k, n);
+      else m.delete(k);
+    };
+
+    await new Promise((resolve) => {
+      function pump() {
+        if (!queue.length && inFlight === 0) return resolve();
+
+        for (let i = 0; i < queue.length && inFlight < maxGlobal; ) {
+          const task = queue[i];
+          const src = task.source || "unknown";
+          const usr = task.userKey || "__no_user__";
+
+          if ((runningBySource.get(src) || 0) >= sourceLimit(src)) {
+            i++;
+            continue;
+          }
+          if ((runningByUser.get(usr) || 0) >= maxPerUser) {
+            i++;
+            continue;
+          }
+
+          queue.splice(i, 1);
+          inFlight++;
+          inc(runningBySource, src);
+          inc(runningByUser, usr);
+          if (inFlight > stats.inFlightPeak) stats.inFlightPeak = inFlight;
+
+          const waited = Date.now() - task.enqueuedAt;
+          stats.waitSumMs += waited;
+          if (waited > stats.waitMaxMs) stats.waitMaxMs = waited;
+
+          Promise.resolve()
+            .then(() => worker(task.link))
+            .then(
+              () => {
+                stats.done++;
+              },
+              (err) => {
+                stats.failed++;
+                log.error(`Worker: error for link ${task.link?.id}`, err);
+              }
+            )
+            .finally(() => {
+              inFlight--;
+              dec(runningBySource, src);
+              dec(runningByUser, usr);
+              pump();
+            });
+        }
+      }
+
+      pump();
+    });
+
+    stats.wallMs = Date.now() - startedAt;
+    return stats;
+  }
+
+  return { run, limits: { concurrency: maxGlobal, perSource: { ...perSource }, perUser: maxPerUser } };
+}
@@ -0,0 +1,91 @@
+/**
+ * Bounded LRU + TTL cache for per-user plan limits in the worker.
+ *
+ * - loadMany(keys) – bulk z tabeli users/plan_features (1 zapytanie na pętlę),
+ * - loadOne(key) – fallback dla pojedynczego usera (np. HTTP /me),
+ * - invalidate({ user_id, telegram_user_id }) – z LISTEN/NOTIFY; pusty obiekt = wszystko.
+ *
+ * Klucz: telegram_user_id (string). Wartość: { userId, limits }.
+ */
+
+export function createUserLimitsCache(opts = {}) {
+  const {
+    max = 5000,
+    ttlMs = 5 * 60 * 1000,
+    loadMany = null,
+    loadOne = null,
+    log = console,
+  } = opts;
+
+  const entries = new Map(); // key -> { value, userId, expiresAt } (kolejność = LRU)
+
+  function set(key, value, userId = null) {
+    const k = String(key);
+    entries.delete(k);
+    entries.set(k, { value, userId: userId != null ? Number(userId) : null, expiresAt: Date.now() + ttlMs });
+    while (entries.size > max) entries.delete(entries.keys().next().value);
+  }
+
+  function peek(key) {
+    const k = String(key);
+    const e = entries.get(k);
+    if (!e) return undefined;
+    if (Date.now() >= e.expiresAt) {
+      entries.delete(k);
+      return undefined;
+    }
+    // LRU touch
+    entries.delete(k);
+    entries.set(k, e);
+    return e.value;
+  }
+
+  async function get(key) {
+    const k = String(key || "");
+    if (!k) return null;
+
+    const hit = peek(k);
+    if (hit !== undefined) return hit;
+    if (!loadOne) return null;
+
+    const r = await loadOne(k);
+    if (r) set(k, r.limits ?? null, r.userId);
+    return r?.limits ?? null;
+  }
+
+  /**
+   * Przeładuj wszystkie podane klucze jednym zapytaniem (brakujące / wygasłe).
+   */
+  async function warm(keys = []) {
+    if (!loadMany) return 0;
+    const missing = [...new Set((keys || []).map((k) => String(k || "")).filter(Boolean))].filter(
+      (k) => peek(k) === undefined
+    );
+    if (!missing.length) return 0;
+
+    try {
+      const loaded = await loadMany(missing); // Map key -> { userId, limits }
+      for (const [k, r] of loaded.entries()) set(k, r.limits ?? null, r.userId);
+      return loaded.size;
+    } catch (err) {
+      log.error("[user-limits] bulk load error", err?.message || err);
+      return 0;
+    }
+  }
+
+  function invalidate(payload = {}) {
+    const uid = payload?.user_id != null ? Number(payload.user_id) : null;
+    const tg = payload?.telegram_user_id != null ? String(payload.telegram_user_id) : null;
+
+    if (uid === null && tg === null) {
+      entries.clear();
+      return;
+    }
+    if (tg !== null) entries.delete(tg);
+    if (uid !== null) {
+      for (const [k, e] of entries.entries()) if (e.userId === uid) entries.delete(k);
+    }
+  }
+
+  return { get, warm, invalidate, size: () => entries.size };
+}
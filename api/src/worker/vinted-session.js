@@ -0,0 +1,165 @@
+/**
+ * Per-origin Vinted API session cache (cookies + anon access token).
+ *
+ * Wcześniej każdy link robił request.newContext + 2 warm-upy (/ i /catalog)
+ * przed właściwym API. Teraz kontekst per origin żyje do:
+ * - wygaśnięcia cookie z tokenem (access_token_web) albo ttlMs,
+ * - odpowiedzi 401/403 z API – wtedy sesja jest odświeżana i request
+ *   powtarzany raz (z pełnym warm-upem, także wejściem na /catalog).
+ *
+ * deps:
+ * - request (playwright)
+ * - proxy, extraHTTPHeaders
+ */
+
+const HTML_ACCEPT = "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8";
+const TOKEN_COOKIES = ["access_token_web", "_vinted_fr_session", "anon_id"];
+
+export function createVintedSessionCache(opts = {}) {
+  const {
+    request,
+    proxy = null,
+    extraHTTPHeaders = {},
+    ttlMs = 30 * 60 * 1000,
+    log = console,
+    logDebug = () => {},
+  } = opts;
+
+  if (!request) throw new Error("request missing in createVintedSessionCache(opts)");
+
+  const sessions = new Map(); // origin -> Promise<session>
+
+  async function tokenExpiresAt(api) {
+    try {
+      const st = await api.storageState();
+      let min = null;
+      for (const c of st?.cookies || []) {
+        if (!TOKEN_COOKIES.includes(c.name)) continue;
+        if (!(c.expires > 0)) continue;
+        const ms = c.expires * 1000;
+        if (min === null || ms < min) min = ms;
+      }
+      return min;
+    } catch {
+      return null;
+    }
+  }
+
+  async function createSession(origin, catalogUrl) {
+    const api = await request.newContext({
+      proxy: proxy || undefined,
+      baseURL: origin,
+      extraHTTPHeaders,
+    });
+
+    try {
+      // Warm-up: złap anon cookies / token
+      await api.get("/", { headers: { accept: HTML_ACCEPT } });
+
+      // Pełny warm-up (tylko przy odświeżeniu po 401/403): wejście na realny /catalog
+      if (catalogUrl) {
+        await api
+          .get(catalogUrl, { headers: { accept: HTML_ACCEPT, referer: origin + "/" } })
+          .catch(() => null);
+      }
+    } catch (e) {
+      await api.dispose().catch(() => null);
+      throw e;
+    }
+
+    const now = Date.now();
+    const cookieExp = await tokenExpiresAt(api);
+    // margines 60s, żeby nie strzelać tokenem tuż przed wygaśnięciem
+    const expiresAt = Math.min(now + ttlMs, cookieExp ? cookieExp - 60000 : Infinity);
+
+    logDebug(`[vinted-session] new origin=${origin} expires_in=${Math.round((expiresAt - now) / 1000)}s`);
+    return { api, origin, createdAt: now, expiresAt, uses: 0 };
+  }
+
+  function startSession(origin, catalogUrl) {
+    const p = createSession(origin, catalogUrl);
+    sessions.set(origin, p);
+    p.catch(() => {
+      if (sessions.get(origin) === p) sessions.delete(origin);
+    });
+    return p;
+  }
+
+  async function getSession(origin) {
+    const cached = sessions.get(origin);
+    if (cached) {
+      try {
+        const s = await cached;
+        if (Date.now() < s.expiresAt) return s;
+      } catch {
+        // nieudane tworzenie – spróbuj jeszcze raz poniżej
+      }
+      if (sessions.get(origin) === cached) await invalidate(origin);
+      if (sessions.has(origin)) return getSession(origin);
+    }
+    return startSession(origin, null);
+  }
+
+  // odśwież po 401/403 – chyba że inny request już to zrobił
+  async function refreshSession(origin, stale, catalogUrl) {
+    const cached = sessions.get(origin);
+    if (cached) {
+      try {
+        const s = await cached;
+        if (s !== stale && Date.now() < s.expiresAt) return s;
+      } catch {
+        // ignore
+      }
+      if (sessions.get(origin) === cached) await invalidate(origin);
+      if (sessions.has(origin)) return refreshSession(origin, stale, catalogUrl);
+    }
+    return startSession(origin, catalogUrl);
+  }
+
+  async function invalidate(origin) {
+    const p = sessions.get(origin);
+    sessions.delete(origin);
+    if (!p) return;
+    try {
+      const s = await p;
+      // daj w locie requestom dokończyć
+      setTimeout(() => s.api.dispose().catch(() => null), 30000).unref?.();
+    } catch {
+      // ignore
+    }
+  }
+
+  /**
+   * GET przez sesję danego originu; na 401/403 odśwież sesję i powtórz raz.
+   */
+  async function get(origin, url, reqOpts = {}, { catalogUrl = null } = {}) {
+    let session = await getSession(origin);
+    session.uses++;
+    let res = await session.api.get(url, reqOpts);
+
+    const st = res.status();
+    if (st === 401 || st === 403) {
+      log.log(`[vinted-session] HTTP ${st} origin=${origin} uses=${session.uses} -> refresh`);
+      session = await refreshSession(origin, session, catalogUrl);
+      session.uses++;
+      res = await session.api.get(url, reqOpts);
+    }
+
+    return res;
+  }
+
+  async function close() {
+    for (const origin of [...sessions.keys()]) {
+      const p = sessions.get(origin);
+      sessions.delete(origin);
+      try {
+        const s = await p;
+        await s.api.dispose().catch(() => null);
+      } catch {
+        // ignore
+      }
+    }
+  }
+
+  return { get, invalidate, close };
+}
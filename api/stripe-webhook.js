@@ -2,6 +2,8 @@
  * Stripe webhook extracted from api/index.js
  * Keeps idempotency + DB logging exactly as before.
  */
+import { notifyUserLimitsChanged } from "./src/db/user-limits-notify.js";
+
 export function registerStripeWebhookRoutes(app, express, ctx) {
   const { db, sqlPool, stripeApi, handleStripeEvent, markWebhookProcessed, markWebhookError } = ctx;
 
@@ -69,6 +71,13 @@ export function registerStripeWebhookRoutes(app, express, ctx) {
       await handleStripeEvent(sqlPool, event);
 
       await markWebhookProcessed(sqlPool, eventId);
+
+      // plan / entitlement mógł się zmienić – worker unieważnia cache limitów (LISTEN)
+      const meta = event?.data?.object?.metadata || {};
+      await notifyUserLimitsChanged(sqlPool, {
+        userId: meta.user_id,
+        telegramUserId: meta.telegram_user_id || meta.tg_user_id,
+      });
       return res.json({ ok: true });
     } catch (e) {
       console.error("[stripe] webhook error:", e);
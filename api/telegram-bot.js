@@ -2,13 +2,20 @@ import dotenv from "dotenv";
 dotenv.config();
 
 import fetch from "node-fetch";
-import pg from "pg";
 import Stripe from "stripe";
 import { randomBytes } from "crypto";
 import { fileURLToPath } from "url";
 import os from "os";
-import { t, getUserLang } from "./i18n_unified.js";
+import { t, getUserLang, i18nStats } from "./i18n_unified.js";
 import { normalizeCommand, getPrimaryAlias, generateHelpText } from "./command_aliases.js";
+import { createTelegramSendQueue } from "./src/telegram/send-queue.js";
+// wspólna pula procesu (rozmiar PG_POOL_MAX_BOT) – ta sama co w api/db.js
+import { pool, dbStats, formatDbStats } from "./src/db/pool.js";
+import { createUpdateDispatcher, formatDispatcherStats } from "./src/bot/updates/dispatcher.js";
+import { createSchemaSnapshot } from "./src/db/schema-snapshot.js";
+import { initSchemaCache } from "./src/bot/schema-cache.js";
+import { createUserReadModel } from "./src/bot/read-model.js";
+import { listenUserReadChanged } from "./src/db/user-read-notify.js";
 
 const __filename = fileURLToPath(import.meta.url);
 const BUILD_ID = "20260216_010100"; // HOTFIX: ASCII-only lowercase command aliases + i18n examples fixed (no diacritics/uppercase)
@@ -22,7 +29,6 @@ import {
   getUserById,
   getLinksByUserId,
   countActiveLinksForUserId,
-  countEnabledLinksForUserId,
   insertLinkForUserId,
   deactivateLinkForUserId,
   setQuietHours,
@@ -30,6 +36,7 @@ import {
   getQuietHours,
   logAdminAudit,
   cleanupAuditLog,
+  onUserDataChanged,
 } from "./db.js";
 import { clearLinkNotificationMode } from "./db.js";
 
@@ -42,8 +49,6 @@ import {
   getExtraLinkPacks,
 } from "./plans.js";
 
-const { Pool } = pg;
-
 const TG = process.env.TELEGRAM_BOT_TOKEN || "";
 const DATABASE_URL = process.env.DATABASE_URL || "";
 const STRIPE_KEY = process.env.STRIPE_SECRET_KEY || "";
@@ -61,9 +66,19 @@ if (!DATABASE_URL) {
   console.error("Brak DATABASE_URL w env – bot może mieć problem z DB.");
 }
 
-const pool = new Pool({
-  connectionString: DATABASE_URL,
+// snapshot information_schema raz na start (odświeżany po initDb) – zamiast wykrywania per kolumna
+const schema = createSchemaSnapshot(pool);
+initSchemaCache(schema);
+
+// /status i historia: jedno zapytanie na usera+czat, unieważniane przez zapisy
+// (db.js, bot, LISTEN fyd_user_read z workera/API); TTL dla zapisów bez NOTIFY (panel)
+const readModel = createUserReadModel({
+  db: pool,
+  schema,
+  ttlMs: Number(process.env.BOT_READ_MODEL_TTL_MS || 60000),
+  max: Number(process.env.BOT_READ_MODEL_MAX || 2000),
 });
+onUserDataChanged((change) => readModel.invalidate(change));
 
 // Initialize Stripe
 const stripe = STRIPE_KEY ? new Stripe(STRIPE_KEY, {
@@ -87,12 +102,19 @@ const ADMIN_TELEGRAM_IDS = new Set(
 // ---------- helpery ogólne ----------
 
 async function dbQuery(sql, params = []) {
-  const client = await pool.connect();
-  try {
-    return await client.query(sql, params);
-  } finally {
-    client.release();
+  return pool.query(sql, params);
+}
+
+// initDb() (DDL) raz na proces – wcześniej przy każdej wiadomości; po błędzie ponownie przy następnej
+let __initDbPromise = null;
+function initDbOnce() {
+  if (!__initDbPromise) {
+    __initDbPromise = initDb().catch((err) => {
+      __initDbPromise = null;
+      throw err;
+    });
   }
+  return __initDbPromise;
 }
 
 // Minimalne escape HTML dla Telegrama (parse_mode=HTML)
@@ -171,14 +193,20 @@ function isAdmin(tgId) {
   return ADMIN_TELEGRAM_IDS.has(String(tgId || ""));
 }
 
+// wspólna kolejka z workerem: per-chat / per-group / global token buckets, 429 nie blokuje innych czatów
+const tgQueue = createTelegramSendQueue({
+  token: TG,
+  fetch,
+  globalPerSec: Number(process.env.TG_GLOBAL_RATE_PER_SEC || 30),
+  perChatPerSec: Number(process.env.TG_CHAT_RATE_PER_SEC || 1),
+  perGroupPerMin: Number(process.env.TG_GROUP_RATE_PER_MIN || 20),
+  maxConcurrent: Number(process.env.TG_SEND_CONCURRENCY || 8),
+  label: "tgApi",
+});
+
 async function tgApi(method, payload) {
-  const url = `https://api.telegram.org/bot${TG}/${method}`;
-  const res = await fetch(url, {
-    method: "POST",
-    headers: { "Content-Type": "application/json" },
-    body: JSON.stringify(payload),
-  });
-  return res.json().catch(() => ({}));
+  const r = await tgQueue.send(method, payload);
+  return r.body && typeof r.body === "object" ? r.body : {};
 }
 
 async function tgSend(chatId, text, extra = {}) {
@@ -258,7 +286,7 @@ async function resolveUserIdFromTg(tgId) {
 
 // jeśli nie ma chat_notifications – tworzymy domyślnie WŁĄCZONE + single
 async function ensureChatNotificationsRow(chatId, userId) {
-  await dbQuery(
+  const res = await dbQuery(
     `
     INSERT INTO chat_notifications (chat_id, user_id, enabled, mode, daily_count, daily_count_date, created_at, updated_at)
     VALUES ($1, $2, TRUE, 'single', 0, CURRENT_DATE, NOW(), NOW())
@@ -266,6 +294,7 @@ async function ensureChatNotificationsRow(chatId, userId) {
     `,
     [String(chatId), Number(userId)]
   );
+  if (res.rowCount) readModel.invalidate({ userId, chatId });
 }
 
 // ---------- long polling z getUpdates ----------
@@ -323,18 +352,22 @@ async function buildStatusMessage(chatId, user) {
     : t(lang, "status.plan", { name: planName, exp: planExp });
   text += planText + "\n\n";
 
-  // Link counters
+  // liczniki, czat, cisza nocna, linki – jedno zapytanie (read model, cache per user+czat)
+  let summary = null;
   try {
-    const totalLinks = await countActiveLinksForUserId(userId);
-    const enabledLinks = await countEnabledLinksForUserId(userId);
-    text += t(lang, "status.links_enabled", { enabled: enabledLinks, limit: linkLimit }) + "\n";
-    text += t(lang, "status.links_total", { total: totalLinks, limit: linkLimit }) + "\n";
+    summary = await readModel.getSummary(userId, chatId);
+  } catch (e) {
+    console.error("buildStatusMessage: summary error", e);
+  }
+
+  // Link counters
+  if (summary) {
+    text += t(lang, "status.links_enabled", { enabled: summary.linksEnabled, limit: linkLimit }) + "\n";
+    text += t(lang, "status.links_total", { total: summary.linksTotal, limit: linkLimit }) + "\n";
     if (dailyLimit) {
       text += t(lang, "status.daily_limit", { limit: dailyLimit }) + "\n";
     }
     text += `\n`;
-  } catch (e) {
-    console.error("buildStatusMessage: link counters error", e);
   }
 
   // Chat notification settings
@@ -344,26 +377,20 @@ async function buildStatusMessage(chatId, user) {
   let notifDebugData = { source: "none", enabled: null, mode: null, rowCount: 0 };
   
   try {
-    const res = await dbQuery(
-      `
-      SELECT enabled, mode, daily_count, daily_count_date
-      FROM chat_notifications
-      WHERE chat_id = $1 AND user_id = $2
-      `,
-      [String(chatId), userId]
-    );
+    if (!summary) throw new Error("summary unavailable");
+    const chatRow = summary.chat;
 
     notifDebugData = {
       source: "chat_notifications",
       chatId: String(chatId),
       userId,
-      rowCount: res.rowCount || 0,
-      enabled: res.rows[0]?.enabled ?? null,
-      mode: res.rows[0]?.mode ?? null
+      rowCount: chatRow ? 1 : 0,
+      enabled: chatRow?.enabled ?? null,
+      mode: chatRow?.mode ?? null
     };
 
-    if (res.rowCount) {
-      const row = res.rows[0];
+    if (chatRow) {
+      const row = chatRow;
       const enabled = row.enabled !== false;
       const mode = (row.mode || "single").toLowerCase();
       chatDefaultMode = mode;
@@ -378,7 +405,7 @@ async function buildStatusMessage(chatId, user) {
       }
       if (dateStr !== todayStr) daily = 0;
 
-      const modeKey = mode === "batch" ? "mode.batch" : mode === "off" ? "mode.off" : "mode.single";
+      const modeKey = ["batch", "album", "off"].includes(mode) ? `mode.${mode}` : "mode.single";
       const modeLabel = t(lang, modeKey);
       const chatLineKey = enabled ? "status.chat_line_enabled" : "status.chat_line_disabled";
       text += t(lang, chatLineKey, { mode: modeLabel, daily, limit: dailyLimit }) + "\n\n";
@@ -396,7 +423,8 @@ async function buildStatusMessage(chatId, user) {
   let quietDebugData = { source: "none", enabled: null, from: null, to: null };
   
   try {
-    const qh = await getQuietHours(String(chatId));
+    if (!summary) throw new Error("summary unavailable");
+    const qh = summary.quiet;
     
     quietDebugData = {
       source: "chat_quiet_hours",
@@ -426,46 +454,27 @@ async function buildStatusMessage(chatId, user) {
 
   // Links list (up to 25)
   try {
-    const resLinks = await dbQuery(
-      `
-      SELECT
-        l.id,
-        l.name,
-        l.url,
-        l.source,
-        l.active,
-        lnm.mode AS link_mode
-      FROM links l
-      LEFT JOIN link_notification_modes lnm
-        ON lnm.user_id = l.user_id
-       AND lnm.chat_id = $2
-       AND lnm.link_id = l.id
-      WHERE l.user_id = $1
-        AND l.active = TRUE
-      ORDER BY l.id ASC
-      LIMIT 25
-      `,
-      [userId, String(chatId)]
-    );
+    if (!summary) throw new Error("summary unavailable");
+    const activeLinks = summary.activeLinks.slice(0, 25);
 
-    if (!resLinks.rowCount) {
+    if (!activeLinks.length) {
       text += t(lang, "status.no_links");
     } else {
       text += t(lang, "status.links_header") + "\n";
-      for (const row of resLinks.rows) {
+      for (const row of activeLinks) {
         const src = (row.source || "").toUpperCase() || "LINK";
         const name = row.name || row.url;
         const lm = row.link_mode == null ? null : String(row.link_mode).toLowerCase();
         const modeRaw =
           lm === null
             ? chatDefaultMode
-            : lm === "batch"
-            ? "batch"
+            : lm === "batch" || lm === "album"
+            ? lm
             : lm === "off"
             ? "off"
             : "single";
 
-        const modeKey = modeRaw === "batch" ? "mode.batch" : modeRaw === "off" ? "mode.off" : "mode.single";
+        const modeKey = ["batch", "album", "off"].includes(modeRaw) ? `mode.${modeRaw}` : "mode.single";
         const modeLabel = t(lang, modeKey);
         const state = row.active ? "✅" : "⛔";
         
@@ -989,7 +998,9 @@ async function handleStatus(msg, user) {
   const chatId = String(msg.chat.id);
 
   try {
-    await ensureChatNotificationsRow(chatId, user.id);
+    // wiersz chat_notifications zakładamy tylko, gdy read model go nie widzi
+    const summary = await readModel.getSummary(user.id, chatId).catch(() => null);
+    if (!summary?.chat) await ensureChatNotificationsRow(chatId, user.id);
     const statusText = await buildStatusMessage(chatId, user);
     await tgSend(chatId, statusText);
   } catch (err) {
@@ -1028,6 +1039,7 @@ async function handleNotificationsOn(msg, user) {
     `,
     [user.id]
   );
+  readModel.invalidate({ userId: user.id });
 
   const lang = getUserLang(user);
   await tgSend(chatId, t(lang, "notif.enabled"));
@@ -1049,6 +1061,7 @@ async function handleNotificationsOff(msg, user) {
     `,
     [chatId, user.id]
   );
+  readModel.invalidate({ userId: user.id, chatId });
 
   await tgSend(chatId, t(lang, "notif.disabled"));
 }
@@ -1098,6 +1111,7 @@ async function handleAdminReset(msg, _user, argText) {
     `,
     [Number(targetUser.id)]
   );
+  readModel.invalidate({ userId: targetUser.id });
 
   const nowIso = new Date().toISOString();
   await tgSend(
@@ -1207,6 +1221,7 @@ async function handleResetDaily(msg, user, argText) {
       [userId, tz]
     );
     rowCount = updateRes.rowCount || 0;
+    readModel.invalidate({ userId });
   } catch (err) {
     await tgSend(chatId, `❌ Błąd resetowania: ${escapeHtml(String(err?.message || err))}`);
     await logAdminAudit({
@@ -1461,6 +1476,7 @@ async function handleUsunUzytkownika(msg, user, argText) {
     await dbQuery("DELETE FROM users WHERE id=$1", [userId]);
 
     await dbQuery("COMMIT");
+    readModel.invalidate({ userId });
     await tgSend(chatId, `✅ Usunięto użytkownika telegram_user_id=${targetTgId} (user_id=${userId}) i wyczyszczono jego dane.`);
     await logAdminAudit({
       action: "delete_user",
@@ -1601,7 +1617,7 @@ async function handleAudit(msg, user, argText) {
   }
 }
 
-// ---------- /pojedyncze /zbiorcze (domyślny tryb czatu) ----------
+// ---------- /pojedyncze /zbiorcze /album (domyślny tryb czatu) ----------
 
 async function handleModeSingle(msg, user) {
   const chatId = String(msg.chat.id);
@@ -1616,6 +1632,7 @@ async function handleModeSingle(msg, user) {
     `,
     [chatId, user.id]
   );
+  readModel.invalidate({ userId: user.id, chatId });
 
   const lang = getUserLang(user);
   await tgSend(chatId, t(lang, "notif.mode_single"));
@@ -1634,16 +1651,36 @@ async function handleModeBatch(msg, user) {
     `,
     [chatId, user.id]
   );
+  readModel.invalidate({ userId: user.id, chatId });
 
   const lang = getUserLang(user);
   await tgSend(chatId, t(lang, "notif.mode_batch"));
 }
 
+async function handleModeAlbum(msg, user) {
+  const chatId = String(msg.chat.id);
+
+  await ensureChatNotificationsRow(chatId, user.id);
+
+  await dbQuery(
+    `
+    UPDATE chat_notifications
+    SET mode = 'album', updated_at = NOW()
+    WHERE chat_id = $1 AND user_id = $2
+    `,
+    [chatId, user.id]
+  );
+  readModel.invalidate({ userId: user.id, chatId });
+
+  const lang = getUserLang(user);
+  await tgSend(chatId, t(lang, "notif.mode_album"));
+}
+
 // ---------- tryb per-link na tym czacie ----------
 
 async function setPerLinkMode(chatId, userId, linkId, mode) {
   const m = String(mode || "").toLowerCase();
-  const finalMode = m === "batch" ? "batch" : m === "off" ? "off" : "single";
+  const finalMode = m === "batch" || m === "album" || m === "off" ? m : "single";
 
   // zabezpieczenie: link musi należeć do usera
   const chk = await dbQuery(
@@ -1662,6 +1699,7 @@ async function setPerLinkMode(chatId, userId, linkId, mode) {
     `,
     [Number(userId), String(chatId), Number(linkId), finalMode]
   );
+  readModel.invalidate({ userId, chatId });
 
   return { ok: true, mode: finalMode };
 }
@@ -1800,12 +1838,9 @@ async function handleQuietOff(msg, user) {
 
 async function fetchChatNotifyFrom(chatId, userId) {
   try {
-    const res = await dbQuery(
-      `SELECT notify_from FROM chat_notifications WHERE chat_id = $1 AND user_id = $2 LIMIT 1`,
-      [String(chatId), Number(userId)]
-    );
-    if (res.rowCount && res.rows[0].notify_from) {
-      return new Date(res.rows[0].notify_from);
+    const summary = await readModel.getSummary(userId, chatId);
+    if (summary.chat?.notify_from) {
+      return new Date(summary.chat.notify_from);
     }
   } catch (e) {
     console.error("[fetchChatNotifyFrom] error:", e);
@@ -1815,6 +1850,17 @@ async function fetchChatNotifyFrom(chatId, userId) {
   return d;
 }
 
+// link usera z read modelu (ten sam wpis co notify_from czatu) – null, gdy nie jego / brak
+async function findUserLink(chatId, userId, linkId) {
+  const summary = await readModel.getSummary(userId, chatId);
+  return summary.linkById.get(Number(linkId)) || null;
+}
+
+// wyniki zapytań historii w read modelu – do następnej wysyłki / zmiany linków usera
+async function historyRows(chatId, userId, key, sql, params) {
+  return readModel.history(userId, chatId, key, async () => (await dbQuery(sql, params)).rows || []);
+}
+
 function formatDateTime(date) {
   const d = new Date(date);
   return d.toISOString().replace('T', ' ').slice(0, 19);
@@ -1828,22 +1874,21 @@ async function handleNajnowsze(msg, user, argText) {
 
   // MODE 1: With ID (per-link)
   if (Number.isFinite(linkId) && linkId > 0) {
-    const linkQ = await dbQuery(
-      `SELECT id, name, url, notify_from FROM links WHERE id = $1 AND user_id = $2 LIMIT 1`,
-      [linkId, user.id]
-    );
+    const linkRow = await findUserLink(chatId, user.id, linkId);
 
-    if (!linkQ.rowCount) {
+    if (!linkRow) {
       await tgSend(chatId, t(lang, "najnowsze.link_not_found_detail", { id: linkId }));
       return;
     }
 
-    const linkRow = linkQ.rows[0];
     const since = new Date(
       Math.max(new Date(linkRow.notify_from || 0).getTime(), sinceChat.getTime())
     );
 
-    const itemsQ = await dbQuery(
+    const items = await historyRows(
+      chatId,
+      user.id,
+      `latest:${linkId}`,
       `SELECT title, price, currency, url, sent_at
        FROM sent_offers
        WHERE user_id = $1 AND chat_id = $2 AND link_id = $3 AND sent_at >= $4
@@ -1852,7 +1897,7 @@ async function handleNajnowsze(msg, user, argText) {
       [user.id, chatId, linkId, since]
     );
 
-    if (!itemsQ.rowCount) {
+    if (!items.length) {
       await tgSend(
         chatId,
         t(lang, "najnowsze_enhanced.no_history_per_link", {
@@ -1869,7 +1914,7 @@ async function handleNajnowsze(msg, user, argText) {
       since: formatDateTime(since),
     }) + "\n\n";
 
-    itemsQ.rows.forEach((it, idx) => {
+    items.forEach((it, idx) => {
       const title = escapeHtml(it.title || t(lang, "najnowsze_enhanced.no_title"));
       const priceStr = it.price != null ? `${it.price} ${it.currency || ""}`.trim() : "";
       out += `${idx + 1}. <b>${title}</b>\n`;
@@ -1879,12 +1924,15 @@ async function handleNajnowsze(msg, user, argText) {
     });
 
     // Footer: show other links from user
-    const otherLinksQ = await dbQuery(
+    const otherLinks = await historyRows(
+      chatId,
+      user.id,
+      `latest_other:${linkId}`,
       `SELECT DISTINCT link_id FROM sent_offers WHERE user_id = $1 AND chat_id = $2 AND link_id != $3 LIMIT 5`,
       [user.id, chatId, linkId]
     );
-    if (otherLinksQ.rowCount > 0) {
-      const otherIds = otherLinksQ.rows.map(r => r.link_id);
+    if (otherLinks.length > 0) {
+      const otherIds = otherLinks.map(r => r.link_id);
       out += `\n${t(lang, "najnowsze_enhanced.footer")} ${otherIds.map(id => `/najnowsze ${id}`).join(" ")}`;
     }
 
@@ -1893,7 +1941,10 @@ async function handleNajnowsze(msg, user, argText) {
   }
 
   // MODE 2: No ID (global - all links)
-  const globalQ = await dbQuery(
+  const globalRows = await historyRows(
+    chatId,
+    user.id,
+    "latest:",
     `SELECT so.link_id, so.title, so.price, so.currency, so.url, so.sent_at, l.name AS link_name
      FROM sent_offers so
      JOIN links l ON l.id = so.link_id
@@ -1903,7 +1954,7 @@ async function handleNajnowsze(msg, user, argText) {
     [user.id, chatId, sinceChat]
   );
 
-  if (!globalQ.rowCount) {
+  if (!globalRows.length) {
     await tgSend(
       chatId,
       t(lang, "najnowsze_enhanced.no_history_global", {
@@ -1917,7 +1968,7 @@ async function handleNajnowsze(msg, user, argText) {
     since: formatDateTime(sinceChat),
   }) + "\n\n";
 
-  globalQ.rows.forEach((row, idx) => {
+  globalRows.forEach((row, idx) => {
     const priceStr = row.price != null ? `${row.price} ${row.currency || ""}`.trim() : "";
     out += `${idx + 1}. [${row.link_id}] ${escapeHtml(row.link_name || "(no name)")}\n`;
     out += `<b>${escapeHtml(row.title || t(lang, "najnowsze_enhanced.no_title"))}</b>\n`;
@@ -1937,22 +1988,21 @@ async function handleNajtansze(msg, user, argText) {
 
   // MODE 1: With ID (per-link)
   if (Number.isFinite(linkId) && linkId > 0) {
-    const linkQ = await dbQuery(
-      `SELECT id, name, url, notify_from FROM links WHERE id = $1 AND user_id = $2 LIMIT 1`,
-      [linkId, user.id]
-    );
+    const linkRow = await findUserLink(chatId, user.id, linkId);
 
-    if (!linkQ.rowCount) {
+    if (!linkRow) {
       await tgSend(chatId, t(lang, "najnowsze.link_not_found_detail", { id: linkId }));
       return;
     }
 
-    const linkRow = linkQ.rows[0];
     const since = new Date(
       Math.max(new Date(linkRow.notify_from || 0).getTime(), sinceChat.getTime())
     );
 
-    const itemsQ = await dbQuery(
+    const items = await historyRows(
+      chatId,
+      user.id,
+      `cheapest:${linkId}`,
       `SELECT title, price, currency, url, sent_at
        FROM sent_offers
        WHERE user_id = $1 AND chat_id = $2 AND link_id = $3 AND sent_at >= $4 AND price IS NOT NULL
@@ -1961,7 +2011,7 @@ async function handleNajtansze(msg, user, argText) {
       [user.id, chatId, linkId, since]
     );
 
-    if (!itemsQ.rowCount) {
+    if (!items.length) {
       await tgSend(
         chatId,
         t(lang, "najtansze.no_history_per_link", {
@@ -1978,7 +2028,7 @@ async function handleNajtansze(msg, user, argText) {
       since: formatDateTime(since),
     }) + "\n\n";
 
-    itemsQ.rows.forEach((it, idx) => {
+    items.forEach((it, idx) => {
       const title = escapeHtml(it.title || t(lang, "najnowsze_enhanced.no_title"));
       const priceStr = it.price != null ? `${it.price} ${it.currency || ""}`.trim() : "";
       out += `${idx + 1}. <b>${title}</b>\n`;
@@ -1992,7 +2042,10 @@ async function handleNajtansze(msg, user, argText) {
   }
 
   // MODE 2: No ID (global - all links)
-  const globalQ = await dbQuery(
+  const globalRows = await historyRows(
+    chatId,
+    user.id,
+    "cheapest:",
     `SELECT so.link_id, so.title, so.price, so.currency, so.url, so.sent_at, l.name AS link_name
      FROM sent_offers so
      JOIN links l ON l.id = so.link_id
@@ -2002,7 +2055,7 @@ async function handleNajtansze(msg, user, argText) {
     [user.id, chatId, sinceChat]
   );
 
-  if (!globalQ.rowCount) {
+  if (!globalRows.length) {
     await tgSend(
       chatId,
       t(lang, "najtansze.no_history_global", {
@@ -2016,7 +2069,7 @@ async function handleNajtansze(msg, user, argText) {
     since: formatDateTime(sinceChat),
   }) + "\n\n";
 
-  globalQ.rows.forEach((row, idx) => {
+  globalRows.forEach((row, idx) => {
     const priceStr = row.price != null ? `${row.price} ${row.currency || ""}`.trim() : "";
     out += `${idx + 1}. [${row.link_id}] ${escapeHtml(row.link_name || "(no name)")}\n`;
     out += `<b>${escapeHtml(row.title || t(lang, "najnowsze_enhanced.no_title"))}</b>\n`;
@@ -2228,8 +2281,8 @@ async function handleCallback(update) {
 
   await ensureChatNotificationsRow(String(chatId), userId);
 
-  // lnmode:<linkId>:<off|single|batch>
-  const m = data.match(/^lnmode:(\d+):(off|single|batch)$/i);
+  // lnmode:<linkId>:<off|single|batch|album>
+  const m = data.match(/^lnmode:(\d+):(off|single|batch|album)$/i);
   if (m) {
     const linkId = Number(m[1]);
     const mode = String(m[2]).toLowerCase();
@@ -2240,8 +2293,7 @@ async function handleCallback(update) {
       return;
     }
 
-    const pretty =
-      res.mode === "batch" ? "batch" : res.mode === "off" ? "OFF" : "single";
+    const pretty = res.mode === "off" ? "OFF" : res.mode;
 
     await tgAnswerCb(cq.id, t("en", "callback.mode_set", { mode: pretty }));
     return;
@@ -2322,7 +2374,7 @@ if (m) {
   }
 
   // rejestracja / aktualizacja profilu
-  await initDb();
+  await initDbOnce();
 // W grupach może nie być from (anonimowy admin / sender_chat)
 if (!from || !from.id) {
   console.warn("TG update bez from.id (anon admin / sender_chat) – pomijam komendę");
@@ -2392,9 +2444,9 @@ await ensureUser(
     return;
   }
 
-  // Per-link commands with space syntax: /off 18, /on 18, /pojedyncze 18, /zbiorcze 18
+  // Per-link commands with space syntax: /off 18, /on 18, /pojedyncze 18, /zbiorcze 18, /album 18
   // Check if canonical is a per-link candidate AND has a numeric argument
-  if (["off", "on", "pojedyncze", "zbiorcze"].includes(canonical)) {
+  if (["off", "on", "pojedyncze", "zbiorcze", "album"].includes(canonical)) {
     const linkIdStr = argText.trim().split(/\s+/)[0];
     const linkId = linkIdStr ? Number(linkIdStr) : null;
 
@@ -2421,14 +2473,15 @@ await ensureUser(
           `UPDATE links SET notify_from = NOW() WHERE id = $1 AND user_id = $2`,
           [Number(linkId), Number(user.id)]
         );
+        readModel.invalidate({ userId: user.id });
 
         // odczytaj domyślny tryb czatu (żeby ładnie potwierdzić)
         const cn = await dbQuery(
           `SELECT mode FROM chat_notifications WHERE chat_id = $1 AND user_id = $2 LIMIT 1`,
           [String(chatId), Number(user.id)]
         );
-        const chatMode =
-          (cn.rows[0]?.mode || "single").toLowerCase() === "batch" ? "zbiorczo" : "pojedynczo";
+        const cnMode = (cn.rows[0]?.mode || "single").toLowerCase();
+        const chatMode = cnMode === "batch" ? "zbiorczo" : cnMode === "album" ? "album" : "pojedynczo";
 
         await tgSend(
           chatId,
@@ -2437,7 +2490,8 @@ await ensureUser(
         return;
       }
 
-      const mode = canonical === "zbiorcze" ? "batch" : canonical === "off" ? "off" : "single";
+      const mode =
+        canonical === "zbiorcze" ? "batch" : canonical === "album" ? "album" : canonical === "off" ? "off" : "single";
       const res = await setPerLinkMode(String(chatId), user.id, linkId, mode);
 
       if (!res.ok) {
@@ -2445,8 +2499,7 @@ await ensureUser(
         return;
       }
 
-      const pretty =
-        res.mode === "batch" ? "batch" : res.mode === "off" ? "OFF" : "single";
+      const pretty = res.mode === "off" ? "OFF" : res.mode;
 
       await tgSend(chatId, t(lang, "callback.link_mode_set", { linkId, mode: pretty }));
       return;
@@ -2509,6 +2562,8 @@ await ensureUser(
     await handleModeSingle(msg, user);
   } else if (canonical === "zbiorcze") {
     await handleModeBatch(msg, user);
+  } else if (canonical === "album") {
+    await handleModeAlbum(msg, user);
   } else if (canonical === "cisza_off") {
     await handleQuietOff(msg, user);
   } else if (canonical === "cisza") {
@@ -2534,6 +2589,16 @@ await ensureUser(
 
 // ---------- main loop ----------
 
+const BOT_UPDATE_CONCURRENCY = Number(process.env.BOT_UPDATE_CONCURRENCY || 16);
+const BOT_UPDATE_MAX_QUEUED = Number(process.env.BOT_UPDATE_MAX_QUEUED || 1000);
+const BOT_UPDATE_STATS_EVERY_MS = Number(process.env.BOT_UPDATE_STATS_EVERY_MS || 60000);
+
+const updateDispatcher = createUpdateDispatcher({
+  handleUpdate,
+  maxInFlight: BOT_UPDATE_CONCURRENCY,
+  maxQueued: BOT_UPDATE_MAX_QUEUED,
+});
+
 async function main() {
   // Log startup to verify stdout is connected to docker logs
   process.stdout.write("[tg-bot] Starting telegram-bot service\n");
@@ -2542,23 +2607,50 @@ async function main() {
   console.log(`[BOT_FILE] ${__filename}`);
   console.log(`[BOT_LANGS] ${Object.keys(SUPPORTED_LANGS).join(", ")}`);
 
-  await initDb();
+  await initDbOnce();
+  await schema.reload();
+  listenUserReadChanged(pool, readModel.onNotify);
 
   // Cleanup old audit logs (retention: 180 days) - KROK 6.2
   await cleanupAuditLog(180);
 
+  if (BOT_UPDATE_STATS_EVERY_MS > 0) {
+    setInterval(() => {
+      const st = updateDispatcher.stats({ reset: true });
+      if (st.handled || st.failed || st.queued) console.log(formatDispatcherStats(st));
+
+      const rm = readModel.stats({ reset: true });
+      if (rm.hits || rm.misses) {
+        console.log(
+          `[read-model] hits=${rm.hits} misses=${rm.misses} history_hits=${rm.historyHits} ` +
+            `history_misses=${rm.historyMisses} invalidations=${rm.invalidations} size=${rm.size}`
+        );
+      }
+
+      const ds = dbStats({ reset: true });
+      if (ds.statements.length || ds.waiting) console.log(formatDbStats(ds));
+
+      const is = i18nStats({ reset: true });
+      if (is.fallback || is.missing) {
+        const fmtTop = (arr) => arr.map(([k, n]) => `${k}:${n}`).join(",") || "-";
+        console.log(
+          `[i18n] calls=${is.calls} fallback=${is.fallback} missing=${is.missing} ` +
+            `top_fallback=${fmtTop(is.topFallback)} top_missing=${fmtTop(is.topMissing)}`
+        );
+      }
+    }, BOT_UPDATE_STATS_EVERY_MS).unref();
+  }
+
   while (true) {
     try {
       const updates = await fetchUpdates();
 
+      // równolegle między czatami, po kolei w obrębie czatu
       for (const u of updates) {
         offset = u.update_id + 1;
-        try {
-          await handleUpdate(u);
-        } catch (e) {
-          console.error("handleUpdate error:", e);
-        }
+        updateDispatcher.dispatch(u);
       }
+      await updateDispatcher.waitForCapacity();
     } catch (e) {
       console.error("polling error:", e);
       // krótka pauza przy błędach sieci
@@ -5,21 +5,63 @@ import { chromium, request } from "playwright";
 import {
   initDb,
   getLinksForWorker,
-  getSeenItemKeys,
-  insertLinkItems,
+  insertNewLinkItems,
   updateLastKey,
-  pruneLinkItems,
+  finishLinkPass,
+  pruneLinkItemsBatch,
+  getWorkerUserLimits,
+  claimLinkLeases,
+  hasDueLinks,
+  renewLinkLeases,
+  releaseLinkLease,
+  releaseAllLinkLeases,
+  withLinkDedupeLock,
+  LINK_DEDUPE_LOCK,
+  SENT_OFFERS_DEDUPE_DAYS,
 } from "./db.js";
+import { createLinkScheduler } from "./src/worker/scheduler.js";
+import { createBrowserPool } from "./src/worker/browser-pool.js";
+import { createVintedSessionCache } from "./src/worker/vinted-session.js";
+import { createPruneTracker } from "./src/worker/prune-tracker.js";
+import { createLinkCadence } from "./src/worker/link-cadence.js";
+import { createMetricsRegistry, startMetricsServer } from "./src/worker/metrics.js";
+import {
+  extractOlxListingAds,
+  olxPhotoUrl,
+  olxPriceText,
+  olxHasDelivery,
+} from "./src/worker/olx-listing.js";
+import { createDailyQuotaTracker } from "./src/worker/daily-quota.js";
+import { createNotifyRoutingSnapshot, NOTIFY_ROUTING_BY_LINK } from "./src/worker/notify-routing.js";
+import { createPhotoFileIdCache, isFileIdRejected, photoFileIdOf } from "./src/worker/photo-file-ids.js";
+import { getDailyNotificationLimit, getMinPollIntervalMs } from "./plans.js";
+import { createTelegramSendQueue } from "./src/telegram/send-queue.js";
+import { createUserLimitsCache } from "./src/worker/user-limits-cache.js";
+import { listenUserLimitsChanged } from "./src/db/user-limits-notify.js";
+import { notifyUserReadChanged } from "./src/db/user-read-notify.js";
 
 import fetch from "node-fetch";
-import pg from "pg";
-
-const { Pool } = pg;
-
-// Osobny pool tylko do chat_notifications / link_notification_modes
-const notifyPool = process.env.DATABASE_URL
-  ? new Pool({ connectionString: process.env.DATABASE_URL })
-  : new Pool();
+import os from "os";
+import { t, i18nStats } from "./i18n_unified.js";
+import { getPrimaryAlias } from "./command_aliases.js";
+// jedna pula na proces, wspólna z api/db.js (rozmiar: PG_POOL_MAX_WORKER)
+import { pool, query, statement, dbStats, formatDbStats, onStatementTiming } from "./src/db/pool.js";
+
+// Dzienne liczniki wysyłek per czat – ładowane raz na pętlę, flush raz na pętlę
+const dailyQuota = createDailyQuotaTracker({ pool });
+
+// Routing powiadomień (czaty, tryby, plan, cisza nocna) – jeden snapshot na pętlę
+const notifyRouting = createNotifyRoutingSnapshot({ pool });
+
+// userzy z nowymi sent_offers w tej pętli – NOTIFY fyd_user_read po dailyQuota.flush() (read model bota)
+const sentUserIds = new Set();
+
+// file_id zdjęć już wysłanych do Telegrama (TG_PHOTO_CACHE_MAX=0 wyłącza)
+const photoFileIds = createPhotoFileIdCache({
+  pool,
+  max: Number(process.env.TG_PHOTO_CACHE_MAX ?? 5000),
+  ttlDays: Number(process.env.TG_PHOTO_CACHE_TTL_DAYS || 30),
+});
 
 // =================== KONFIG TELEGRAM / WORKER ===================
 
@@ -28,12 +70,12 @@ const TG = process.env.TELEGRAM_BOT_TOKEN || "";
 const API_BASE = process.env.API_BASE || "http://api:3000";
 
 
-const userLimitsCache = new Map(); // tgUserId -> limits
-async function getUserLimits(telegramUserId) {
-  const key = String(telegramUserId || "");
-  if (!key) return null;
-  if (userLimitsCache.has(key)) return userLimitsCache.get(key);
+// Limity planu per user: LRU + TTL, bulk z DB raz na pętlę, unieważniane przez LISTEN/NOTIFY
+// (stripe-webhook -> notifyUserLimitsChanged). Pojedyncze braki – fallback HTTP /me.
+const USER_LIMITS_TTL_MS = Number(process.env.USER_LIMITS_TTL_MS || 5 * 60 * 1000);
+const USER_LIMITS_CACHE_MAX = Number(process.env.USER_LIMITS_CACHE_MAX || 5000);
 
+async function fetchUserLimitsFromApi(key) {
   try {
     const r = await fetch(API_BASE + "/me", {
       headers: { "X-Telegram-User-Id": key },
@@ -42,20 +84,38 @@ async function getUserLimits(telegramUserId) {
 
     const j = await r.json();
     const f = j?.features || {};
-    const out = {
-      sources_allowed: Array.isArray(f.sources_allowed) ? f.sources_allowed : null,
-      history_keep_per_link: Number(f.history_keep_per_link || 0) || null,
-      max_items_per_link_per_loop: Number(f.max_items_per_link_per_loop || 0) || null,
-      links_limit: Number(f.links_limit || 0) || null,
+    return {
+      userId: j?.id ?? null,
+      limits: {
+        sources_allowed: Array.isArray(f.sources_allowed) ? f.sources_allowed : null,
+        history_keep_per_link: Number(f.history_keep_per_link || 0) || null,
+        max_items_per_link_per_loop: Number(f.max_items_per_link_per_loop || 0) || null,
+        links_limit: Number(f.links_limit || 0) || null,
+        plan_code: j?.plan?.code ? String(j.plan.code).toLowerCase() : null,
+        poll_interval_min_sec: Number(f.poll_interval_min_sec || 0) || null,
+      },
     };
-
-    userLimitsCache.set(key, out);
-    return out;
   } catch (e) {
     return null;
   }
 }
 
+const userLimitsCache = createUserLimitsCache({
+  max: USER_LIMITS_CACHE_MAX,
+  ttlMs: USER_LIMITS_TTL_MS,
+  loadMany: getWorkerUserLimits,
+  loadOne: fetchUserLimitsFromApi,
+});
+
+listenUserLimitsChanged(pool, (payload) => {
+  logDebug(`[user-limits] invalidate ${JSON.stringify(payload)}`);
+  userLimitsCache.invalidate(payload);
+});
+
+async function getUserLimits(telegramUserId) {
+  return userLimitsCache.get(telegramUserId);
+}
+
 
 // debug logi
 const DEBUG =
@@ -133,14 +193,62 @@ function normalizeVintedItemUrl(rawUrl) {
 
 // Konfiguracja workera
 const LOOP_DELAY_MS = Number(process.env.LOOP_DELAY_MS || 300000); // przerwa między kolejnymi loopOnce
-const SLEEP_BETWEEN_ITEMS_MS = Number(process.env.SLEEP_BETWEEN_ITEMS_MS || 1200); // przerwa między wysyłkami do Telegrama
+const SLEEP_BETWEEN_ITEMS_MS = Number(process.env.SLEEP_BETWEEN_ITEMS_MS || 0); // dodatkowa przerwa po karcie (tempo trzyma kolejka TG)
+
+// Adaptacyjny polling: każdy link ma własny interwał (LOOP_DELAY_MS = startowy),
+// pętla budzi się co WORKER_TICK_MS i bierze tylko linki, którym minął termin.
+const LINK_POLL_ADAPTIVE = String(process.env.LINK_POLL_ADAPTIVE || "1") !== "0";
+const WORKER_TICK_MS = Number(process.env.WORKER_TICK_MS || Math.min(LOOP_DELAY_MS, 60000));
+const LINK_POLL_MIN_MS = Number(process.env.LINK_POLL_MIN_MS || 60000); // twarde minimum (ponad plan)
+const LINK_POLL_MAX_MS = Number(process.env.LINK_POLL_MAX_MS || 6 * 60 * 60 * 1000);
+const LINK_POLL_BACKOFF = Number(process.env.LINK_POLL_BACKOFF || 1.5);
+
+// Leasing (wiele replik): linki zajmowane partiami FOR UPDATE SKIP LOCKED, lease odnawiany heartbeatem
+const LINK_LEASING = String(process.env.LINK_LEASING || "0") === "1";
+const LINK_LEASE_MS = Number(process.env.LINK_LEASE_MS || 180000);
+const LINK_LEASE_BATCH = Number(process.env.LINK_LEASE_BATCH || 25);
+const WORKER_ID = process.env.WORKER_ID || `${os.hostname()}:${process.pid}`;
+
+// Kolejka Telegrama: token buckets (limit globalny jest per token bota – dzielony z tg-bot)
+const TG_GLOBAL_RATE_PER_SEC = Number(process.env.TG_GLOBAL_RATE_PER_SEC || 30);
+const TG_CHAT_RATE_PER_SEC = Number(process.env.TG_CHAT_RATE_PER_SEC || 1);
+const TG_GROUP_RATE_PER_MIN = Number(process.env.TG_GROUP_RATE_PER_MIN || 20);
+const TG_SEND_CONCURRENCY = Number(process.env.TG_SEND_CONCURRENCY || 8);
+
+// Równoległość pętli: globalnie / per źródło / per user (WORKER_CONCURRENCY=1 => sekwencyjnie jak dawniej)
+const WORKER_CONCURRENCY = Number(process.env.WORKER_CONCURRENCY || 4);
+const WORKER_CONCURRENCY_OLX = Number(process.env.WORKER_CONCURRENCY_OLX || 2);
+const WORKER_CONCURRENCY_VINTED = Number(process.env.WORKER_CONCURRENCY_VINTED || 3);
+const WORKER_CONCURRENCY_PER_USER = Number(process.env.WORKER_CONCURRENCY_PER_USER || 1);
+
+// Pula Chromium dla OLX (recykling po N stronach / crashu / przekroczeniu RSS)
+// OLX: "http" = HTML + osadzony stan listingu (Playwright tylko gdy ekstrakcja się nie uda), "browser" = zawsze Chromium
+const OLX_FETCH_MODE = String(process.env.OLX_FETCH_MODE || "http").toLowerCase();
+const olxFetchStats = { http: 0, fallback: 0 };
+const OLX_BROWSER_POOL_SIZE = Number(process.env.OLX_BROWSER_POOL_SIZE || 1);
+const OLX_BROWSER_MAX_PAGES = Number(process.env.OLX_BROWSER_MAX_PAGES || 200);
+const OLX_BROWSER_MAX_RSS_MB = Number(process.env.OLX_BROWSER_MAX_RSS_MB || 1024);
+
+// Jak długo max trzymamy sesję API Vinted (cookies/token) zanim zrobimy nowy warm-up
+const VINTED_SESSION_TTL_MS = Number(process.env.VINTED_SESSION_TTL_MS || 30 * 60 * 1000);
 
 // Domyślne limity
 const MAX_ITEMS_PER_LINK_PER_LOOP = Number(process.env.MAX_ITEMS_PER_LINK_PER_LOOP || 10); // max ofert na 1 link w 1 pętli
 const MIN_BATCH_ITEMS = 1; // minimalna liczba ofert, żeby wysłać paczkę w trybie /zbiorcze
+const TG_ALBUM_MAX = 10; // limit Telegrama: max zdjęć w jednym sendMediaGroup (tryb /album)
+const TG_CAPTION_MAX = 1024;
 
 // ile historii trzymać w DB na link (żeby nie puchło)
 const HISTORY_KEEP_PER_LINK = Number(process.env.HISTORY_KEEP_PER_LINK || 500);
+// przycinamy dopiero gdy link przekroczy keep o PRUNE_SLACK wierszy + okresowy sweep
+const PRUNE_SLACK = Number(process.env.PRUNE_SLACK || 50);
+const PRUNE_SWEEP_EVERY_MS = Number(process.env.PRUNE_SWEEP_EVERY_MS || 60 * 60 * 1000);
+const PRUNE_SWEEP_BATCH = Number(process.env.PRUNE_SWEEP_BATCH || 100);
+
+const pruneTracker = createPruneTracker({
+  slack: PRUNE_SLACK,
+  sweepEveryMs: PRUNE_SWEEP_EVERY_MS,
+});
 
 // Konfiguracja per źródło
 const SOURCE_CONFIG = {
@@ -473,6 +581,35 @@ function getVintedFallbackCurrency(linkUrl) {
   return null;
 }
 
+/**
+ * Kanoniczny klucz wyszukiwania (ten sam wynik scrapa) – linki z tym samym kluczem
+ * dzielą jeden scrape na pętlę. Vinted: URL zapytania API, OLX: host/ścieżka jak
+ * normalizeOlxUrl + posortowane parametry (filtry OLX siedzą w query).
+ */
+function searchKeyOf(link) {
+  const url = String(link?.url || "").trim();
+  const source = (link?.source || detectSource(url) || "").toLowerCase();
+  if (!url) return null;
+
+  try {
+    if (source === "vinted") {
+      const api = new URL(buildVintedApiUrl(url));
+      api.searchParams.sort();
+      return `vinted:${api.toString()}`;
+    }
+    if (source === "olx") {
+      const u = new URL(url);
+      const params = new URLSearchParams(u.search);
+      params.sort();
+      const qs = params.toString();
+      return `olx:${normalizeOlxUrl(url)}${qs ? "?" + qs : ""}`;
+    }
+  } catch {
+    // nieparsowalny URL – bez współdzielenia
+  }
+  return null;
+}
+
 // Buduje URL do API Vinted na podstawie URL /catalog
 function buildVintedApiUrl(catalogUrl) {
   const u = new URL(catalogUrl);
@@ -558,88 +695,79 @@ function matchFilters(item, filters = {}) {
   return true;
 }
 
-// ---------- Telegram – wysyłka (photo / message, retry na 429) ----------
-async function sendTelegram(method, payload) {
-  if (!TG) {
-    console.error(
-      "sendTelegram: brak TELEGRAM_BOT_TOKEN (TG) – nie wysyłam wiadomości"
-    );
-    return { ok: false, status: 0, body: null, rawText: null };
-  }
-
-  const url = `https://api.telegram.org/bot${TG}/${method}`;
-
-  while (true) {
-    try {
-      logDebug(
-        "sendTelegram: request",
-        JSON.stringify({
-          method,
-          url,
-          chat_id: payload && payload.chat_id,
-        })
-      );
-
-      const res = await fetch(url, {
-        method: "POST",
-        headers: { "Content-Type": "application/json" },
-        body: JSON.stringify(payload),
-      });
-
-      const text = await res.text().catch(() => "");
-      let parsed = null;
-      try {
-        parsed = JSON.parse(text);
-      } catch {
-        parsed = null;
-      }
-
-      if (res.status === 429) {
-        let retry = 30;
-        try {
-          if (parsed?.parameters?.retry_after) {
-            retry = Number(parsed.parameters.retry_after) || retry;
-          }
-        } catch {
-          // ignore
-        }
-
-        console.warn(
-          `sendTelegram: rate limit 429, retry_after=${retry}s, body=${text}`
-        );
-        await sleep(retry * 1000);
-        continue;
-      }
+// =================== METRYKI (Prometheus /metrics) ===================
+
+const METRICS_PORT = Number(process.env.METRICS_PORT || 9464); // 0 = wyłączone
+const METRICS_SLOWEST_LINKS = Number(process.env.METRICS_SLOWEST_LINKS || 5);
+
+const metricsRegistry = createMetricsRegistry();
+const workerMetrics = {
+  stageSeconds: metricsRegistry.histogram(
+    "fyd_worker_stage_seconds",
+    "processLink stage duration (scrape, filter, seen_insert, notify, prune)",
+    ["stage", "source"]
+  ),
+  linkSeconds: metricsRegistry.histogram("fyd_worker_link_seconds", "Whole processLink duration", ["source"]),
+  linksTotal: metricsRegistry.counter("fyd_worker_links_total", "Processed links", ["source", "result"]),
+  loopSeconds: metricsRegistry.histogram(
+    "fyd_worker_loop_seconds",
+    "loopOnce duration",
+    [],
+    [1, 5, 10, 30, 60, 120, 300, 600, 1200, 1800]
+  ),
+  tgSendSeconds: metricsRegistry.histogram(
+    "fyd_worker_telegram_send_seconds",
+    "Telegram call latency incl. queueing and 429 waits",
+    ["method", "result"]
+  ),
+  tgQueueDepth: metricsRegistry.gauge("fyd_worker_telegram_queue_depth", "Telegram send queue depth at loop end"),
+  tgRateLimited: metricsRegistry.counter("fyd_worker_telegram_429_total", "Telegram 429 responses", ["method"]),
+  tgRateLimitWaitSeconds: metricsRegistry.histogram(
+    "fyd_worker_telegram_429_wait_seconds",
+    "retry_after waits requested by Telegram",
+    ["method"],
+    [1, 2, 5, 10, 20, 30, 60, 120, 300]
+  ),
+  dbStatementSeconds: metricsRegistry.histogram(
+    "fyd_worker_db_statement_seconds",
+    "Named DB statement latency (src/db/pool.js)",
+    ["statement", "result"],
+    [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5]
+  ),
+  dbPoolWaiting: metricsRegistry.gauge("fyd_worker_db_pool_waiting", "Queries waiting for a pool connection at loop end"),
+  i18nLookups: metricsRegistry.counter(
+    "fyd_worker_i18n_lookups_total",
+    "t() lookups by result (ok, fallback = EN text used, missing = key returned)",
+    ["result"]
+  ),
+};
 
-      const ok = res.ok && (parsed?.ok !== false);
+onStatementTiming((name, ms, ok) => {
+  workerMetrics.dbStatementSeconds.observe({ statement: name, result: ok ? "ok" : "error" }, ms / 1000);
+});
 
-      if (!ok) {
-        console.error(
-          "sendTelegram: HTTP/Telegram error",
-          JSON.stringify({
-            status: res.status,
-            statusText: res.statusText,
-            body: text,
-          })
-        );
-      } else {
-        logDebug(
-          "sendTelegram: OK",
-          JSON.stringify({
-            method,
-            status: res.status,
-            chat_id: payload && payload.chat_id,
-          })
-        );
-      }
+// ---------- Telegram – wysyłka (photo / message) przez wspólną kolejkę ----------
+// 429 blokuje tylko dany czat (retry w kolejce), pozostałe czaty lecą dalej.
+const tgQueue = createTelegramSendQueue({
+  token: TG,
+  fetch,
+  globalPerSec: TG_GLOBAL_RATE_PER_SEC,
+  perChatPerSec: TG_CHAT_RATE_PER_SEC,
+  perGroupPerMin: TG_GROUP_RATE_PER_MIN,
+  maxConcurrent: TG_SEND_CONCURRENCY,
+  apiBase: process.env.TELEGRAM_API_BASE || "https://api.telegram.org",
+  logDebug,
+  onRateLimited: (retrySec, method) => {
+    workerMetrics.tgRateLimited.inc({ method });
+    workerMetrics.tgRateLimitWaitSeconds.observe({ method }, retrySec);
+  },
+  onSent: (method, ok, ms) => {
+    workerMetrics.tgSendSeconds.observe({ method, result: ok ? "ok" : "error" }, ms / 1000);
+  },
+});
 
-      return { ok, status: res.status, body: parsed ?? text, rawText: text };
-    } catch (err) {
-      console.error("sendTelegram: exception", err);
-      await sleep(2000);
-      return { ok: false, status: 0, body: null, rawText: null };
-    }
-  }
+async function sendTelegram(method, payload) {
+  return tgQueue.send(method, payload);
 }
 
 function formatLinkHeader(link) {
@@ -659,7 +787,7 @@ function formatLinkHeader(link) {
 
 async function countSentOffersSince(userId, chatId, since) {
   try {
-    const res = await notifyPool.query(
+    const res = await pool.query(
       `SELECT COUNT(*)::int AS cnt FROM sent_offers WHERE user_id = $1 AND chat_id = $2 AND sent_at >= $3`,
       [Number(userId), String(chatId), since]
     );
@@ -670,6 +798,31 @@ async function countSentOffersSince(userId, chatId, since) {
   }
 }
 
+const INSERT_SENT_OFFERS = statement(
+  "insertSentOffers",
+  `
+    INSERT INTO sent_offers (user_id, chat_id, link_id, item_id, price, currency, title, url, sent_at)
+    SELECT * FROM UNNEST(
+      $1::int[],
+      $2::text[],
+      $3::int[],
+      $4::text[],
+      $5::numeric[],
+      $6::text[],
+      $7::text[],
+      $8::text[],
+      $9::timestamptz[]
+    ) AS x(user_id, chat_id, link_id, item_id, price, currency, title, url, sent_at)
+    WHERE NOT EXISTS (
+      SELECT 1 FROM sent_offers so
+      WHERE so.chat_id = x.chat_id AND so.link_id = x.link_id AND so.item_id = x.item_id
+        AND so.sent_at >= NOW() - $10::int * INTERVAL '1 day'
+    )
+    ON CONFLICT DO NOTHING
+    RETURNING user_id, chat_id
+  `
+);
+
 async function insertSentOffers(rows = []) {
   const arr = Array.isArray(rows) ? rows.filter(Boolean) : [];
   if (!arr.length) return 0;
@@ -696,25 +849,20 @@ async function insertSentOffers(rows = []) {
     sentAts.push(r.sent_at ? r.sent_at : new Date());
   }
 
-  const res = await notifyPool.query(
-    `
-    INSERT INTO sent_offers (user_id, chat_id, link_id, item_id, price, currency, title, url, sent_at)
-    SELECT * FROM UNNEST(
-      $1::int[],
-      $2::text[],
-      $3::int[],
-      $4::text[],
-      $5::numeric[],
-      $6::text[],
-      $7::text[],
-      $8::text[],
-      $9::timestamptz[]
+  // pod lockiem per link_id – sent_offers (partycjonowane) nie ma unikalnego klucza na ofertę
+  const res = await withLinkDedupeLock(LINK_DEDUPE_LOCK.sent_offers, linkIds, (client) =>
+    query(
+      INSERT_SENT_OFFERS,
+      [userIds, chatIds, linkIds, itemIds, prices, currencies, titles, urls, sentAts, SENT_OFFERS_DEDUPE_DAYS],
+      { db: client }
     )
-    ON CONFLICT (chat_id, link_id, item_id) DO NOTHING
-    `,
-    [userIds, chatIds, linkIds, itemIds, prices, currencies, titles, urls, sentAts]
   );
 
+  for (const r of res.rows || []) {
+    dailyQuota.add(r.user_id, r.chat_id, 1);
+    sentUserIds.add(Number(r.user_id));
+  }
+
   return res.rowCount || 0;
 }
 
@@ -739,6 +887,81 @@ function hiddenLink(url) {
   return `<a href="${escapeHtml(url)}">\u200B</a>`;
 }
 
+// Mapy tekstów przycisków per język
+const ITEM_BUTTON_TEXTS = {
+  pl: {
+    disable: "🔕 Wyłącz ten link",
+    single: "📨 Pojedynczo",
+    batch: "📦 Zbiorczo",
+    album: "🖼 Album",
+    buyNow: "⚡ Kup teraz",
+  },
+  en: {
+    disable: "🔕 Disable this link",
+    single: "📨 Single",
+    batch: "📦 Batch",
+    album: "🖼 Album",
+    buyNow: "⚡ Buy now",
+  },
+};
+
+function itemButtonTexts(lang) {
+  // Normalizuj język (pl-PL → pl, en-US → en, itp.)
+  const normalizedLang = (lang || "en").toLowerCase().split("-")[0];
+  return ITEM_BUTTON_TEXTS[normalizedLang] || ITEM_BUTTON_TEXTS.en;
+}
+
+// wiersze przycisków lnmode:<id>:<tryb> (wyłącz / pojedynczo / zbiorczo / album)
+function linkModeButtons(linkId, t) {
+  return [
+    [{ text: t.disable, callback_data: `lnmode:${linkId}:off` }],
+    [
+      { text: t.single, callback_data: `lnmode:${linkId}:single` },
+      { text: t.batch, callback_data: `lnmode:${linkId}:batch` },
+      { text: t.album, callback_data: `lnmode:${linkId}:album` },
+    ],
+  ];
+}
+
+// cena / marka / rozmiar / stan – wspólne dla karty i albumu
+function itemDetailLines(item) {
+  let out = "";
+  if (item.price != null) {
+    const priceStr = `${item.price} ${item.currency || ""}`.trim();
+    out += `\n💰 ${escapeHtml(priceStr)}`;
+  }
+  if (item.brand) out += `\n🏷️ ${escapeHtml(item.brand)}`;
+  if (item.size) out += `\n📏 ${escapeHtml(item.size)}`;
+  if (item.condition) out += `\n✨ ${escapeHtml(item.condition)}`;
+  return out;
+}
+
+// Jedna polityka zdjęć dla karty i albumu: tylko Vinted (URL z API), bez placeholderów /
+// lazy-load (data:, .svg, "no_thumbnail"…) – jeden zły URL odrzuca cały sendMediaGroup.
+// OLX (zwłaszcza fallback przeglądarkowy z img.src) zostaje kartą tekstową.
+const PHOTO_PLACEHOLDER_RE = /placeholder|no[_-]?(thumbnail|image|photo)|blank\.|spacer\.|\.svg(\?|$)/i;
+
+function itemPhotoUrl(src, item) {
+  const u = item?.photoUrl;
+  if (src !== "vinted" || typeof u !== "string") return null;
+  if (!/^https?:\/\//i.test(u) || PHOTO_PLACEHOLDER_RE.test(u)) return null;
+  return u;
+}
+
+// sendPhoto po file_id z cache (jeśli jest), inaczej po URL; file_id z odpowiedzi trafia do cache
+async function sendTelegramPhoto(photoUrl, payload) {
+  const cached = photoFileIds.get(photoUrl);
+  if (cached) {
+    const res = await sendTelegram("sendPhoto", { ...payload, photo: cached });
+    if (!isFileIdRejected(res)) return res;
+    photoFileIds.forget(photoUrl); // file_id odrzucony – jeszcze raz po URL
+  }
+
+  const res = await sendTelegram("sendPhoto", { ...payload, photo: photoUrl });
+  if (res?.ok) photoFileIds.remember(photoUrl, photoFileIdOf(res.body?.result));
+  return res;
+}
+
 // wysyłka pojedynczej karty (photo / message) na konkretny chat
 async function tgSendItem(chatId, link, item, lang = "en", meta = {}) {
   if (!TG) return { sent: false, inserted: 0 };
@@ -747,39 +970,11 @@ async function tgSendItem(chatId, link, item, lang = "en", meta = {}) {
 
   const src = (link.source || detectSource(link.url) || "").toLowerCase();
   
-  // Normalizuj język (pl-PL → pl, en-US → en, itp.)
-  const normalizedLang = (lang || "en").toLowerCase().split("-")[0];
-  
-  // Mapy tekstów per język
-  const texts = {
-    pl: {
-      disable: "🔕 Wyłącz ten link",
-      single: "📨 Pojedynczo",
-      batch: "📦 Zbiorczo",
-      buyNow: "⚡ Kup teraz",
-    },
-    en: {
-      disable: "🔕 Disable this link",
-      single: "📨 Single",
-      batch: "📦 Batch",
-      buyNow: "⚡ Buy now",
-    },
-  };
-  
-  const t = texts[normalizedLang] || texts.en;
+  const t = itemButtonTexts(lang);
 
   const header = formatLinkHeader(link);
   let caption = `${header}\n\n<b>${escapeHtml(item.title || "")}</b>\n`;
-
-  if (item.price != null) {
-    const priceStr = `${item.price} ${item.currency || ""}`.trim();
-    caption += `\n💰 ${escapeHtml(priceStr)}`;
-  }
-
-  if (item.brand) caption += `\n🏷️ ${escapeHtml(item.brand)}`;
-  if (item.size) caption += `\n📏 ${escapeHtml(item.size)}`;
-  if (item.condition) caption += `\n✨ ${escapeHtml(item.condition)}`;
-
+  caption += itemDetailLines(item);
   caption += `\n\n${hiddenLink(item.url)}`;
 
   const keyboard = [
@@ -800,35 +995,15 @@ async function tgSendItem(chatId, link, item, lang = "en", meta = {}) {
     ]);
   }
 
-  keyboard.push([
-    {
-      text: t.disable,
-      callback_data: `lnmode:${link.id}:off`,
-    },
-  ]);
-  keyboard.push([
-    {
-      text: t.single,
-      callback_data: `lnmode:${link.id}:single`,
-    },
-    {
-      text: t.batch,
-      callback_data: `lnmode:${link.id}:batch`,
-    },
-  ]);
+  keyboard.push(...linkModeButtons(link.id, t));
 
   const replyMarkup = { inline_keyboard: keyboard };
 
-  const canSendPhoto =
-    src === "vinted" &&
-    item.photoUrl &&
-    typeof item.photoUrl === "string" &&
-    /^https?:\/\//i.test(item.photoUrl);
+  const photoUrl = itemPhotoUrl(src, item);
 
-  const sendRes = canSendPhoto
-    ? await sendTelegram("sendPhoto", {
+  const sendRes = photoUrl
+    ? await sendTelegramPhoto(photoUrl, {
         chat_id: chatId,
-        photo: item.photoUrl,
         caption,
         parse_mode: "HTML",
         reply_markup: replyMarkup,
@@ -854,10 +1029,133 @@ async function tgSendItem(chatId, link, item, lang = "en", meta = {}) {
     }
   }
 
-  await sleep(SLEEP_BETWEEN_ITEMS_MS);
+  if (SLEEP_BETWEEN_ITEMS_MS > 0) await sleep(SLEEP_BETWEEN_ITEMS_MS);
   return { sent: sentOk, inserted };
 }
 
+
+// długość tekstu widocznego po parsowaniu HTML (tak liczy limit podpisu Telegram)
+function visibleCaptionLength(html) {
+  return html.replace(/<[^>]*>/g, "").replace(/&(amp|lt|gt|quot);/g, "&").length;
+}
+
+// podpis jednego zdjęcia w albumie (nagłówek linku tylko przy pierwszym);
+// HTML nigdy nie jest cięty – skracany jest zwykły tytuł (escape po skróceniu),
+// a gdy to nie wystarczy, odpadają końcowe wiersze szczegółów
+function buildAlbumCaption(link, item, withHeader) {
+  const header = withHeader ? `${formatLinkHeader(link)}\n\n` : "";
+  const details = itemDetailLines(item).split("\n").filter(Boolean);
+  let title = String(item.title || "").trim() || String(item.url || "");
+
+  const tail = () => (details.length ? `\n${details.join("\n")}` : "");
+  const withTitle = (text) => `${header}<b><a href="${escapeHtml(item.url)}">${escapeHtml(text)}</a></b>${tail()}`;
+
+  while (details.length && visibleCaptionLength(withTitle("")) > TG_CAPTION_MAX - 1) details.pop();
+  const budget = TG_CAPTION_MAX - visibleCaptionLength(withTitle(""));
+  if (title.length > budget) {
+    title = title.slice(0, Math.max(budget - 1, 0)).replace(/[\uD800-\uDBFF]$/, ""); // bez połówki pary surogatów
+    if (budget > 1) title += "…";
+  }
+  return withTitle(title);
+}
+
+/**
+ * Tryb /album: do TG_ALBUM_MAX kart ze zdjęciem w jednym sendMediaGroup
+ * (1 wywołanie API zamiast N), potem jedna krótka wiadomość z przyciskami trybu
+ * (albumy nie przyjmują reply_markup). Oferty bez zdjęcia, pojedyncze zdjęcie
+ * i album odrzucony przez Telegram (np. zły URL zdjęcia) -> zwykłe karty tgSendItem.
+ */
+async function tgSendAlbum(chatId, link, items, lang = "en", meta = {}) {
+  if (!TG) return { sent: false, inserted: 0 };
+
+  const userId = meta?.userId ?? link.user_id ?? link.userId ?? null;
+  const skippedExtra = meta?.skippedExtra || 0;
+
+  const src = (link.source || detectSource(link.url) || "").toLowerCase();
+  const albumPhotoUrl = (it) => itemPhotoUrl(src, it);
+  const withPhoto = items.filter((it) => albumPhotoUrl(it));
+  const rest = items.filter((it) => !albumPhotoUrl(it));
+
+  let sentSomething = false;
+  let insertedTotal = 0;
+  let albums = 0;
+
+  for (let i = 0; i < withPhoto.length; i += TG_ALBUM_MAX) {
+    const group = withPhoto.slice(i, i + TG_ALBUM_MAX);
+    if (group.length < 2) {
+      rest.push(...group);
+      continue;
+    }
+
+    // file_id z cache – jeden get() na zdjęcie (licznik trafień / last_used_at)
+    const cachedIds = group.map((it) => photoFileIds.get(albumPhotoUrl(it)));
+    const sendGroup = (useCache) =>
+      sendTelegram("sendMediaGroup", {
+        chat_id: chatId,
+        media: group.map((it, idx) => ({
+          type: "photo",
+          media: (useCache && cachedIds[idx]) || albumPhotoUrl(it),
+          caption: buildAlbumCaption(link, it, idx === 0 && albums === 0),
+          parse_mode: "HTML",
+        })),
+      });
+
+    let sendRes = await sendGroup(true);
+    if (cachedIds.some(Boolean) && isFileIdRejected(sendRes)) {
+      group.forEach((it, idx) => cachedIds[idx] && photoFileIds.forget(albumPhotoUrl(it)));
+      sendRes = await sendGroup(false);
+    }
+
+    if (!sendRes?.ok) {
+      logDebug(`[album] link=${link.id} chat=${chatId} group=${group.length} status=${sendRes?.status} -> fallback single`);
+      rest.push(...group);
+      continue;
+    }
+
+    albums++;
+    sentSomething = true;
+    const messages = Array.isArray(sendRes.body?.result) ? sendRes.body.result : [];
+    group.forEach((it, idx) => {
+      const fileId = photoFileIdOf(messages[idx]);
+      if (fileId) photoFileIds.remember(albumPhotoUrl(it), fileId);
+    });
+    const rows = group.map((it) => toSentOfferRow(userId, chatId, link, it)).filter(Boolean);
+    if (rows.length) {
+      const inserted = await insertSentOffers(rows);
+      insertedTotal += inserted;
+      if (inserted) console.error(`[sent_debug] chat=${chatId} link=${link.id} sent_n=${inserted}`);
+    }
+    if (SLEEP_BETWEEN_ITEMS_MS > 0) await sleep(SLEEP_BETWEEN_ITEMS_MS);
+  }
+
+  for (const item of rest) {
+    const { sent, inserted } = await tgSendItem(chatId, link, item, lang, { userId });
+    if (sent) sentSomething = true;
+    insertedTotal += inserted || 0;
+  }
+
+  if (albums > 0) {
+    const btn = itemButtonTexts(lang);
+    let text = `🖼 ${formatLinkHeader(link)}`;
+    if (skippedExtra > 0) {
+      text += `\n${t(lang, "notif.album_more", {
+        count: skippedExtra,
+        command: getPrimaryAlias("najnowsze", lang),
+        id: link.id,
+      })}`;
+    }
+    await sendTelegram("sendMessage", {
+      chat_id: chatId,
+      text,
+      parse_mode: "HTML",
+      disable_web_page_preview: true,
+      reply_markup: { inline_keyboard: linkModeButtons(link.id, btn) },
+    });
+  }
+
+  return { sent: sentSomething, inserted: insertedTotal, albums };
+}
+
 // tekst do trybu /zbiorcze
 function buildBatchMessage(link, items, skippedExtra = 0) {
   const header = formatLinkHeader(link);
@@ -892,53 +1190,23 @@ async function notifyChatsForLink(link, items, skippedExtra, opts = {}) {
   const minBatchItems = opts.minBatchItems || MIN_BATCH_ITEMS;
 
   const now = new Date();
-  const todayStr = now.toISOString().slice(0, 10);
   const nowHour = now.getHours();
   const todayStart = getTodayStart();
 
   try {
-    const res = await notifyPool.query(
-      `
-      SELECT
-        cn.chat_id,
-        cn.user_id,
-        cn.enabled,
-        cn.mode AS chat_mode,
-        cn.daily_count,
-        cn.daily_count_date,
-        LOWER(COALESCE(lnm.mode, cn.mode)) AS effective_mode,
-        lnm.mode AS link_mode,
-        u.plan_name,
-        u.extra_link_packs,
-        COALESCE(NULLIF(u.lang,''), 'en') AS lang,
-        qh.quiet_enabled,
-        qh.quiet_from,
-        qh.quiet_to
-      FROM links l
-      JOIN chat_notifications cn
-        ON cn.user_id = l.user_id
-       AND (l.chat_id IS NULL OR cn.chat_id = l.chat_id)
-      JOIN users u
-        ON u.id = l.user_id
-      LEFT JOIN link_notification_modes lnm
-        ON lnm.user_id = cn.user_id
-       AND lnm.chat_id = cn.chat_id
-       AND lnm.link_id = l.id
-      LEFT JOIN chat_quiet_hours qh
-        ON qh.chat_id = cn.chat_id
-      WHERE l.id = $1
-      `,
-      [link.id]
-    );
+    // czaty linku: ze snapshotu pętli (bez zapytania), fallback – zapytanie per link
+    const routingRows = notifyRouting.isLoaded()
+      ? notifyRouting.rowsFor(link.id)
+      : (await query(NOTIFY_ROUTING_BY_LINK, [link.id])).rows || [];
 
-    if (!res.rowCount) {
+    if (!routingRows.length) {
       logDebug(
         `notifyChatsForLink: link ${link.id} – brak rekordów chat_notifications`
       );
       return;
     }
 
-    let chatRows = res.rows.map((row) => ({
+    let chatRows = routingRows.map((row) => ({
       ...row,
       mode: (row.effective_mode || "single").toLowerCase(),
     }));
@@ -985,6 +1253,11 @@ async function notifyChatsForLink(link, items, skippedExtra, opts = {}) {
       return;
     }
 
+    // file_id zdjęć z tg_photo_file_ids (np. po restarcie) – jedno zapytanie na link
+    if (chatRows.some((r) => r.mode !== "batch")) {
+      await photoFileIds.prefetch(items.map((it) => it.photoUrl));
+    }
+
     for (const row of chatRows) {
       const chatId = row.chat_id;
       const userId = row.user_id;
@@ -1002,29 +1275,13 @@ async function notifyChatsForLink(link, items, skippedExtra, opts = {}) {
         continue;
       }
 
-      // 3) limity dzienne – liczymy z sent_offers (SoT)
-      const dailyCount = await countSentOffersSince(userId, chatId, todayStart);
+      // 3) limity dzienne – liczniki z sent_offers (SoT) załadowane na starcie pętli
+      const dailyCount = dailyQuota.isLoaded()
+        ? dailyQuota.get(userId, chatId, todayStart)
+        : await countSentOffersSince(userId, chatId, todayStart);
 
       const planName = (row.plan_name || "none").toLowerCase();
-      const extraPacks = Number(row.extra_link_packs || 0);
-
-      let maxDaily = 0;
-      switch (planName) {
-        case "trial":
-          maxDaily = 50;
-          break;
-        case "starter":
-          maxDaily = 200;
-          break;
-        case "growth":
-          maxDaily = 400;
-          break;
-        case "platinum":
-          maxDaily = 700 + extraPacks * 100;
-          break;
-        default:
-          maxDaily = 0;
-      }
+      const maxDaily = getDailyNotificationLimit(planName, row.extra_link_packs);
 
       const remainingDaily = Math.max(0, maxDaily - dailyCount);
 
@@ -1033,35 +1290,19 @@ async function notifyChatsForLink(link, items, skippedExtra, opts = {}) {
           `[skip] link=${link.id} chat=${chatId} reason=daily_limit count=${dailyCount} max=${maxDaily}`
         );
 
-        await notifyPool.query(
-          `
-          UPDATE chat_notifications
-          SET daily_count = $1,
-              daily_count_date = $2
-          WHERE chat_id = $3 AND user_id = $4
-          `,
-          [dailyCount, todayStr, chatId, userId]
-        );
+        dailyQuota.touch(userId, chatId);
         batchBuffers.delete(makeBatchKey(chatId, userId, link.id));
         continue;
       }
 
-      const mode = row.mode === "batch" ? "batch" : "single";
+      const mode = row.mode === "batch" || row.mode === "album" ? row.mode : "single";
 
       let itemsForChat = items.slice(0, remainingDaily);
       const droppedByDaily = items.length - itemsForChat.length;
       let skippedForChat = (skippedExtra || 0) + droppedByDaily;
 
       if (!itemsForChat.length) {
-        await notifyPool.query(
-          `
-          UPDATE chat_notifications
-          SET daily_count = $1,
-              daily_count_date = $2
-          WHERE chat_id = $3 AND user_id = $4
-          `,
-          [dailyCount, todayStr, chatId, userId]
-        );
+        dailyQuota.touch(userId, chatId);
         continue;
       }
 
@@ -1080,6 +1321,10 @@ async function notifyChatsForLink(link, items, skippedExtra, opts = {}) {
           if (sent) sentSomething = true;
           insertedTotal += inserted || 0;
         }
+      } else if (mode === "album") {
+        const res = await tgSendAlbum(chatId, link, itemsForChat, row.lang, { userId, skippedExtra: skippedForChat });
+        sentSomething = res.sent;
+        insertedTotal = res.inserted;
       } else {
         const key = makeBatchKey(chatId, userId, link.id);
         const existing = batchBuffers.get(key) || { items: [], skippedExtra: 0 };
@@ -1108,17 +1353,7 @@ async function notifyChatsForLink(link, items, skippedExtra, opts = {}) {
             text,
             parse_mode: "HTML",
             disable_web_page_preview: false,
-            reply_markup: {
-              inline_keyboard: [
-                [
-                  { text: "🔕 Wyłącz ten link", callback_data: `lnmode:${link.id}:off` },
-                ],
-                [
-                  { text: "📨 Pojedynczo", callback_data: `lnmode:${link.id}:single` },
-                  { text: "📦 Zbiorczo", callback_data: `lnmode:${link.id}:batch` },
-                ],
-              ],
-            },
+            reply_markup: { inline_keyboard: linkModeButtons(link.id, ITEM_BUTTON_TEXTS.pl) },
           });
 
           if (sendRes?.ok) {
@@ -1138,30 +1373,8 @@ async function notifyChatsForLink(link, items, skippedExtra, opts = {}) {
         }
       }
 
-      if (sentSomething) {
-        const newDaily = Math.min(maxDaily, dailyCount + insertedTotal);
-
-        await notifyPool.query(
-          `
-          UPDATE chat_notifications
-          SET last_notified_at = NOW(),
-              daily_count = $1,
-              daily_count_date = $2
-          WHERE chat_id = $3 AND user_id = $4
-          `,
-          [newDaily, todayStr, chatId, userId]
-        );
-      } else {
-        await notifyPool.query(
-          `
-          UPDATE chat_notifications
-          SET daily_count = $1,
-              daily_count_date = $2
-          WHERE chat_id = $3 AND user_id = $4
-          `,
-          [dailyCount, todayStr, chatId, userId]
-        );
-      }
+      // daily_count / last_notified_at zapisujemy zbiorczo w dailyQuota.flush() na koniec pętli
+      dailyQuota.touch(userId, chatId, { notified: sentSomething });
     }
   } catch (err) {
     console.error("Błąd notifyChatsForLink:", err);
@@ -1170,38 +1383,116 @@ async function notifyChatsForLink(link, items, skippedExtra, opts = {}) {
 
 // ---------- Scraping OLX ----------
 
-async function scrapeOlx(url) {
-  const launchOpts = {
-    args: ["--no-sandbox", "--disable-dev-shm-usage"],
-  };
-  if (PROXY) launchOpts.proxy = PROXY;
+// Przyspieszenie: nie ładuj ciężkich zasobów (wołane raz na stronę z puli)
+const setupPage = async (p) => {
+  await p.route(/.*/i, (route) => {
+    const t = route.request().resourceType();
+    if (t === "image" || t === "media" || t === "font") return route.abort();
+    return route.continue();
+  });
 
-  const browser = await chromium.launch(launchOpts);
-  const context = await browser.newContext({
+  p.setDefaultNavigationTimeout(60000);
+  p.setDefaultTimeout(60000);
+};
+
+const olxBrowserPool = createBrowserPool({
+  chromium,
+  launchOptions: {
+    args: ["--no-sandbox", "--disable-dev-shm-usage"],
+    ...(PROXY ? { proxy: PROXY } : {}),
+  },
+  contextOptions: {
     locale: "pl-PL",
     timezoneId: "Europe/Warsaw",
     userAgent:
       "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-  });
+  },
+  setupPage,
+  size: OLX_BROWSER_POOL_SIZE,
+  maxPagesPerBrowser: OLX_BROWSER_MAX_PAGES,
+  maxRssMb: OLX_BROWSER_MAX_RSS_MB,
+  label: "olx-pool",
+});
 
-let page = await context.newPage();
+// HTTP-only: HTML listingu przez proxy (bez Chromium), jeden kontekst request na proces
+let olxHttpContext = null; // Promise – równoległe pierwsze wywołania dzielą jeden newContext()
+
+function getOlxHttpContext() {
+  if (!olxHttpContext) {
+    olxHttpContext = request
+      .newContext({
+        ...(PROXY ? { proxy: PROXY } : {}),
+        extraHTTPHeaders: {
+          "user-agent":
+            "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+          "accept-language": "pl-PL,pl;q=0.9,en;q=0.8",
+          accept: "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+        },
+      })
+      .catch((err) => {
+        olxHttpContext = null; // następne wywołanie spróbuje ponownie
+        throw err;
+      });
+  }
+  return olxHttpContext;
+}
 
-const setupPage = async (p) => {
+function olxOfferUrl(href) {
+  try {
+    const u = new URL(href, "https://www.olx.pl");
+    u.hash = "";
+    u.search = "";
+    u.pathname = u.pathname.replace(/^\/d\/oferta\//, "/oferta/");
+    return u.toString();
+  } catch {
+    return String(href || "").split("#")[0].split("?")[0].replace("/d/oferta/", "/oferta/");
+  }
+}
 
-// Przyspieszenie: nie ładuj ciężkich zasobów
-await p.route(/.*/i, (route) => {
-  const t = route.request().resourceType();
-  if (t === "image" || t === "media" || t === "font") return route.abort();
-  return route.continue();
-});
+// null = brak stanu w HTML / inny kształt -> fallback na przeglądarkę
+async function scrapeOlxHttp(url) {
+  const ctx = await getOlxHttpContext();
+  const res = await ctx.get(url, { timeout: 30000, maxRedirects: 5 });
+  if (!res.ok()) throw new Error(`OLX HTTP ${res.status()}`);
+
+  const ads = extractOlxListingAds(await res.text());
+  if (!ads) return null;
+
+  return ads
+    .filter((ad) => ad && ad.url)
+    .map((ad) => ({
+      url: olxOfferUrl(ad.url),
+      title: String(ad.title || "").trim(),
+      rawPrice: olxPriceText(ad),
+      photoUrl: olxPhotoUrl(ad),
+      hasOlxDelivery: olxHasDelivery(ad),
+    }));
+}
 
-  p.setDefaultNavigationTimeout(60000);
-  p.setDefaultTimeout(60000);
-};
+async function scrapeOlx(url) {
+  if (OLX_FETCH_MODE !== "browser") {
+    try {
+      const rawItems = await scrapeOlxHttp(url);
+      if (rawItems) {
+        olxFetchStats.http++;
+        logDebug(`[olx-http] ${url} ads=${rawItems.length}`);
+        return mapOlxRawItems(rawItems);
+      }
+      console.log(`[olx-http] brak osadzonego stanu listingu -> fallback Playwright: ${url}`);
+    } catch (e) {
+      console.log(`[olx-http] ${e?.message || e} -> fallback Playwright: ${url}`);
+    }
+    olxFetchStats.fallback++;
+  }
+  return scrapeOlxBrowser(url);
+}
 
-  try {
-await setupPage(page);
+async function scrapeOlxBrowser(url) {
+  const lease = await olxBrowserPool.lease();
+  let page = lease.page;
+  let crashed = false;
 
+  try {
 // Retry na OLX (czasem siada / muli)
 let lastErr = null;
 
@@ -1225,10 +1516,9 @@ for (let attempt = 1; attempt <= 3; attempt++) {
     lastErr = e;
     console.log(`OLX goto attempt ${attempt}/3 failed: ${e?.message || e}`);
 
-    // Jeśli strona się wysypała / zamknęła – twórz nową i jedziemy dalej
+    // Jeśli strona się wysypała / zamknęła – weź nową z puli i jedziemy dalej
     if (page.isClosed()) {
-      page = await context.newPage();
-      await setupPage(page);
+      page = await lease.newPage();
     }
 
     // UWAGA: nie używamy page.waitForTimeout w catch (bo page może być zamknięta)
@@ -1309,42 +1599,60 @@ if (lastErr) throw lastErr;
 
     if (rawItems[0]) logDebug("OLX first item debug:", rawItems[0]);
 
-    const items = rawItems.map((it) => {
-      let finalTitle = it.title || "";
-      if (!finalTitle || /^wyróżnione$/i.test(finalTitle)) {
-        const fromUrl = deriveOlxTitleFromUrl(it.url);
-        if (fromUrl) finalTitle = fromUrl;
-      }
-
-      const { price, currency } = parsePrice(it.rawPrice);
-      const url = normalizeOlxUrl(it.url);
-      const itemKey = normalizeKey(url);
-
-      return {
-        url,
-        title: finalTitle,
-        price,
-        currency,
-        brand: null,
-        size: null,
-        condition: null,
-        photoUrl: it.photoUrl,
-        hasOlxDelivery: it.hasOlxDelivery,
-        buyUrl: it.hasOlxDelivery ? it.url : null,
-        itemKey,
-        item_key: itemKey,
-      };
-    });
-    return items;
+    return mapOlxRawItems(rawItems);
+  } catch (e) {
+    crashed = page.isClosed() || /Target (page, context or browser )?closed|crash/i.test(String(e?.message || e));
+    throw e;
   } finally {
-    await page.close().catch(() => null);
-    await context.close().catch(() => null);
-    await browser.close().catch(() => null);
+    await lease.release({ crashed });
   }
 }
 
+// surowe karty (HTTP albo DOM) -> wspólny kształt itemu
+function mapOlxRawItems(rawItems) {
+  return rawItems.map((it) => {
+    let finalTitle = it.title || "";
+    if (!finalTitle || /^wyróżnione$/i.test(finalTitle)) {
+      const fromUrl = deriveOlxTitleFromUrl(it.url);
+      if (fromUrl) finalTitle = fromUrl;
+    }
+
+    const { price, currency } = parsePrice(it.rawPrice);
+    const url = normalizeOlxUrl(it.url);
+    const itemKey = normalizeKey(url);
+
+    return {
+      url,
+      title: finalTitle,
+      price,
+      currency,
+      brand: null,
+      size: null,
+      condition: null,
+      photoUrl: it.photoUrl,
+      hasOlxDelivery: it.hasOlxDelivery,
+      buyUrl: it.hasOlxDelivery ? it.url : null,
+      itemKey,
+      item_key: itemKey,
+    };
+  });
+}
+
 // ---------- Scraping Vinted ----------
 
+// Sesje API Vinted per origin (cookies + anon token), odświeżane po wygaśnięciu / 401 / 403
+const vintedSessions = createVintedSessionCache({
+  request,
+  proxy: PROXY,
+  extraHTTPHeaders: {
+    "user-agent":
+      "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "accept-language": "pl-PL,pl;q=0.9,en;q=0.8",
+  },
+  ttlMs: VINTED_SESSION_TTL_MS,
+  logDebug,
+});
+
 function pickArrayFromApi(data) {
   if (!data || typeof data !== "object") return [];
   if (Array.isArray(data.items)) return data.items;
@@ -1380,47 +1688,21 @@ async function scrapeVinted(url) {
       }
     }
 
-    const api = await request.newContext({
-      proxy: PROXY || undefined,
-      baseURL: origin || undefined,
-      extraHTTPHeaders: {
-        "user-agent":
-          "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-        "accept-language": "pl-PL,pl;q=0.9,en;q=0.8",
-      },
-    });
+    if (!origin) throw new Error("NO_ORIGIN");
 
     try {
-      // Warm-up: złap anon cookies / token
-      if (origin) {
-        await api.get("/", {
-          headers: {
-            accept:
-              "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
-          },
-        });
-      }
-
-      // Drugi warm-up: wejście na realny /catalog
-      try {
-        await api.get(url, {
+      const res = await vintedSessions.get(
+        origin,
+        apiUrl,
+        {
           headers: {
-            accept:
-              "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
-            referer: origin ? origin + "/" : undefined,
+            accept: "application/json, text/plain, */*",
+            "x-requested-with": "XMLHttpRequest",
+            referer: url,
           },
-        });
-      } catch {
-        // ignore
-      }
-
-      const res = await api.get(apiUrl, {
-        headers: {
-          accept: "application/json, text/plain, */*",
-          "x-requested-with": "XMLHttpRequest",
-          referer: url,
         },
-      });
+        { catalogUrl: url }
+      );
 
       const txt = await res.text().catch(() => "");
       if (!res.ok()) {
@@ -1541,8 +1823,10 @@ async function scrapeVinted(url) {
       }
 
       logDebug(`Vinted(API pw request): 0 items, q="${q}"`);
-    } finally {
-      await api.dispose().catch(() => null);
+    } catch (e) {
+      // 200 z HTML zamiast JSON (challenge / strona błędu) – sesja do wymiany, nie tylko 401/403
+      if (e?.message === "JSON_PARSE") await vintedSessions.invalidate(origin).catch(() => null);
+      throw e;
     }
   } catch (e) {
     logDebug("Vinted API (pw request) failed -> fallback DOM:", e?.message || e);
@@ -1715,7 +1999,40 @@ function sortItemsForNotify(source, items) {
   return items || [];
 }
 
-async function processLink(link) {
+// Obserwator etapów processLink (benchmark): fn(stage, source, ms)
+let stageObserver = null;
+
+export function setStageObserver(fn) {
+  stageObserver = typeof fn === "function" ? fn : null;
+}
+
+// Czasy etapów bieżącej pętli per link (podsumowanie najwolniejszych linków)
+let loopLinkTimings = new Map(); // linkId -> { source, totalMs, stages: { stage: ms } }
+
+function linkTiming(link, source) {
+  const id = Number(link.id);
+  let t = loopLinkTimings.get(id);
+  if (!t) {
+    t = { source, totalMs: 0, stages: {} };
+    loopLinkTimings.set(id, t);
+  }
+  return t;
+}
+
+async function timeStage(link, source, stage, fn) {
+  const t0 = performance.now();
+  try {
+    return await fn();
+  } finally {
+    const ms = performance.now() - t0;
+    workerMetrics.stageSeconds.observe({ stage, source }, ms / 1000);
+    const t = linkTiming(link, source);
+    t.stages[stage] = (t.stages[stage] || 0) + ms;
+    if (stageObserver) stageObserver(stage, source, ms);
+  }
+}
+
+export async function processLink(link) {
   const source = (link.source || detectSource(link.url) || "").toLowerCase();
 
   const tgUserId = link.telegram_user_id || link.telegramUserId || null;
@@ -1733,13 +2050,11 @@ async function processLink(link) {
 
   console.log(`Worker: checking ${link.url}`);
 
-  let scraped = [];
-  if (source === "olx") scraped = await scrapeOlx(link.url);
-  else if (source === "vinted") scraped = await scrapeVinted(link.url);
-  else {
+  if (source !== "olx" && source !== "vinted") {
     console.log(`Worker: unsupported source=${source} for link ${link.id}`);
     return;
   }
+  const scraped = await timeStage(link, source, "scrape", () => scrapeSearch(source, link.url));
   const lastKey = cleanKey(
     source === "olx"
       ? normalizeOlxUrl(String(link.last_key ?? link.lastKey ?? ""))
@@ -1765,7 +2080,9 @@ async function processLink(link) {
   const minBatchItems = cfg.minBatchItems;
 
   const filters = safeParseFilters(link.filters);
-  const filtered = (scraped || []).filter((it) => matchFilters(it, filters));
+  const filtered = await timeStage(link, source, "filter", () =>
+    (scraped || []).filter((it) => matchFilters(it, filters))
+  );
 
   console.log(
     `[link ${link.id}] filtered=${filtered.length} filtersKeys=${
@@ -1809,12 +2126,12 @@ async function processLink(link) {
   if (!found) {
     const newestKey = getItemKey(orderedAll[0]);
 
-    const keysToCheck = orderedAll.map(getItemKey).filter(Boolean);
-    const seenSet = await getSeenItemKeys(link.id, keysToCheck);
+    // seen-check + zapis w jednym INSERT ... RETURNING (wstawione = nie widziane)
+    const insertedKeys = await timeStage(link, source, "seen_insert", () => insertNewLinkItems(link.id, orderedAll));
 
     const freshNotSeen = orderedAll.filter((it) => {
       const k = getItemKey(it);
-      return k && !seenSet.has(k);
+      return k && insertedKeys.has(k);
     });
 
     if (!freshNotSeen.length) {
@@ -1825,22 +2142,23 @@ async function processLink(link) {
       return;
     }
 
-    await insertLinkItems(link.id, freshNotSeen);
-
     const toSend = freshNotSeen.slice(0, maxPerLoop);
     const skipped = freshNotSeen.length - toSend.length;
 
-    await notifyChatsForLink(link, toSend, skipped, { minBatchItems });
-
-    if (newestKey) await updateLastKey(link.id, newestKey);
+    await timeStage(link, source, "notify", () =>
+      notifyChatsForLink(link, toSend, skipped, { minBatchItems })
+    );
 
     const keep = Number(limits?.history_keep_per_link || HISTORY_KEEP_PER_LINK);
-    if (Number.isFinite(keep) && keep > 0) await pruneLinkItems(link.id, keep);
+    pruneTracker.note(link.id, insertedKeys.size, keep);
+    await timeStage(link, source, "prune", () =>
+      finishLinkPass(link.id, newestKey, pruneTracker.take(link.id))
+    );
 
     logDebug(
       `[catchup] link ${link.id} last_key wypadł poza stronę -> wysłano=${toSend.length} pominięto=${skipped}`
     );
-    return;
+    return freshNotSeen.length;
   }
 
   if (!freshByLastKey.length) {
@@ -1852,13 +2170,12 @@ async function processLink(link) {
     return;
   }
 
-  // ======= seen-check TYLKO dla tych świeżych
-  const keysToCheck = freshByLastKey.map(getItemKey).filter(Boolean);
-  const seenSet = await getSeenItemKeys(link.id, keysToCheck);
+  // ======= seen-check + zapis TYLKO dla tych świeżych (jedno zapytanie)
+  const insertedKeys = await timeStage(link, source, "seen_insert", () => insertNewLinkItems(link.id, freshByLastKey));
 
   const freshNotSeen = freshByLastKey.filter((it) => {
     const k = getItemKey(it);
-    return k && !seenSet.has(k);
+    return k && insertedKeys.has(k);
   });
 
   if (!freshNotSeen.length) {
@@ -1872,35 +2189,293 @@ async function processLink(link) {
     return;
   }
 
-  // zapisujemy do DB wszystkie świeże nie-widziane
-  await insertLinkItems(link.id, freshNotSeen);
-
   // wysyłka limitowana
   const toSend = freshNotSeen.slice(0, maxPerLoop);
   const skipped = freshNotSeen.length - toSend.length;
 
   if (toSend.length) {
-    await notifyChatsForLink(link, toSend, skipped, { minBatchItems });
+    await timeStage(link, source, "notify", () =>
+      notifyChatsForLink(link, toSend, skipped, { minBatchItems })
+    );
   }
 
-  // przesuwamy last_key na aktualnie najnowszy z listingu
+  // przesuwamy last_key na aktualnie najnowszy z listingu + przytnij historię gdy trzeba (1 transakcja)
   const newestKey = getItemKey(orderedAll[0]);
-  if (newestKey) {
-    await updateLastKey(link.id, newestKey);
+  const keep = Number(limits?.history_keep_per_link || HISTORY_KEEP_PER_LINK);
+  pruneTracker.note(link.id, insertedKeys.size, keep);
+  await timeStage(link, source, "prune", () =>
+    finishLinkPass(link.id, newestKey, pruneTracker.take(link.id))
+  );
+  return freshNotSeen.length;
+}
+
+// Scrape współdzielony w obrębie pętli: pierwszy link z danym kluczem pobiera,
+// pozostałe czekają na ten sam Promise. Każdy link dostaje własną kopię tablicy
+// (matchFilters / last_key / dedupe liczone per link w processLink).
+let cycleScrapes = null; // searchKey -> Promise<items[]>
+let cycleScrapeStats = { searches: 0, shared: 0 };
+
+async function scrapeSearch(source, url) {
+  const scrape = () => (source === "olx" ? scrapeOlx(url) : scrapeVinted(url));
+  const key = cycleScrapes ? searchKeyOf({ source, url }) : null;
+  if (!key) return scrape();
+
+  let p = cycleScrapes.get(key);
+  if (p) {
+    cycleScrapeStats.shared++;
+  } else {
+    cycleScrapeStats.searches++;
+    p = scrape();
+    cycleScrapes.set(key, p);
   }
+  return [...((await p) || [])];
+}
 
-  // przytnij historię
-  const keep = Number(limits?.history_keep_per_link || HISTORY_KEEP_PER_LINK);
-  if (Number.isFinite(keep) && keep > 0) {
-    await pruneLinkItems(link.id, keep);
+// przebieg linku + zapis wyniku do kadencji (ile nowych / błąd)
+async function pollLink(link) {
+  const source = (link.source || detectSource(link.url) || "unknown").toLowerCase();
+  const t0 = performance.now();
+  let result = "ok";
+  try {
+    const fresh = await processLink(link);
+    linkCadence.record(link.id, Number(fresh) || 0);
+  } catch (err) {
+    result = "error";
+    linkCadence.record(link.id, null);
+    throw err;
+  } finally {
+    if (LINK_LEASING) await releaseLease(link);
+    const ms = performance.now() - t0;
+    linkTiming(link, source).totalMs = ms;
+    workerMetrics.linkSeconds.observe({ source }, ms / 1000);
+    workerMetrics.linksTotal.inc({ source, result });
+  }
+}
+
+// =================== LEASING (wiele replik) ===================
+
+const heldLeases = new Set(); // linkId zajęte przez tę replikę
+
+/**
+ * Zajmuj partie linków (tylko te, których nikt inny nie trzyma) i przetwarzaj je schedulerem.
+ * Linki zajęte przez inne repliki / już nie "due" w DB zostają pominięte w tej pętli.
+ */
+async function runLeasedTasks(tasks) {
+  const pending = new Map(tasks.map((t) => [Number(t.link.id), t]));
+  const total = { total: 0, done: 0, failed: 0, queueStart: 0, inFlightPeak: 0, waitMaxMs: 0, waitSumMs: 0, wallMs: 0 };
+  const t0 = Date.now();
+
+  while (pending.size && !shuttingDown) {
+    const dueIds = [];
+    const rideIds = [];
+    for (const [id, t] of pending.entries()) (t.due ? dueIds : rideIds).push(id);
+
+    const rows = await claimLinkLeases(WORKER_ID, {
+      dueIds,
+      rideIds,
+      leaseMs: LINK_LEASE_MS,
+      limit: LINK_LEASE_BATCH,
+    });
+    if (!rows.length) break;
+
+    const batch = [];
+    for (const row of rows) {
+      const id = Number(row.id);
+      const t = pending.get(id);
+      if (!t) continue;
+      pending.delete(id);
+      heldLeases.add(id);
+      // świeże last_key / filtry z claimu (inna replika mogła je właśnie przesunąć)
+      batch.push({ ...t, link: { ...t.link, ...row } });
+    }
+
+    const st = await linkScheduler.run(batch, pollLink);
+    total.total += st.total;
+    total.done += st.done;
+    total.failed += st.failed;
+    total.queueStart += st.queueStart;
+    total.inFlightPeak = Math.max(total.inFlightPeak, st.inFlightPeak);
+    total.waitMaxMs = Math.max(total.waitMaxMs, st.waitMaxMs);
+    total.waitSumMs += st.waitSumMs;
+  }
+
+  total.wallMs = Date.now() - t0;
+  console.log(`[lease] worker=${WORKER_ID} claimed=${total.total} skipped_other_or_not_due=${pending.size}`);
+  return total;
+}
+
+async function releaseLease(link) {
+  const id = Number(link.id);
+  if (!heldLeases.has(id)) return;
+  heldLeases.delete(id);
+
+  const c = linkCadence.get(id);
+  try {
+    await releaseLinkLease(WORKER_ID, id, {
+      nextPollAt: LINK_POLL_ADAPTIVE && c ? c.nextDueAt : Date.now() + LOOP_DELAY_MS,
+      pollIntervalMs: LINK_POLL_ADAPTIVE && c ? c.intervalMs : null,
+    });
+  } catch (err) {
+    // lease i tak wygaśnie po LINK_LEASE_MS
+    console.error(`Worker: lease release error for link ${id}`, err?.message || err);
+  }
+}
+
+function startLeaseHeartbeat() {
+  const every = Math.max(1000, Math.floor(LINK_LEASE_MS / 3));
+  setInterval(async () => {
+    if (!heldLeases.size) return;
+    try {
+      await renewLinkLeases(WORKER_ID, [...heldLeases], LINK_LEASE_MS);
+    } catch (err) {
+      console.error("Worker: lease heartbeat error", err?.message || err);
+    }
+  }, every).unref();
+}
+
+// =================== SHUTDOWN (SIGTERM / SIGINT) ===================
+
+const WORKER_SHUTDOWN_TIMEOUT_MS = Number(process.env.WORKER_SHUTDOWN_TIMEOUT_MS || 25000);
+
+let shuttingDown = false;
+let currentLoop = null; // Promise bieżącego loopOnce()
+
+/**
+ * Zatrzymanie kontenera: bez nowych claimów / pętli, dokończenie bieżącej pętli
+ * (wysyłki w locie, flush liczników i file_id) do WORKER_SHUTDOWN_TIMEOUT_MS,
+ * potem oddanie leasów – inne repliki biorą linki od razu, bez czekania na wygaśnięcie.
+ */
+function installShutdownHandlers() {
+  for (const sig of ["SIGTERM", "SIGINT"]) {
+    process.once(sig, async () => {
+      shuttingDown = true;
+      console.log(`[shutdown] ${sig}: waiting for loop (max ${WORKER_SHUTDOWN_TIMEOUT_MS}ms)`);
+
+      if (currentLoop) {
+        let timer = null;
+        const timedOut = await Promise.race([
+          currentLoop.then(() => false, () => false),
+          new Promise((r) => (timer = setTimeout(() => r(true), WORKER_SHUTDOWN_TIMEOUT_MS))),
+        ]);
+        clearTimeout(timer);
+        if (timedOut) console.warn("[shutdown] loop still running – flushing what we have");
+      }
+
+      // po dokończonej pętli to no-op; po timeoucie zapisuje to, co już wysłane
+      await dailyQuota.flush().catch((err) => console.error("Worker: shutdown quota flush error", err));
+      await photoFileIds.flush().catch((err) => console.error("Worker: shutdown photo flush error", err));
+
+      if (LINK_LEASING) {
+        try {
+          const n = await releaseAllLinkLeases(WORKER_ID);
+          console.log(`[lease] ${sig}: released=${n}`);
+        } catch (err) {
+          console.error("Worker: lease release on shutdown error", err?.message || err);
+        }
+      }
+      process.exit(0);
+    });
+  }
+}
+
+// top N najwolniejszych linków pętli z rozbiciem na etapy
+function logSlowestLinks(n = METRICS_SLOWEST_LINKS) {
+  if (n <= 0 || !loopLinkTimings.size) return;
+  const slow = [...loopLinkTimings.entries()].sort((a, b) => b[1].totalMs - a[1].totalMs).slice(0, n);
+  for (const [id, t] of slow) {
+    const parts = Object.entries(t.stages)
+      .sort((a, b) => b[1] - a[1])
+      .map(([k, ms]) => `${k}=${Math.round(ms)}`)
+      .join(" ");
+    console.log(`[slow] link=${id} source=${t.source} total_ms=${Math.round(t.totalMs)} ${parts}`);
+  }
+}
+
+const linkCadence = createLinkCadence({
+  baseMs: LOOP_DELAY_MS,
+  minMs: LINK_POLL_MIN_MS,
+  maxMs: LINK_POLL_MAX_MS,
+  backoff: LINK_POLL_BACKOFF,
+});
+
+// minimum interwału linku: feature planu poll_interval_min_sec albo domyślne per plan
+function getLinkPollFloorMs(limits) {
+  const sec = Number(limits?.poll_interval_min_sec || 0);
+  if (sec > 0) return sec * 1000;
+  return getMinPollIntervalMs(limits?.plan_code);
+}
+
+const linkScheduler = createLinkScheduler({
+  concurrency: WORKER_CONCURRENCY,
+  perSource: { olx: WORKER_CONCURRENCY_OLX, vinted: WORKER_CONCURRENCY_VINTED },
+  perUser: WORKER_CONCURRENCY_PER_USER,
+});
+
+export async function loopOnce() {
+  const loopStart = performance.now();
+  loopLinkTimings = new Map();
+  let ran = true;
+  try {
+    ran = (await runLoop()) !== false;
+  } finally {
+    // pominięte ticki (brak terminów) nie zaniżają histogramu pętli
+    if (ran) workerMetrics.loopSeconds.observe({}, (performance.now() - loopStart) / 1000);
+    logSlowestLinks();
+  }
+}
+
+// DDL z initDb() raz na proces (jak initDbOnce w telegram-bot.js), nie co tick
+let __initDbPromise = null;
+function initDbOnce() {
+  if (!__initDbPromise) {
+    __initDbPromise = initDb().catch((err) => {
+      __initDbPromise = null;
+      throw err;
+    });
   }
+  return __initDbPromise;
 }
 
-async function loopOnce() {
-  await initDb();
+let lastFullLoadAt = 0;
+
+/**
+ * Tick co WORKER_TICK_MS – pełne ładowanie (limity dzienne, linki, plany) tylko jeśli
+ * jakiś link może mieć termin. Leasing: termin w DB (hasDueLinks), inaczej – stan kadencji
+ * w pamięci; nowe linki (brak stanu) najpóźniej po LOOP_DELAY_MS od ostatniego ładowania.
+ */
+async function anyLinkMaybeDue() {
+  if (!LINK_POLL_ADAPTIVE) return true;
+  if (LINK_LEASING) return hasDueLinks(WORKER_ID);
+
+  const now = Date.now();
+  if (now - lastFullLoadAt >= LOOP_DELAY_MS) return true;
+  const next = linkCadence.nextDueAt();
+  return next === null || next <= now;
+}
+
+async function runLoop() {
+  await initDbOnce();
+
+  if (!(await anyLinkMaybeDue())) {
+    logDebug("Worker: tick – brak linków z terminem, pomijam ładowanie");
+    return false;
+  }
+  lastFullLoadAt = Date.now();
+
+  try {
+    await dailyQuota.load(getTodayStart());
+  } catch (err) {
+    console.error("Worker: daily quota load error (fallback: COUNT per chat)", err);
+  }
+
   const links = await getLinksForWorker();
   console.log(`Worker: found links: ${links.length}`);
 
+  // limity planu wszystkich userów z tej pętli – jedno zapytanie
+  await userLimitsCache.warm(
+    links.map((l) => l.telegram_user_id || l.telegramUserId).filter(Boolean)
+  );
+
   // grupujemy per telegram_user_id
   const byUser = new Map(); // tgId(str) -> links[]
   for (const link of links) {
@@ -1910,16 +2485,22 @@ async function loopOnce() {
     byUser.get(key).push(link);
   }
 
+  linkCadence.retain(links.map((l) => l.id));
+
+  const candidates = []; // { link, due, searchKey }
+  const enqueue = (link, lim = null) => {
+    let due = !LINK_POLL_ADAPTIVE || linkCadence.isDue(link, getLinkPollFloorMs(lim));
+    // leasing: termin trzyma DB (wspólny dla replik), claim i tak sprawdza go jeszcze raz
+    if (LINK_LEASING && LINK_POLL_ADAPTIVE) {
+      due = !link.next_poll_at || new Date(link.next_poll_at).getTime() <= Date.now();
+    }
+    candidates.push({ link, due, searchKey: searchKeyOf(link) });
+  };
+
   for (const [tgId, userLinks] of byUser.entries()) {
     // legacy safety – jakby brak tgId, to lecimy bez limitu
     if (tgId === "__no_tg__") {
-      for (const link of userLinks) {
-        try {
-          await processLink(link);
-        } catch (err) {
-          console.error(`Worker: error for link ${link.id}`, err);
-        }
-      }
+      userLinks.forEach((link) => enqueue(link));
       continue;
     }
 
@@ -1934,32 +2515,162 @@ async function loopOnce() {
       console.log(`[user ${tgId}] worker cap links_limit=${cap} active_links_seen=${sorted.length} -> processing=${toProcess.length}`);
     }
 
-    for (const link of toProcess) {
-      try {
-        await processLink(link);
-      } catch (err) {
-        console.error(`Worker: error for link ${link.id}`, err);
-      }
+    toProcess.forEach((link) => enqueue(link, lim));
+  }
+
+  // to samo wyszukiwanie i tak będzie pobrane w tej pętli -> linki "niedojrzałe" jadą za darmo
+  const dueSearches = new Set(candidates.filter((c) => c.due && c.searchKey).map((c) => c.searchKey));
+  const tasks = [];
+  let notDue = 0;
+  for (const c of candidates) {
+    if (!c.due && !(c.searchKey && dueSearches.has(c.searchKey))) {
+      notDue++;
+      continue;
     }
+    tasks.push({
+      link: c.link,
+      due: c.due,
+      source: (c.link.source || detectSource(c.link.url) || "unknown").toLowerCase(),
+      userKey: c.link.user_id != null ? `u${c.link.user_id}` : `l${c.link.id}`,
+    });
+  }
+
+  // routing powiadomień dla linków tej pętli – jedno zapytanie zamiast joinu per link
+  try {
+    if (tasks.length) await notifyRouting.load(tasks.map((t) => t.link.id));
+  } catch (err) {
+    notifyRouting.clear();
+    console.error("Worker: notify routing snapshot error (fallback: query per link)", err);
+  }
+
+  // jeden scrape na unikalne wyszukiwanie w tej pętli (single-flight)
+  cycleScrapes = new Map();
+
+  let st;
+  let scrapeStats;
+  try {
+    st = LINK_LEASING ? await runLeasedTasks(tasks) : await linkScheduler.run(tasks, pollLink);
+  } finally {
+    scrapeStats = cycleScrapeStats;
+    cycleScrapes = null;
+    cycleScrapeStats = { searches: 0, shared: 0 };
+  }
+  const waitAvg = st.total ? Math.round(st.waitSumMs / st.total) : 0;
+  console.log(
+    `[loop] links=${st.total} done=${st.done} failed=${st.failed} wall_ms=${st.wallMs} ` +
+      `queue_start=${st.queueStart} inflight_peak=${st.inFlightPeak} ` +
+      `wait_avg_ms=${waitAvg} wait_max_ms=${st.waitMaxMs}`
+  );
+  console.log(
+    `[search] unique_scraped=${scrapeStats.searches} shared_hits=${scrapeStats.shared} ` +
+      `olx_http=${olxFetchStats.http} olx_browser_fallback=${olxFetchStats.fallback}`
+  );
+  olxFetchStats.http = 0;
+  olxFetchStats.fallback = 0;
+
+  if (LINK_POLL_ADAPTIVE) {
+    const cs = linkCadence.stats();
+    console.log(
+      `[cadence] polled=${tasks.length} skipped_not_due=${notDue} hot=${cs.hot} cold=${cs.cold} ` +
+        `avg_interval_s=${Math.round(cs.avgIntervalMs / 1000)}`
+    );
+  }
+
+  const tq = tgQueue.stats({ reset: true });
+  workerMetrics.tgQueueDepth.set({}, tq.queueDepth);
+  console.log(
+    `[tg-queue] depth=${tq.queueDepth} peak=${tq.queuedPeak} sent=${tq.sent} failed=${tq.failed} ` +
+      `rate_limited=${tq.rateLimited} latency_p50_ms=${tq.latencyP50} latency_p99_ms=${tq.latencyP99}`
+  );
+
+  notifyRouting.clear();
+  await dailyQuota.flush();
+  if (sentUserIds.size) {
+    await notifyUserReadChanged(pool, { userIds: [...sentUserIds] });
+    sentUserIds.clear();
+  }
+  await photoFileIds.flush();
+
+  const ds = dbStats({ reset: true });
+  workerMetrics.dbPoolWaiting.set({}, ds.waiting);
+  console.log(formatDbStats(ds));
+
+  const pc = photoFileIds.stats({ reset: true });
+  if (pc.hits || pc.stored) {
+    console.log(
+      `[photo-cache] hits=${pc.hits} misses=${pc.misses} stored=${pc.stored} db_loaded=${pc.dbLoaded} ` +
+        `forgotten=${pc.forgotten} size=${pc.size}`
+    );
+  }
+
+  // karty renderowane przez t() – liczniki fallback/missing (zamiast logu per wywołanie)
+  const is = i18nStats({ reset: true });
+  workerMetrics.i18nLookups.inc({ result: "ok" }, is.calls - is.fallback - is.missing);
+  workerMetrics.i18nLookups.inc({ result: "fallback" }, is.fallback);
+  workerMetrics.i18nLookups.inc({ result: "missing" }, is.missing);
+  if (is.fallback || is.missing) {
+    const fmtTop = (arr) => arr.map(([k, n]) => `${k}:${n}`).join(",") || "-";
+    console.log(
+      `[i18n] calls=${is.calls} fallback=${is.fallback} missing=${is.missing} ` +
+        `top_fallback=${fmtTop(is.topFallback)} top_missing=${fmtTop(is.topMissing)}`
+    );
+  }
+
+  if (pruneTracker.sweepDue()) {
+    const t0 = performance.now();
+    await sweepLinkHistory();
+    workerMetrics.stageSeconds.observe({ stage: "prune_sweep", source: "all" }, (performance.now() - t0) / 1000);
   }
 }
 
+// okresowy, batchowy sweep historii linków z zaległościami (między przebiegami inline)
+async function sweepLinkHistory() {
+  const entries = pruneTracker.takeSweep();
+  const batch = Math.max(1, PRUNE_SWEEP_BATCH);
+  let pruned = 0;
+
+  for (let i = 0; i < entries.length; i += batch) {
+    try {
+      pruned += await pruneLinkItemsBatch(entries.slice(i, i + batch));
+    } catch (err) {
+      console.error("Worker: prune sweep error", err);
+    }
+  }
+
+  console.log(`[prune] sweep links=${entries.length} deleted=${pruned}`);
+}
+
 
 async function main() {
   console.log("Worker start");
   console.log(`[config] LOOP_DELAY_MS=${LOOP_DELAY_MS}ms SLEEP_BETWEEN_ITEMS_MS=${SLEEP_BETWEEN_ITEMS_MS}ms MAX_ITEMS_PER_LINK_PER_LOOP=${MAX_ITEMS_PER_LINK_PER_LOOP}`);
-
-  while (true) {
+  console.log(`[config] WORKER_CONCURRENCY=${WORKER_CONCURRENCY} OLX=${WORKER_CONCURRENCY_OLX} VINTED=${WORKER_CONCURRENCY_VINTED} PER_USER=${WORKER_CONCURRENCY_PER_USER}`);
+  console.log(`[config] TG_GLOBAL_RATE_PER_SEC=${TG_GLOBAL_RATE_PER_SEC} TG_CHAT_RATE_PER_SEC=${TG_CHAT_RATE_PER_SEC} TG_GROUP_RATE_PER_MIN=${TG_GROUP_RATE_PER_MIN} TG_SEND_CONCURRENCY=${TG_SEND_CONCURRENCY}`);
+  console.log(`[config] LINK_LEASING=${LINK_LEASING} WORKER_ID=${WORKER_ID} LINK_LEASE_MS=${LINK_LEASE_MS} LINK_LEASE_BATCH=${LINK_LEASE_BATCH}`);
+  console.log(`[config] LINK_POLL_ADAPTIVE=${LINK_POLL_ADAPTIVE} WORKER_TICK_MS=${WORKER_TICK_MS} LINK_POLL_MIN_MS=${LINK_POLL_MIN_MS} LINK_POLL_MAX_MS=${LINK_POLL_MAX_MS} LINK_POLL_BACKOFF=${LINK_POLL_BACKOFF}`);
+  console.log(`[config] OLX_FETCH_MODE=${OLX_FETCH_MODE} OLX_BROWSER_POOL_SIZE=${OLX_BROWSER_POOL_SIZE} OLX_BROWSER_MAX_PAGES=${OLX_BROWSER_MAX_PAGES} OLX_BROWSER_MAX_RSS_MB=${OLX_BROWSER_MAX_RSS_MB}`);
+
+  if (METRICS_PORT > 0) startMetricsServer({ registry: metricsRegistry, port: METRICS_PORT });
+  if (LINK_LEASING) startLeaseHeartbeat();
+  installShutdownHandlers();
+
+  while (!shuttingDown) {
+    currentLoop = loopOnce();
     try {
-      await loopOnce();
+      await currentLoop;
     } catch (err) {
       console.error("Worker: loopOnce error", err);
     }
-    await sleep(LOOP_DELAY_MS);
+    currentLoop = null;
+    if (shuttingDown) break;
+    await sleep(LINK_POLL_ADAPTIVE ? WORKER_TICK_MS : LOOP_DELAY_MS);
   }
 }
 
-main().catch((err) => {
-  console.error("Worker fatal error", err);
-  process.exit(1);
-});
+// WORKER_AUTOSTART=0 – import bez pętli (api/bench/worker-bench.js)
+if (process.env.WORKER_AUTOSTART !== "0") {
+  main().catch((err) => {
+    console.error("Worker fatal error", err);
+    process.exit(1);
+  });
+}
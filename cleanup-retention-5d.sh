@@ -4,7 +4,18 @@
 
 cd /opt/findyourdeal || exit 1
 
-# Produkcja: kasuj dane >5 dni
-DRY_RUN=0 /opt/findyourdeal/scripts/cleanup_retention_5d.sh >> /var/log/cleanup_retention_5d.log 2>&1
+LOG=/var/log/cleanup_retention_5d.log
+rc=0
 
-exit $?
+# Produkcja: kasuj dane >5 dni (webhooki, tokeny, sesje, liczniki)
+DRY_RUN=0 /opt/findyourdeal/scripts/cleanup_retention_5d.sh >> "$LOG" 2>&1 || rc=$?
+
+# link_items / sent_offers: partycje dzienne (nowe na zapas + DROP starych) albo DELETE w paczkach
+# przy starym układzie, do tego dezaktywacja linków po wygasłych planach.
+# Job w obrazie workera (pg + DATABASE_URL z .env), skrypt podmontowany z repo.
+docker compose run --rm --no-deps -T \
+  -e DRY_RUN=0 \
+  -v /opt/findyourdeal/maintenance-deactivate-expired-links.js:/app/api/maintenance-deactivate-expired-links.js:ro \
+  worker node maintenance-deactivate-expired-links.js >> "$LOG" 2>&1 || rc=1
+
+exit $rc
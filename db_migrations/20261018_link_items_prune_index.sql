@@ -0,0 +1,13 @@
+-- Migration: index for incremental link_items pruning
+-- Date: 2026-10-18
+-- Purpose: pruneLinkItemsBatch() looks up the "cutoff row" (keep-th newest item
+--          of a link) with ORDER BY first_seen_at DESC, id DESC OFFSET keep LIMIT 1
+--          and deletes everything older. This index serves both the lookup and
+--          the row-comparison delete without scanning the link's whole history.
+-- Note: CONCURRENTLY – run outside a transaction (psql -f, no BEGIN/COMMIT)
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS link_items_link_first_seen_id_idx
+ON link_items (link_id, first_seen_at DESC, id DESC);
+
+-- The old (link_id, first_seen_at DESC) index is a prefix of the new one
+DROP INDEX CONCURRENTLY IF EXISTS link_items_link_id_first_seen_idx;
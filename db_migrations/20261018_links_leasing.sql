@@ -0,0 +1,17 @@
+-- Migration: link leasing for multiple worker replicas
+-- Date: 2026-10-18
+-- Purpose: workers claim due links with FOR UPDATE SKIP LOCKED and hold them
+--          via lease_owner / lease_until (heartbeat-renewed). A crashed
+--          replica's links become claimable once lease_until passes.
+--          next_poll_at / poll_interval_ms persist the adaptive polling
+--          cadence so every replica sees the same schedule.
+
+ALTER TABLE links
+  ADD COLUMN IF NOT EXISTS lease_owner TEXT NULL,
+  ADD COLUMN IF NOT EXISTS lease_until TIMESTAMPTZ NULL,
+  ADD COLUMN IF NOT EXISTS next_poll_at TIMESTAMPTZ NULL,
+  ADD COLUMN IF NOT EXISTS poll_interval_ms INTEGER NULL;
+
+CREATE INDEX IF NOT EXISTS links_active_next_poll_idx
+ON links (next_poll_at NULLS FIRST)
+WHERE active = TRUE;
@@ -0,0 +1,126 @@
+-- Migration: daily range partitions for link_items and sent_offers
+-- Date: 2026-10-18
+-- Purpose: both tables only grow; the daily quota, /najnowsze, /najtansze and
+--          pruning scan them. Rows are now split into daily partitions
+--          (link_items by first_seen_at, sent_offers by sent_at), so retention
+--          is a DROP TABLE of whole partitions (maintenance-deactivate-expired-links.js)
+--          instead of row-by-row DELETEs, and "today" queries touch one partition.
+--
+-- Unique keys on a partitioned table must contain the partition key, so
+-- (link_id, item_key) / (chat_id, link_id, item_id) are enforced per day;
+-- the inserts in api/db.js and api/worker.js keep "seen" semantics with a
+-- NOT EXISTS probe bounded to the retention window (partition pruning),
+-- run under pg_advisory_xact_lock per link_id so concurrent inserts for the
+-- same link cannot both pass it.
+--
+-- Run in a maintenance window (copies the tables under an exclusive lock).
+
+BEGIN;
+
+-- dzienne partycje parent_pYYYYMMDD dla [dziś - days_back, dziś + days_ahead]
+CREATE OR REPLACE FUNCTION fyd_ensure_daily_partitions(parent TEXT, days_back INT, days_ahead INT)
+RETURNS INT
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  d DATE;
+  part TEXT;
+  created INT := 0;
+BEGIN
+  FOR d IN
+    SELECT g::date
+    FROM generate_series(CURRENT_DATE - days_back, CURRENT_DATE + days_ahead, INTERVAL '1 day') AS g
+  LOOP
+    part := format('%s_p%s', parent, to_char(d, 'YYYYMMDD'));
+    IF to_regclass(part) IS NULL THEN
+      BEGIN
+        EXECUTE format('CREATE TABLE %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)', part, parent, d, d + 1);
+        created := created + 1;
+      EXCEPTION WHEN others THEN
+        -- np. wiersze z tego dnia już leżą w partycji DEFAULT
+        RAISE WARNING 'fyd_ensure_daily_partitions: % skipped: %', part, SQLERRM;
+      END;
+    END IF;
+  END LOOP;
+  RETURN created;
+END
+$$;
+
+-- ===== link_items =====
+
+LOCK TABLE link_items IN ACCESS EXCLUSIVE MODE;
+ALTER TABLE link_items RENAME TO link_items_legacy;
+
+CREATE TABLE link_items (LIKE link_items_legacy INCLUDING DEFAULTS)
+PARTITION BY RANGE (first_seen_at);
+
+ALTER TABLE link_items ALTER COLUMN first_seen_at SET DEFAULT NOW();
+ALTER TABLE link_items ALTER COLUMN first_seen_at SET NOT NULL;
+
+SELECT fyd_ensure_daily_partitions(
+  'link_items',
+  GREATEST(0, CURRENT_DATE - COALESCE((SELECT MIN(first_seen_at)::date FROM link_items_legacy), CURRENT_DATE)),
+  14
+);
+CREATE TABLE link_items_default PARTITION OF link_items DEFAULT;
+
+INSERT INTO link_items
+SELECT * FROM link_items_legacy WHERE first_seen_at IS NOT NULL;
+
+ALTER SEQUENCE IF EXISTS link_items_id_seq OWNED BY link_items.id;
+DROP TABLE link_items_legacy;
+
+ALTER TABLE link_items ADD CONSTRAINT link_items_pkey PRIMARY KEY (id, first_seen_at);
+ALTER TABLE link_items ADD CONSTRAINT link_items_link_id_item_key_key UNIQUE (link_id, item_key, first_seen_at);
+ALTER TABLE link_items
+  ADD CONSTRAINT link_items_link_id_fkey FOREIGN KEY (link_id) REFERENCES links(id) ON DELETE CASCADE;
+
+CREATE INDEX IF NOT EXISTS link_items_link_first_seen_id_idx
+ON link_items (link_id, first_seen_at DESC, id DESC);
+
+-- /najtansze per link: (link_id, price) bez sięgania do wierszy
+CREATE INDEX IF NOT EXISTS link_items_link_price_idx
+ON link_items (link_id, price) INCLUDE (first_seen_at)
+WHERE price IS NOT NULL;
+
+-- ===== sent_offers =====
+
+LOCK TABLE sent_offers IN ACCESS EXCLUSIVE MODE;
+ALTER TABLE sent_offers RENAME TO sent_offers_legacy;
+
+CREATE TABLE sent_offers (LIKE sent_offers_legacy INCLUDING DEFAULTS)
+PARTITION BY RANGE (sent_at);
+
+SELECT fyd_ensure_daily_partitions(
+  'sent_offers',
+  GREATEST(0, CURRENT_DATE - COALESCE((SELECT MIN(sent_at)::date FROM sent_offers_legacy), CURRENT_DATE)),
+  14
+);
+CREATE TABLE sent_offers_default PARTITION OF sent_offers DEFAULT;
+
+INSERT INTO sent_offers
+SELECT * FROM sent_offers_legacy;
+
+ALTER SEQUENCE IF EXISTS sent_offers_id_seq OWNED BY sent_offers.id;
+DROP TABLE sent_offers_legacy;
+
+ALTER TABLE sent_offers ADD CONSTRAINT sent_offers_pkey PRIMARY KEY (id, sent_at);
+ALTER TABLE sent_offers
+  ADD CONSTRAINT sent_offers_chat_id_link_id_item_id_key UNIQUE (chat_id, link_id, item_id, sent_at);
+
+-- limit dzienny, /najnowsze, /najtansze (user_id, chat_id, sent_at) – covering dla licznika i filtra ceny
+CREATE INDEX IF NOT EXISTS sent_offers_user_chat_sent_at_idx
+ON sent_offers (user_id, chat_id, sent_at DESC) INCLUDE (link_id, price);
+
+CREATE INDEX IF NOT EXISTS sent_offers_user_link_sent_at_idx
+ON sent_offers (user_id, link_id, sent_at DESC);
+
+CREATE INDEX IF NOT EXISTS sent_offers_price_sort_idx
+ON sent_offers (user_id, chat_id, sent_at DESC, price ASC);
+
+-- /najtansze <ID>: (link_id, price)
+CREATE INDEX IF NOT EXISTS sent_offers_link_price_idx
+ON sent_offers (link_id, price) INCLUDE (user_id, chat_id, sent_at)
+WHERE price IS NOT NULL;
+
+COMMIT;
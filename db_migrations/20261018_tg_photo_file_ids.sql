@@ -0,0 +1,17 @@
+-- Migration: Telegram file_id cache for listing photos
+-- Date: 2026-10-18
+-- Purpose: after the first successful sendPhoto / sendMediaGroup the worker
+--          stores Telegram's file_id for the photo URL. Later sends of the
+--          same item (other chats, shared links, restarts) reuse the file_id
+--          instead of making Telegram download the image again.
+--          Rows unused for TG_PHOTO_CACHE_TTL_DAYS are deleted by the worker.
+
+CREATE TABLE IF NOT EXISTS tg_photo_file_ids (
+  photo_url TEXT PRIMARY KEY,
+  file_id TEXT NOT NULL,
+  created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  last_used_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS tg_photo_file_ids_last_used_idx
+ON tg_photo_file_ids (last_used_at);
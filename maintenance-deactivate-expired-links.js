@@ -1,17 +1,40 @@
+/**
+ * Maintenance job (cron, raz dziennie – cleanup-retention-5d.sh):
+ * 1) dezaktywacja linków użytkowników z wygasłym planem,
+ * 2) partycje dzienne link_items / sent_offers na najbliższe dni,
+ * 3) retencja historii – DROP całych partycji starszych niż *_RETENTION_DAYS
+ *    (db_migrations/20261018_partition_history.sql) zamiast DELETE wiersz po wierszu.
+ *    Bez migracji (stary układ tabel) – DELETE w paczkach.
+ *
+ * ENV: LINK_ITEMS_RETENTION_DAYS (5), SENT_OFFERS_RETENTION_DAYS (5),
+ *      PARTITIONS_AHEAD_DAYS (14), DRY_RUN=1 (tylko raport).
+ */
 import "dotenv/config";
 import pkg from "pg";
 
 const { Pool } = pkg;
 
-const pool = new Pool({
-  host: process.env.PGHOST,
-  port: process.env.PGPORT,
-  user: process.env.PGUSER,
-  password: process.env.PGPASSWORD,
-  database: process.env.PGDATABASE,
-});
+const DRY_RUN = process.env.DRY_RUN === "1";
+const PARTITIONS_AHEAD_DAYS = Number(process.env.PARTITIONS_AHEAD_DAYS || 14);
+const DELETE_BATCH = 10000;
 
-async function main() {
+const HISTORY_TABLES = [
+  { table: "link_items", tsColumn: "first_seen_at", retentionDays: Number(process.env.LINK_ITEMS_RETENTION_DAYS || 5) },
+  { table: "sent_offers", tsColumn: "sent_at", retentionDays: Number(process.env.SENT_OFFERS_RETENTION_DAYS || 5) },
+];
+
+// DATABASE_URL jak w api/db.js (cron uruchamia job w kontenerze workera), inaczej PGHOST/PGUSER itd.
+const pool = process.env.DATABASE_URL
+  ? new Pool({ connectionString: process.env.DATABASE_URL })
+  : new Pool({
+      host: process.env.PGHOST,
+      port: process.env.PGPORT,
+      user: process.env.PGUSER,
+      password: process.env.PGPASSWORD,
+      database: process.env.PGDATABASE,
+    });
+
+async function deactivateExpiredLinks() {
   console.log("=== Dezaktywacja linków po wygasłych planach ===");
 
   // 1. Podgląd – ilu userów ma nieaktywny plan
@@ -41,6 +64,8 @@ async function main() {
     );
   }
 
+  if (DRY_RUN) return;
+
   // 2. Dezaktywacja linków tych użytkowników
   const updateRes = await pool.query(
     `
@@ -75,6 +100,135 @@ async function main() {
     }
   }
 
+}
+
+async function isPartitioned(table) {
+  const q = await pool.query(
+    `SELECT c.relkind = 'p' AS partitioned FROM pg_class c WHERE c.oid = to_regclass($1)`,
+    [table]
+  );
+  return !!q.rows[0]?.partitioned;
+}
+
+// partycje dzienne parent_pYYYYMMDD (bez DEFAULT) z górną granicą
+async function listDailyPartitions(table) {
+  const q = await pool.query(
+    `
+    SELECT c.relname AS name
+    FROM pg_inherits i
+    JOIN pg_class c ON c.oid = i.inhrelid
+    WHERE i.inhparent = to_regclass($1)
+    ORDER BY c.relname
+    `,
+    [table]
+  );
+  const re = new RegExp(`^${table}_p(\\d{4})(\\d{2})(\\d{2})$`);
+  const out = [];
+  for (const r of q.rows) {
+    const m = String(r.name).match(re);
+    if (!m) continue;
+    const day = new Date(Date.UTC(Number(m[1]), Number(m[2]) - 1, Number(m[3])));
+    out.push({ name: r.name, day });
+  }
+  return out;
+}
+
+function retentionCutoff(days) {
+  const d = new Date();
+  d.setUTCHours(0, 0, 0, 0);
+  d.setUTCDate(d.getUTCDate() - days);
+  return d;
+}
+
+// ten sam klucz co HISTORY_PARTITIONS_LOCK_KEY w api/db.js (initDb na replikach workera)
+const HISTORY_PARTITIONS_LOCK_KEY = 7203410519;
+
+async function ensurePartitions({ table }) {
+  if (DRY_RUN) return;
+  const client = await pool.connect();
+  let q;
+  try {
+    await client.query("BEGIN");
+    await client.query("SELECT pg_advisory_xact_lock($1::bigint)", [HISTORY_PARTITIONS_LOCK_KEY]);
+    q = await client.query(`SELECT fyd_ensure_daily_partitions($1, 0, $2) AS created`, [table, PARTITIONS_AHEAD_DAYS]);
+    await client.query("COMMIT");
+  } catch (err) {
+    await client.query("ROLLBACK").catch(() => null);
+    throw err;
+  } finally {
+    client.release();
+  }
+  console.log(`[maintenance] ${table}: nowe partycje=${q.rows[0]?.created ?? 0} (na ${PARTITIONS_AHEAD_DAYS} dni do przodu)`);
+}
+
+async function dropOldPartitions({ table, tsColumn, retentionDays }) {
+  const cutoff = retentionCutoff(retentionDays);
+  const parts = (await listDailyPartitions(table)).filter((p) => p.day < cutoff);
+
+  for (const p of parts) {
+    if (DRY_RUN) {
+      console.log(`[maintenance] DRY_RUN: DROP TABLE ${p.name}`);
+      continue;
+    }
+    await pool.query(`DROP TABLE IF EXISTS "${p.name}"`);
+    console.log(`[maintenance] ${table}: usunięto partycję ${p.name}`);
+  }
+
+  // DEFAULT powinien być pusty – gdyby coś tam wpadło, stare wiersze kasujemy zwykłym DELETE
+  let fromDefault = 0;
+  if (!DRY_RUN) {
+    const res = await pool.query(
+      `DELETE FROM ONLY ${table}_default WHERE ${tsColumn} < $1`,
+      [cutoff]
+    ).catch(() => ({ rowCount: 0 }));
+    fromDefault = res.rowCount || 0;
+  }
+
+  console.log(
+    `[maintenance] ${table}: retencja ${retentionDays} dni, partycje usunięte=${DRY_RUN ? 0 : parts.length}` +
+      ` default_deleted=${fromDefault}`
+  );
+}
+
+// stary układ (bez migracji partycjonującej) – DELETE w paczkach, żeby nie trzymać długich locków
+async function deleteOldRows({ table, tsColumn, retentionDays }) {
+  const cutoff = retentionCutoff(retentionDays);
+  if (DRY_RUN) {
+    const q = await pool.query(`SELECT COUNT(*)::int AS cnt FROM ${table} WHERE ${tsColumn} < $1`, [cutoff]);
+    console.log(`[maintenance] DRY_RUN: ${table} do usunięcia=${q.rows[0]?.cnt ?? 0}`);
+    return;
+  }
+
+  let total = 0;
+  for (;;) {
+    const res = await pool.query(
+      `DELETE FROM ${table} WHERE ctid IN (SELECT ctid FROM ${table} WHERE ${tsColumn} < $1 LIMIT ${DELETE_BATCH})`,
+      [cutoff]
+    );
+    total += res.rowCount || 0;
+    if ((res.rowCount || 0) < DELETE_BATCH) break;
+  }
+  console.log(`[maintenance] ${table}: tabela bez partycji, DELETE wierszy=${total} (retencja ${retentionDays} dni)`);
+}
+
+async function historyRetention() {
+  console.log("\n=== Retencja historii (link_items / sent_offers) ===");
+  for (const spec of HISTORY_TABLES) {
+    if (await isPartitioned(spec.table)) {
+      await ensurePartitions(spec);
+      await dropOldPartitions(spec);
+    } else {
+      await deleteOldRows(spec);
+    }
+  }
+}
+
+async function main() {
+  if (DRY_RUN) console.log("[maintenance] DRY_RUN=1 – bez zmian w bazie");
+
+  await deactivateExpiredLinks();
+  await historyRetention();
+
   console.log("\nGotowe.\n");
 }
 
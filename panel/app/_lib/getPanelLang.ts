@@ -1,15 +1,14 @@
 import { cookies } from "next/headers";
 import { unstable_noStore as noStore } from "next/cache";
-import pg from "pg";
+import { pool as sharedPool } from "@/lib/db";
 import { normLang, type Lang } from "./i18n";
 
-const { Pool } = pg;
-
 const DATABASE_URL = process.env.DATABASE_URL || "";
 const UUID_RE =
   /^[0-9a-f]{8}-[0-9a-f]{4}-[1-5][0-9a-f]{3}-[89ab][0-9a-f]{3}-[0-9a-f]{12}$/i;
 
-const pool = DATABASE_URL ? new Pool({ connectionString: DATABASE_URL }) : null;
+// wspólna pula panelu (lib/db.ts) zamiast osobnej
+const pool = DATABASE_URL ? sharedPool : null;
 
 async function getUserIdFromAnySessionCookie(): Promise<number | null> {
   if (!pool) return null;
@@ -0,0 +1,130 @@
+/**
+ * Precompiled i18n catalog – kopia api/src/i18n/catalog.js dla panelu
+ * (panel budowany osobno, bez dostępu do api/; trzymać obie wersje w zgodzie).
+ *
+ * Płaskie mapy klucz -> funkcja szablonu per język, fallback do EN rozwiązany
+ * z góry, "{name}" skompilowane raz. Fallbacki / brakujące klucze -> liczniki.
+ */
+
+export type Vars = Record<string, string | number | null | undefined>;
+type Template = (vars?: Vars) => string;
+type Messages = { [key: string]: unknown };
+
+const PLACEHOLDER_RE = /\{(\w+)\}/g;
+
+export function compileTemplate(value: unknown): Template {
+  const str = String(value);
+  const parts: string[] = []; // naprzemiennie: tekst, nazwa zmiennej, tekst, ...
+  let last = 0;
+  for (const m of str.matchAll(PLACEHOLDER_RE)) {
+    parts.push(str.slice(last, m.index), m[1]);
+    last = (m.index ?? 0) + m[0].length;
+  }
+  if (!parts.length) return () => str;
+  parts.push(str.slice(last));
+
+  return (vars?: Vars) => {
+    let out = parts[0];
+    for (let i = 1; i < parts.length; i += 2) {
+      const v = vars ? vars[parts[i]] : undefined;
+      out += (v !== undefined && v !== null ? String(v) : `{${parts[i]}}`) + parts[i + 1];
+    }
+    return out;
+  };
+}
+
+// { cmd: { help: "..." } } -> Map("cmd.help" -> "...")
+export function flattenMessages(obj: Messages, prefix = "", out = new Map<string, unknown>()) {
+  for (const [k, v] of Object.entries(obj || {})) {
+    const key = prefix ? `${prefix}.${k}` : k;
+    if (v !== null && typeof v === "object" && !Array.isArray(v)) flattenMessages(v as Messages, key, out);
+    else if (v !== null && v !== undefined) out.set(key, v);
+  }
+  return out;
+}
+
+export function compileCatalog(
+  translations: Record<string, Messages>,
+  opts: { fallbackLang?: string; onMissing?: ((lang: string, key: string) => void) | null } = {}
+) {
+  const { fallbackLang = "en", onMissing = null } = opts;
+
+  const compiled = new Map<string, Map<string, Template>>(); // lang -> Map(key -> template)
+  for (const [lang, dict] of Object.entries(translations || {})) {
+    const flat = new Map<string, Template>();
+    for (const [key, value] of flattenMessages(dict)) flat.set(key, compileTemplate(value));
+    compiled.set(lang, flat);
+  }
+
+  const base = compiled.get(fallbackLang) || new Map<string, Template>();
+  const fallbackKeys = new Map<string, Set<string>>(); // lang -> Set kluczy wziętych z fallbackLang
+  for (const [lang, flat] of compiled) {
+    if (lang === fallbackLang) continue;
+    const fb = new Set<string>();
+    for (const [key, tpl] of base) {
+      if (!flat.has(key)) {
+        flat.set(key, tpl);
+        fb.add(key);
+      }
+    }
+    fallbackKeys.set(lang, fb);
+  }
+
+  const newCounters = () => ({ calls: 0, fallback: new Map<string, number>(), missing: new Map<string, number>() });
+  let counters = newCounters(); // "lang:key" -> n
+
+  function bump(map: Map<string, number>, lang: string, key: string) {
+    const k = `${lang}:${key}`;
+    const n = (map.get(k) || 0) + 1;
+    map.set(k, n);
+    return n;
+  }
+
+  // undefined = brak klucza (caller decyduje, co zwrócić)
+  function lookup(lang: string, key: string, vars?: Vars): string | undefined {
+    counters.calls++;
+    const tpl = (compiled.get(lang) || base).get(key);
+
+    if (!tpl) {
+      if (bump(counters.missing, lang, key) === 1 && onMissing) onMissing(lang, key);
+      return undefined;
+    }
+    if (lang !== fallbackLang && (!compiled.has(lang) || fallbackKeys.get(lang)?.has(key))) {
+      bump(counters.fallback, lang, key);
+    }
+    return tpl(vars);
+  }
+
+  // brak klucza -> sam klucz
+  function t(lang: string, key: string, vars?: Vars): string {
+    return lookup(lang, key, vars) ?? key;
+  }
+
+  function has(lang: string, key: string) {
+    return !!(compiled.get(lang) || base).get(key);
+  }
+
+  function top(map: Map<string, number>, n: number) {
+    return [...map.entries()].sort((a, b) => b[1] - a[1]).slice(0, n);
+  }
+
+  function sum(map: Map<string, number>) {
+    let s = 0;
+    for (const v of map.values()) s += v;
+    return s;
+  }
+
+  function stats({ reset = false, topN = 5 } = {}) {
+    const out = {
+      calls: counters.calls,
+      fallback: sum(counters.fallback),
+      missing: sum(counters.missing),
+      topFallback: top(counters.fallback, topN),
+      topMissing: top(counters.missing, topN),
+    };
+    if (reset) counters = newCounters();
+    return out;
+  }
+
+  return { t, lookup, has, stats, langs: [...compiled.keys()], keys: base.size };
+}
@@ -1,3 +1,5 @@
+import { compileCatalog } from "./i18n-catalog";
+
 export type Lang =
   | "en"
   | "pl"
@@ -41,13 +43,6 @@ export const normalizeLang = normLang; // alias (żeby nie wywalało builda jak
 
 type Vars = Record<string, string | number>;
 
-function fmt(s: string, vars?: Vars) {
-  if (!vars) return s;
-  return s.replace(/\{(\w+)\}/g, (_, k) =>
-    vars[k] === undefined ? `{${k}}` : String(vars[k])
-  );
-}
-
 const DICT: Record<Lang, Record<string, string>> = {
   en: {
     // NAV / TOP
@@ -80,6 +75,7 @@ const DICT: Record<Lang, Record<string, string>> = {
     settings_notif_default_mode: "Default notification mode",
     settings_notif_mode_single: "Single (immediate)",
     settings_notif_mode_batch: "Batch",
+    settings_notif_mode_album: "Album (photos, up to 10 per message)",
     settings_notif_save: "Save notification settings",
     settings_notif_saving: "Saving...",
     settings_back_to_search: "BACK TO SEARCH",
@@ -134,6 +130,7 @@ const DICT: Record<Lang, Record<string, string>> = {
     mode_off: "OFF",
     mode_single: "single",
     mode_batch: "batch",
+    mode_album: "album",
     mode_inherit: "inherit",
 
     // BILLING
@@ -242,6 +239,7 @@ const DICT: Record<Lang, Record<string, string>> = {
     settings_notif_default_mode: "Domyślny tryb powiadomień",
     settings_notif_mode_single: "Pojedyncze (natychmiastowe)",
     settings_notif_mode_batch: "Zbiorcze",
+    settings_notif_mode_album: "Album (zdjęcia, do 10 w wiadomości)",
     settings_notif_save: "Zapisz ustawienia powiadomień",
     settings_notif_saving: "Zapisywanie...",
     settings_back_to_search: "POWRÓT DO WYSZUKIWANIA",
@@ -267,6 +265,7 @@ const DICT: Record<Lang, Record<string, string>> = {
     mode_off: "OFF",
     mode_single: "pojedynczo",
     mode_batch: "zbiorczo",
+    mode_album: "album",
     mode_inherit: "dziedzicz",
 
     billing_plan_title: "Twój plan",
@@ -1492,14 +1491,16 @@ const DICT: Record<Lang, Record<string, string>> = {
   },
 };
 
+// skompilowany raz przy imporcie: szablony + fallback EN rozwiązany z góry (liczniki zamiast logów)
+const CATALOG = compileCatalog(DICT, { fallbackLang: "en" });
+
 function getStr(lang: Lang, key: string, vars?: Vars) {
   const alias =
     key === "active" ? "active_lower" :
     key === "plan" ? "plan_lower" :
     key;
 
-  const s = DICT[lang]?.[alias] ?? DICT.en?.[alias] ?? alias;
-  return fmt(s, vars);
+  return CATALOG.t(lang, alias, vars);
 }
 
 // t(lang) -> Proxy do L.key
@@ -75,9 +75,9 @@ export async function POST(req: Request) {
       { status: 400 }
     );
   }
-  if (mode !== undefined && !["single", "batch"].includes(mode)) {
+  if (mode !== undefined && !["single", "batch", "album"].includes(mode)) {
     return NextResponse.json(
-      { error: "mode must be 'single' or 'batch'" },
+      { error: "mode must be 'single', 'batch' or 'album'" },
       { status: 400 }
     );
   }
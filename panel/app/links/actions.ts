@@ -72,7 +72,7 @@ export async function setLinkNotificationMode(formData: FormData) {
   const linkId = mustInt(formData.get("link_id"), "link_id");
   const mode = String(formData.get("mode") ?? "").toLowerCase();
 
-  if (!["single", "batch", "off"].includes(mode)) {
+  if (!["single", "batch", "album", "off"].includes(mode)) {
     throw new Error("Bad mode");
   }
 
@@ -37,6 +37,7 @@ function modeLabel(lang: any, m?: string | null) {
   const x = String(m || "").toLowerCase();
   if (x === "off") return t(lang, "mode_off");
   if (x === "batch") return t(lang, "mode_batch");
+  if (x === "album") return t(lang, "mode_album");
   return t(lang, "mode_single");
 }
 
@@ -243,11 +244,11 @@ export default async function LinksPage({ searchParams }: { searchParams: SP })
 
           <tbody>
             {rows.map((r: any) => {
-              const perLink = modeMap.get(Number(r.id)) || null; // single|batch|off|null
+              const perLink = modeMap.get(Number(r.id)) || null; // single|batch|album|off|null
               const effective = perLink || chatMode || "single";
               const hasTg = !!primaryChatId;
 
-              const btnClass = (want: "single" | "batch" | "off") => {
+              const btnClass = (want: "single" | "batch" | "album" | "off") => {
                 const isOn = String(effective) === want;
                 return `border rounded px-2 py-1 ${isOn ? "" : "opacity-60"}`;
               };
@@ -295,6 +296,12 @@ export default async function LinksPage({ searchParams }: { searchParams: SP })
                             <button className={btnClass("batch")}>{t(lang,"mode_batch")}</button>
                           </form>
 
+                          <form action={setLinkNotificationMode}>
+                            <input type="hidden" name="link_id" value={r.id} />
+                            <input type="hidden" name="mode" value="album" />
+                            <button className={btnClass("album")}>{t(lang,"mode_album")}</button>
+                          </form>
+
                           <form action={clearLinkNotificationMode}>
                             <input type="hidden" name="link_id" value={r.id} />
                             <button className={inheritClass}>{L.mode_inherit}</button>
@@ -370,6 +370,7 @@ export default function SettingsPage() {
             >
               <option value="single">{L.settings_notif_mode_single}</option>
               <option value="batch">{L.settings_notif_mode_batch}</option>
+              <option value="album">{L.settings_notif_mode_album}</option>
             </select>
           </div>
 
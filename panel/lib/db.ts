@@ -7,10 +7,22 @@ declare global {
   var __FYD_POOL__: pg.Pool | undefined;
 }
 
+// rozmiar jak w api/src/db/pool.js: PG_POOL_MAX_PANEL > PG_POOL_MAX > 8
+function poolMax() {
+  for (const raw of [process.env.PG_POOL_MAX_PANEL, process.env.PG_POOL_MAX]) {
+    const n = Number(raw);
+    if (raw && Number.isFinite(n) && n > 0) return Math.floor(n);
+  }
+  return 8;
+}
+
 export const pool =
   global.__FYD_POOL__ ??
   new Pool({
     connectionString: process.env.DATABASE_URL,
+    max: poolMax(),
+    idleTimeoutMillis: Number(process.env.PG_POOL_IDLE_MS) || 30000,
+    application_name: "fyd-panel",
   });
 
 if (process.env.NODE_ENV !== "production") {
@@ -77,23 +77,8 @@ log "✅ Połączenie z bazą OK"
 success_count=0
 error_count=0
 
-# 1. link_items (>5 dni)
-if cleanup_table "link_items" \
-  "first_seen_at < NOW() - interval '5 days'" \
-  "Historia ofert >5 dni"; then
-  success_count=$((success_count + 1))
-else
-  error_count=$((error_count + 1))
-fi
-
-# 2. sent_offers (>5 dni)
-if cleanup_table "sent_offers" \
-  "sent_at < NOW() - interval '5 days'" \
-  "Wysłane powiadomienia >5 dni"; then
-  success_count=$((success_count + 1))
-else
-  error_count=$((error_count + 1))
-fi
+# 1-2. link_items / sent_offers – retencja w maintenance-deactivate-expired-links.js
+#      (DROP partycji dziennych / DELETE w paczkach), uruchamianym z cleanup-retention-5d.sh
 
 # 3. stripe_webhook_events (>5 dni, tylko processed)
 if cleanup_table "stripe_webhook_events" \